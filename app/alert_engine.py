@@ -1,75 +1,262 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .graph import Spec
 from .config import (
+    CFG,
+    Config,
     ALERT_PROFILE,
     ENABLE_SPREAD,
-    ENABLE_REGIME,
-    ENABLE_RSI,
-    ENABLE_MACD,
-    REGIME_EMA_GAP,
-    RSI_LONG_MIN,
-    RSI_LONG_MAX,
-    RSI_SHORT_MIN,
-    RSI_SHORT_MAX,
-    MACD_HIST_MIN_LONG,
-    MACD_HIST_MAX_SHORT,
     COOLDOWN_SEC,
     SPREAD_MAX,
 )
 
+# cột ctx (xem Strategy.ctx_arrays), NaN = chưa sẵn sàng
+Cols = Dict[str, np.ndarray]
+
+MODES = ("signal", "rsi", "macd")
+
+
+def ctx_specs(cfg: Config = CFG) -> Dict[str, Spec]:
+    """ctx key -> indicator node. Strategy chỉ require key mà rule của nó đọc."""
+    rsi5 = Spec.rsi(300, cfg.RSI_PERIOD)
+    macd15 = Spec.macd(900, cfg.MACD_FAST, cfg.MACD_SLOW, cfg.MACD_SIGNAL)
+    return {
+        "rsi": rsi5,
+        "rsi_prev": Spec.prev(rsi5),
+        "rsi15": Spec.rsi(900, cfg.RSI_PERIOD),
+        "ema20": Spec.ema(900, 20),
+        "ema50": Spec.ema(900, 50),
+        "ema50_1h": Spec.ema(3600, 50),
+        "macd": macd15,
+        "macd_prev": Spec.prev(macd15),
+        "vol_ratio": Spec.vol_ratio(300, 20),
+        "vol_dir": Spec.vol_dir(300),
+    }
+
 
 # ============================================================
-# CONTEXT FILTER
+# COMPILED RULES
+# ------------------------------------------------------------
+# compile_predicate(cfg) đọc ENABLE_* + ngưỡng 1 lần lúc khởi
+# động: filter tắt không sinh rule nào, ngưỡng được bắt vào
+# closure. evaluate() chạy LONG + SHORT cho cả batch symbol
+# bằng mask NumPy; reason string chỉ dựng khi gọi explain().
+#
+# Rule chặn đầu tiên của mỗi candidate (symbol, side) được đếm
+# vào rejects[name] -> candidates = passed + sum(rejects).
 # ============================================================
-def ctx_filters_signal(ctx: dict, side: str):
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    reason: str
+    ok: Callable[[Cols], np.ndarray]    # True = qua
+    keys: Tuple[str, ...]               # ctx key rule đọc
+    side: Optional[str] = None          # None = cả LONG và SHORT
+    ready: bool = False                 # rule "not ready": chặn thì bỏ qua các rule sau
+
+
+def _ready(key: str, *more: str) -> Callable[[Cols], np.ndarray]:
+    keys = (key, *more)
+
+    def ok(c: Cols) -> np.ndarray:
+        m = ~np.isnan(c[keys[0]])
+        for k in keys[1:]:
+            m &= ~np.isnan(c[k])
+        return m
+
+    return ok
+
+
+def compile_rules(cfg: Config = CFG, mode: str = "signal") -> List[Rule]:
     """
-    ctx keys:
-        rsi, rsi15
-        ema20, ema50, ema50_1h
-        macd
-        vol_ratio, vol_dir
+    signal: regime (EMA) + RSI zone + MACD strength theo ENABLE_*
+    rsi   : RSI cắt lên RSI_LONG_MIN (LONG) / cắt xuống RSI_SHORT_MAX (SHORT)
+    macd  : MACD histogram đổi dấu qua 0
     """
+    if mode not in MODES:
+        raise ValueError(f"unknown ALERT_MODE: {mode}")
+    rules: List[Rule] = []
+    E = ("ema20", "ema50")
 
-    reasons = []
+    if mode == "rsi":
+        lo, hi = cfg.RSI_LONG_MIN, cfg.RSI_SHORT_MAX
+        R = ("rsi", "rsi_prev")
+        return [
+            Rule("rsi_ready", "RSI not ready", _ready(*R), R, ready=True),
+            Rule("rsi_cross", "RSI no cross up",
+                 lambda c: (c["rsi_prev"] < lo) & (c["rsi"] >= lo), R, "LONG"),
+            Rule("rsi_cross", "RSI no cross down",
+                 lambda c: (c["rsi_prev"] > hi) & (c["rsi"] <= hi), R, "SHORT"),
+        ]
+
+    if mode == "macd":
+        M = ("macd", "macd_prev")
+        return [
+            Rule("macd_ready", "MACD not ready", _ready(*M), M, ready=True),
+            Rule("macd_cross", "MACD no cross up",
+                 lambda c: (c["macd_prev"] <= 0) & (c["macd"] > 0), M, "LONG"),
+            Rule("macd_cross", "MACD no cross down",
+                 lambda c: (c["macd_prev"] >= 0) & (c["macd"] < 0), M, "SHORT"),
+        ]
 
     # ===== REGIME / TREND =====
-    if ENABLE_REGIME:
-        if ctx["ema20"] is None or ctx["ema50"] is None:
-            return False, ["EMA not ready"]
+    if cfg.ENABLE_REGIME:
+        gap = cfg.REGIME_EMA_GAP
+        rules += [
+            Rule("ema_ready", "EMA not ready", _ready(*E), E, ready=True),
+            Rule("ema_gap", "EMA gap too small",
+                 lambda c: np.abs(c["ema20"] - c["ema50"]) / c["ema50"] >= gap, E),
+            Rule("ema_trend", "EMA trend down", lambda c: c["ema20"] > c["ema50"], E, "LONG"),
+            Rule("ema_trend", "EMA trend up", lambda c: c["ema20"] < c["ema50"], E, "SHORT"),
+        ]
+
+    # ===== RSI =====
+    if cfg.ENABLE_RSI:
+        lo_l, hi_l = cfg.RSI_LONG_MIN, cfg.RSI_LONG_MAX
+        lo_s, hi_s = cfg.RSI_SHORT_MIN, cfg.RSI_SHORT_MAX
+        R = ("rsi",)
+        rules += [
+            Rule("rsi_ready", "RSI not ready", _ready(*R), R, ready=True),
+            Rule("rsi_range", "RSI out of LONG range",
+                 lambda c: (c["rsi"] >= lo_l) & (c["rsi"] <= hi_l), R, "LONG"),
+            Rule("rsi_range", "RSI out of SHORT range",
+                 lambda c: (c["rsi"] >= lo_s) & (c["rsi"] <= hi_s), R, "SHORT"),
+        ]
 
-        gap = abs(ctx["ema20"] - ctx["ema50"]) / ctx["ema50"]
+    # ===== MACD =====
+    if cfg.ENABLE_MACD:
+        min_long, max_short = cfg.MACD_HIST_MIN_LONG, cfg.MACD_HIST_MAX_SHORT
+        M = ("macd",)
+        rules += [
+            Rule("macd_ready", "MACD not ready", _ready(*M), M, ready=True),
+            Rule("macd_strength", "MACD weak", lambda c: c["macd"] >= min_long, M, "LONG"),
+            Rule("macd_strength", "MACD weak", lambda c: c["macd"] <= max_short, M, "SHORT"),
+        ]
 
-        if gap < REGIME_EMA_GAP:
-            reasons.append("EMA gap too small")
+    return rules
 
-        if side == "LONG" and ctx["ema20"] <= ctx["ema50"]:
-            reasons.append("EMA trend down")
 
-        if side == "SHORT" and ctx["ema20"] >= ctx["ema50"]:
-            reasons.append("EMA trend up")
+class AlertPredicate:
+    def __init__(self, rules: List[Rule], *, spread_max: Optional[float], cooldown: int):
+        self.rules = tuple(rules)
+        self.spread_max = spread_max
+        self.cooldown = cooldown
 
-    # ===== RSI =====
-    if ENABLE_RSI:
-        if ctx["rsi"] is None:
-            return False, ["RSI not ready"]
+        # metrics
+        self.candidates = 0
+        self.passed = 0
+        names = [r.name for r in self.rules]
+        if spread_max is not None:
+            names.append("spread")
+        names.append("cooldown")
+        self.rejects: Dict[str, int] = dict.fromkeys(names, 0)
 
-        if side == "LONG" and not (RSI_LONG_MIN <= ctx["rsi"] <= RSI_LONG_MAX):
-            reasons.append("RSI out of LONG range")
+    @property
+    def needs(self) -> List[str]:
+        """ctx key mà các rule đọc (theo thứ tự xuất hiện)."""
+        return list(dict.fromkeys(k for r in self.rules for k in r.keys))
 
-        if side == "SHORT" and not (RSI_SHORT_MIN <= ctx["rsi"] <= RSI_SHORT_MAX):
-            reasons.append("RSI out of SHORT range")
+    # --------------------------------------------------------
+    # batch (hot path)
+    # --------------------------------------------------------
+    def signal(self, cols: Cols, shape: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (long, short) chỉ theo rule (không spread / cooldown, không đếm metrics).
+        cols là mảng `shape` bất kỳ (vd symbols x bars cho sweep).
+        """
+        long_ok, short_ok = np.ones(shape, dtype=bool), np.ones(shape, dtype=bool)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for r in self.rules:
+                m = r.ok(cols)
+                if r.side != "SHORT":
+                    long_ok &= m
+                if r.side != "LONG":
+                    short_ok &= m
+        return long_ok, short_ok
 
-    # ===== MACD =====
-    if ENABLE_MACD:
-        if ctx["macd"] is None:
-            return False, ["MACD not ready"]
+    def evaluate(
+        self, cols: Cols, now: int, last_alert_sec: np.ndarray, spread: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Trả về (long_ok, short_ok) cho các hàng của cols."""
+        n = len(last_alert_sec)
+        rejects = self.rejects
+        alive = {"LONG": np.ones(n, dtype=bool), "SHORT": np.ones(n, dtype=bool)}
+
+        def apply(name: str, m: np.ndarray, sides) -> None:
+            for s in sides:
+                a = alive[s]
+                rejects[name] += int(np.count_nonzero(a & ~m))
+                a &= m
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for r in self.rules:
+                apply(r.name, r.ok(cols), (r.side,) if r.side else ("LONG", "SHORT"))
+            if self.spread_max is not None:
+                apply("spread", ~(spread > self.spread_max), ("LONG", "SHORT"))
+        cool = now - last_alert_sec >= self.cooldown
+        apply("cooldown", cool, ("LONG", "SHORT"))
+
+        long_ok, short_ok = alive["LONG"], alive["SHORT"]
+        if self.cooldown > 0:
+            # LONG vừa bắn -> cooldown chặn SHORT cùng symbol cùng bar
+            apply("cooldown", ~long_ok, ("SHORT",))
+
+        self.candidates += 2 * n
+        self.passed += int(np.count_nonzero(long_ok) + np.count_nonzero(short_ok))
+        return long_ok, short_ok
+
+    # --------------------------------------------------------
+    # reason string (debug / scalar API, không đếm metrics)
+    # --------------------------------------------------------
+    def explain(self, ctx: dict, side: str) -> List[str]:
+        cols = {k: np.array([np.nan if v is None else v], dtype=float) for k, v in ctx.items()}
+        reasons = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for r in self.rules:
+                if r.side not in (None, side) or r.ok(cols)[0]:
+                    continue
+                if r.ready:
+                    return [r.reason]
+                reasons.append(r.reason)
+        return reasons
+
+    def stats(self) -> dict:
+        return {
+            "candidates": self.candidates,
+            "passed": self.passed,
+            **{f"reject_{k}": v for k, v in self.rejects.items()},
+        }
+
+
+def compile_predicate(cfg: Config = CFG, mode: Optional[str] = None) -> AlertPredicate:
+    return AlertPredicate(
+        compile_rules(cfg, mode or cfg.ALERT_MODE),
+        spread_max=cfg.SPREAD_MAX if cfg.ENABLE_SPREAD else None,
+        cooldown=cfg.COOLDOWN_SEC,
+    )
 
-        if side == "LONG" and ctx["macd"] < MACD_HIST_MIN_LONG:
-            reasons.append("MACD weak")
 
-        if side == "SHORT" and ctx["macd"] > MACD_HIST_MAX_SHORT:
-            reasons.append("MACD weak")
+# predicate mặc định (theo .env lúc import)
+PREDICATE = compile_predicate()
 
+
+# ============================================================
+# CONTEXT FILTER (scalar, 1 symbol / 1 side)
+# ============================================================
+def ctx_filters_signal(ctx: dict, side: str):
+    """
+    ctx keys:
+        rsi, rsi15
+        ema20, ema50, ema50_1h
+        macd
+        vol_ratio, vol_dir
+    """
+    reasons = PREDICATE.explain(ctx, side)
     if reasons:
         return False, reasons
 
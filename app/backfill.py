@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Optional, Set
+
+from .binance_client import rest_client
+from .config import BACKFILL_MAX_IDS, BINANCE_FUTURES_REST
+from .metrics import BACKFILL
+from .processor import Fill, Gap, TickProcessor
+
+# /fapi/v1/aggTrades: tối đa 1000 trade / request
+AGG_LIMIT = 1000
+
+
+# ============================================================
+# AGGTRADE BACKFILL
+# ------------------------------------------------------------
+# TickProcessor báo Gap (id nhảy cóc sau reconnect) -> submit()
+# tạo 1 task: lấy đúng đoạn id thiếu qua /fapi/v1/aggTrades
+# (fromId, REST client dùng chung: chung pool + weight budget
+# với warmup / universe) rồi chèn vào
+# bar đang mở bằng processor.backfill(). Scheduler gọi drain()
+# trước khi đóng bar để trade lấy lại kịp vào bar của nó.
+# Gap > max_ids (vd restart lâu, đã có gap fill klines) bỏ qua.
+# ============================================================
+class Backfiller:
+    def __init__(
+        self,
+        processor: TickProcessor,
+        *,
+        rest_base: str = BINANCE_FUTURES_REST,
+        max_ids: int = BACKFILL_MAX_IDS,
+    ):
+        self.processor = processor
+        self.rest_base = rest_base
+        self.max_ids = max_ids
+        self._tasks: Set[asyncio.Task] = set()
+
+        # stats
+        self.gaps = 0
+        self.missing = 0      # tổng số id thiếu
+        self.merged = 0
+        self.lost = 0         # trade lấy về nhưng bar đã đóng
+        self.skipped = 0      # gap quá lớn
+        self.errors = 0
+        self.requests = 0
+        self.last_ms: Optional[float] = None
+
+    def submit(self, gap: Gap) -> None:
+        """on_gap của TickProcessor (gọi trong handler, không chờ)."""
+        self.gaps += 1
+        self.missing += gap.size
+        if gap.size > self.max_ids:
+            self.skipped += 1
+            print(f"[backfill] {gap.symbol} gap {gap.size} ids > {self.max_ids}, skip")
+            return
+        task = asyncio.ensure_future(self._run(gap))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fetch(self, gap: Gap) -> List[Fill]:
+        client = rest_client(self.rest_base)
+        out: List[Fill] = []
+        start = gap.first
+        while start <= gap.last:
+            rows = await client.agg_trades(gap.symbol, start, min(AGG_LIMIT, gap.last - start + 1))
+            self.requests += 1
+            if not rows:
+                break
+            for r in rows:
+                a = int(r["a"])
+                if a <= gap.last:
+                    out.append((float(r["p"]), float(r["q"]), int(r["T"]), a))
+            start = int(rows[-1]["a"]) + 1
+        out.sort(key=lambda f: f[3])
+        return out
+
+    async def _run(self, gap: Gap) -> None:
+        t0 = time.perf_counter()
+        try:
+            fills = await self.fetch(gap)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            print(f"[backfill] {gap.symbol} {gap.first}..{gap.last} failed: {e}")
+            return
+        merged, lost = self.processor.backfill(gap, fills)
+        self.merged += merged
+        self.lost += lost
+        dt = time.perf_counter() - t0
+        BACKFILL.observe(dt)
+        self.last_ms = dt * 1000
+        print(f"[backfill] {gap.symbol} ids {gap.first}..{gap.last} "
+              f"got={len(fills)} merged={merged} lost={lost} in {self.last_ms:.0f}ms")
+
+    @property
+    def inflight(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float) -> None:
+        """Chờ các backfill đang chạy (tối đa timeout giây)."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    async def close(self) -> None:
+        for t in list(self._tasks):
+            t.cancel()
+        if self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+    def stats(self) -> dict:
+        return {
+            "gaps": self.gaps,
+            "missing_ids": self.missing,
+            "merged": self.merged,
+            "lost": self.lost,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "requests": self.requests,
+        }
@@ -1,23 +1,262 @@
-import requests
-from typing import List, Tuple
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-class BinanceFuturesClient:
-    def __init__(self, rest_base: str):
+import aiohttp
+
+from .config import BINANCE_FUTURES_REST, REST_CONCURRENCY, REST_RETRIES, REST_WEIGHT_LIMIT
+from .metrics import REST
+
+
+# ============================================================
+# Endpoint weight (bảng của Binance USDⓈ-M futures)
+# ============================================================
+def klines_weight(limit: int) -> int:
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+TICKER_24HR_ALL_WEIGHT = 40
+BOOK_TICKER_WEIGHT = 2
+AGG_TRADES_WEIGHT = 20
+
+
+def _retry_after(headers, default: float) -> float:
+    try:
+        return float(headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
+
+# ============================================================
+# Async client (1 pool keep-alive dùng chung, giới hạn concurrency)
+# ------------------------------------------------------------
+# - weight budget: trước mỗi request giữ chỗ `weight` trong phút
+#   hiện tại (Binance tính X-MBX-USED-WEIGHT-1M theo phút), đầy
+#   weight_limit thì chờ sang phút kế; header server trả về ghi đè
+#   ước lượng local nếu lớn hơn (process khác cùng IP).
+# - 429 / 418: chặn mọi request tới hết Retry-After; 429 thử lại
+#   (retries lần), 418 (IP bị ban) raise luôn.
+# - coalescing: request trùng path + params đang chạy -> chờ chung
+#   1 kết quả (vd universe + warmup cùng hỏi ticker/24hr).
+# rest_client(base) trả về client dùng chung của event loop hiện tại.
+# ============================================================
+class AsyncBinanceFuturesClient:
+    def __init__(
+        self,
+        rest_base: str,
+        *,
+        concurrency: int = REST_CONCURRENCY,
+        timeout: float = 10.0,
+        weight_limit: int = REST_WEIGHT_LIMIT,
+        retries: int = REST_RETRIES,
+    ):
         self.rest_base = rest_base.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.weight_limit = weight_limit
+        self.retries = retries
+        self._sem = asyncio.Semaphore(concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._minute = 0
+        self._used = 0                  # weight đã dùng trong phút hiện tại (ước lượng)
+        self._blocked_until = 0.0
+
+        # stats
+        self.requests = 0
+        self.weight = 0                  # tổng weight theo bảng của Binance
+        self.used_weight_1m: Optional[int] = None  # header X-MBX-USED-WEIGHT-1M gần nhất
+        self.coalesced = 0
+        self.throttled = 0               # số lần phải chờ budget / Retry-After
+        self.throttle_s = 0.0
+        self.rate_limited = 0            # 429
+        self.banned = 0                  # 418
+        self.errors = 0
+
+    async def __aenter__(self) -> "AsyncBinanceFuturesClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # --------------------------------------------------------
+    # scheduler
+    # --------------------------------------------------------
+    async def _reserve(self, weight: int) -> None:
+        while True:
+            now = time.time()
+            if now < self._blocked_until:
+                wait = self._blocked_until - now
+            else:
+                minute = int(now // 60)
+                if minute != self._minute:
+                    self._minute, self._used = minute, 0
+                if self._used + weight <= self.weight_limit or not self._used:
+                    self._used += weight
+                    return
+                wait = (minute + 1) * 60 - now + 0.05
+            self.throttled += 1
+            self.throttle_s += wait
+            await asyncio.sleep(wait)
+
+    def _observe_used(self, headers) -> None:
+        used = headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is None:
+            return
+        self.used_weight_1m = int(used)
+        if int(time.time() // 60) == self._minute:
+            self._used = max(self._used, self.used_weight_1m)
+
+    async def _request(self, path: str, params: Optional[Dict[str, Any]], weight: int) -> Any:
+        for _ in range(self.retries + 1):
+            await self._reserve(weight)
+            async with self._sem:
+                t0 = time.perf_counter()
+                async with self.session.get(f"{self.rest_base}{path}", params=params) as r:
+                    self.requests += 1
+                    self.weight += weight
+                    self._observe_used(r.headers)
+                    if r.status in (429, 418):
+                        wait = _retry_after(r.headers, 60.0 if r.status == 418 else 1.0)
+                        self._blocked_until = max(self._blocked_until, time.time() + wait)
+                        print(f"[rest] {r.status} {path} -> pause {wait:g}s")
+                        if r.status == 418:
+                            self.banned += 1
+                            raise RuntimeError(f"Binance REST error 418 (IP banned) {path}")
+                        self.rate_limited += 1
+                        continue
+                    if r.status != 200:
+                        raise RuntimeError(f"Binance REST error {r.status} {path}")
+                    data = await r.json(content_type=None)
+                REST.observe(time.perf_counter() - t0)
+                return data
+        raise RuntimeError(f"Binance REST error 429 after {self.retries} retries {path}")
 
-    def top_symbols_by_quote_volume(self, top_n: int) -> List[str]:
-        url = f"{self.rest_base}/fapi/v1/ticker/24hr"
-        data = requests.get(url, timeout=10).json()
-        data.sort(key=lambda x: float(x.get("quoteVolume", 0.0)), reverse=True)
-        syms = [x["symbol"] for x in data if x.get("symbol", "").endswith("USDT")]
-        return syms[:top_n]
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None, *, weight: int = 1) -> Any:
+        key = (path, tuple(sorted((params or {}).items())))
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut)
 
-    def book_ticker(self, symbol: str) -> Tuple[float, float]:
-        url = f"{self.rest_base}/fapi/v1/ticker/bookTicker?symbol={symbol}"
-        j = requests.get(url, timeout=10).json()
+        fut = asyncio.ensure_future(self._request(path, params, weight))
+        self._inflight[key] = fut
+
+        def done(f: asyncio.Future) -> None:
+            self._inflight.pop(key, None)
+            if not f.cancelled() and f.exception() is not None:
+                self.errors += 1
+
+        fut.add_done_callback(done)
+        return await asyncio.shield(fut)
+
+    # --------------------------------------------------------
+    # endpoints
+    # --------------------------------------------------------
+    async def ticker_24hr(self) -> List[dict]:
+        return await self.get("/fapi/v1/ticker/24hr", weight=TICKER_24HR_ALL_WEIGHT)
+
+    async def top_symbols_by_quote_volume(self, top_n: int) -> List[str]:
+        data = await self.ticker_24hr()
+        rows = []
+        for it in data:
+            sym = it.get("symbol", "")
+            if not sym.endswith("USDT"):
+                continue
+            try:
+                qv = float(it.get("quoteVolume", 0.0))
+            except (TypeError, ValueError):
+                qv = 0.0
+            rows.append((qv, sym))
+        rows.sort(reverse=True, key=lambda x: x[0])
+        return [sym for _, sym in rows[:top_n]]
+
+    async def book_ticker(self, symbol: str) -> Tuple[float, float]:
+        j = await self.get("/fapi/v1/ticker/bookTicker", {"symbol": symbol}, weight=BOOK_TICKER_WEIGHT)
         return float(j["bidPrice"]), float(j["askPrice"])
 
-    def klines_close(self, symbol: str, interval: str = "1m", limit: int = 240) -> List[float]:
-        url = f"{self.rest_base}/fapi/v1/klines?symbol={symbol}&interval={interval}&limit={limit}"
-        rows = requests.get(url, timeout=10).json()
+    async def agg_trades(self, symbol: str, from_id: int, limit: int = 1000) -> List[dict]:
+        return await self.get(
+            "/fapi/v1/aggTrades", {"symbol": symbol, "fromId": from_id, "limit": limit},
+            weight=AGG_TRADES_WEIGHT,
+        )
+
+    async def klines(
+        self, symbol: str, interval: str = "1m", limit: int = 240, start_ms: Optional[int] = None
+    ) -> List[list]:
+        params: Dict[str, Any] = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_ms is not None:
+            params["startTime"] = start_ms
+        return await self.get("/fapi/v1/klines", params, weight=klines_weight(limit))
+
+    async def klines_close(self, symbol: str, interval: str = "1m", limit: int = 240) -> List[float]:
+        rows = await self.klines(symbol, interval, limit)
         return [float(r[4]) for r in rows]  # close
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "weight": self.weight,
+            "used_weight_1m": self.used_weight_1m or 0,
+            "budget_used": self._used,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled,
+            "throttle_s": round(self.throttle_s, 2),
+            "rate_limited": self.rate_limited,
+            "banned": self.banned,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
+
+
+# ============================================================
+# Shared client (1 / rest_base / event loop)
+# ------------------------------------------------------------
+# Budget REST_WEIGHT_LIMIT là của cả IP: WORKERS=N process cùng
+# IP -> mỗi worker gọi share_weight(N) trước khi tạo client.
+# ============================================================
+_CLIENTS: Dict[Tuple[str, int], AsyncBinanceFuturesClient] = {}
+_WEIGHT_SHARE = 1
+
+
+def share_weight(n: int) -> None:
+    global _WEIGHT_SHARE
+    _WEIGHT_SHARE = max(1, n)
+    for client in _CLIENTS.values():
+        client.weight_limit = max(1, REST_WEIGHT_LIMIT // _WEIGHT_SHARE)
+
+
+def rest_client(rest_base: str = BINANCE_FUTURES_REST) -> AsyncBinanceFuturesClient:
+    key = (rest_base.rstrip("/"), id(asyncio.get_running_loop()))
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _CLIENTS[key] = AsyncBinanceFuturesClient(
+            rest_base, weight_limit=max(1, REST_WEIGHT_LIMIT // _WEIGHT_SHARE)
+        )
+    return client
+
+
+async def close_rest_clients() -> None:
+    loop = id(asyncio.get_running_loop())
+    for key in [k for k in _CLIENTS if k[1] == loop]:
+        await _CLIENTS.pop(key).close()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .config import BOOK_MAX_STALE_SEC
+from .decode import book_quote
+
+
+# ============================================================
+# TOP OF BOOK (lazy, conflated)
+# ------------------------------------------------------------
+# bookTicker là stream nhiều frame nhất nhưng bid/ask chỉ được
+# đọc lúc bar close (spread gate) và khi gửi alert. Handler chỉ
+# lấy symbol (pre-filter của decoder) rồi ghi đè frame thô vào
+# pending[symbol]; frame chưa đọc bị ghi đè = conflated. Đọc
+# spread / mid mới flush(): parse frame mới nhất của mỗi symbol
+# vào store.bid / store.ask -> CPU theo số lần đọc, không theo
+# số frame.
+# Frame có transaction time cũ hơn max_stale_ms lúc đọc (stream
+# chết / event loop đang dồn frame) bị bỏ, bid/ask về NaN = chưa
+# có book (spread gate không chặn). max_stale_ms = 0 -> tắt.
+# ============================================================
+class TopOfBook:
+    def __init__(
+        self,
+        *,
+        max_stale_ms: float = BOOK_MAX_STALE_SEC * 1000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.pending: Dict[str, object] = {}   # symbol -> frame bookTicker thô mới nhất
+        self.max_stale_ms = max_stale_ms
+        self.clock = clock
+
+        # counters (received = parsed + conflated + stale + errors + pending)
+        self.received = 0
+        self.parsed = 0
+        self.conflated = 0
+        self.stale = 0
+        self.errors = 0
+
+    def ingest(self, frames: Iterable, symbol: Callable[[object], Optional[str]]) -> None:
+        """symbol(raw) -> symbol đang theo dõi hoặc None (Decoder.symbol)."""
+        pending = self.pending
+        before = len(pending)
+        kept = 0
+        for raw in frames:
+            sym = symbol(raw)
+            if sym is not None:
+                pending[sym] = raw
+                kept += 1
+        self.received += kept
+        self.conflated += kept - (len(pending) - before)
+
+    def flush(
+        self,
+        ids: Dict[str, int],
+        bid: np.ndarray,
+        ask: np.ndarray,
+        symbols: Optional[Sequence[str]] = None,
+    ) -> None:
+        """Parse frame đang chờ của `symbols` (None = tất cả) vào bid/ask."""
+        pending = self.pending
+        if not pending:
+            return
+        if symbols is None:
+            items = list(pending.items())
+            pending.clear()
+        else:
+            items = [(s, pending.pop(s)) for s in symbols if s in pending]
+
+        max_stale = self.max_stale_ms
+        now_ms = self.clock() * 1000 if max_stale > 0 else 0.0
+        for sym, raw in items:
+            i = ids.get(sym)
+            if i is None:
+                continue
+            try:
+                b, a, t_ms = book_quote(raw)
+            except (TypeError, ValueError):
+                self.errors += 1
+                continue
+            if max_stale > 0 and t_ms and now_ms - t_ms > max_stale:
+                self.stale += 1
+                bid[i] = ask[i] = np.nan
+                continue
+            bid[i] = b
+            ask[i] = a
+            self.parsed += 1
+
+    def discard(self, symbols: Iterable[str]) -> None:
+        for s in symbols:
+            self.pending.pop(s, None)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "parsed": self.parsed,
+            "skipped": self.conflated + self.stale,
+            "conflated": self.conflated,
+            "stale": self.stale,
+            "errors": self.errors,
+            "pending": len(self.pending),
+        }
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import signal
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .binance_client import close_rest_clients, rest_client, share_weight
+from .config import (
+    COOLDOWN_SEC,
+    HEARTBEAT_SEC,
+    METRICS_PORT,
+    MYSQL_ALERT_TABLE,
+    RECORD_PATH,
+    SNAPSHOT_PATH,
+    SNAPSHOT_SEC,
+    WORKER_TIMEOUT_SEC,
+)
+from .main import (
+    alert_row,
+    db_bar_sink,
+    load_state,
+    register_strategies,
+    start_delivery,
+    start_metrics,
+    stale_after,
+    start_writer,
+    ws_bars,
+    ws_bookticker,
+)
+from .metrics import register_stats, register_store, run_heartbeat
+from .pipeline import format_alert
+from .recorder import TickRecorder
+from .snapshot import run_snapshots, save
+from .strategy import Profile, load_profiles
+from .universe import Universe
+from .utils import backoff_s
+
+# ============================================================
+# MULTI-PROCESS MODE
+# ------------------------------------------------------------
+# WORKERS=N: N process worker, mỗi worker giữ 1 partition symbol
+# (hash ổn định) với WS shard + SymbolStore + snapshot riêng.
+# Coordinator (process chính) nhận message qua 1 mp.Queue:
+#   ("hb",    k, sent_at)
+#   ("alert", k, now, side, sym, price, spread, profile)
+#   ("row",   k, table, row)          -> BulkWriter
+# và là nơi duy nhất gửi Telegram / ghi MySQL, chặn alert trùng
+# + cooldown theo (profile, symbol) (worker restart mất state vẫn
+# không spam).
+# Supervisor restart worker chết / treo (không heartbeat).
+# Mỗi worker tự chạy Universe với partition của mình (symbol mới
+# vào top rơi vào worker owner(symbol)); worker được restart xếp
+# hạng lại ngay lúc start (partition lúc khởi động đã cũ).
+# Heartbeat chạy từ trước load_state (warmup dài không bị coi là
+# treo), budget REST weight chia đều N worker (cùng 1 IP).
+# ============================================================
+HB_SEC = 5.0
+
+
+def owner(symbol: str, n: int) -> int:
+    """crc32 thay vì hash() (hash str đổi theo process)."""
+    return zlib.crc32(symbol.encode()) % n
+
+
+def partition(symbols: Sequence[str], n: int) -> List[List[str]]:
+    parts: List[List[str]] = [[] for _ in range(n)]
+    for s in dict.fromkeys(symbols):
+        parts[owner(s, n)].append(s)
+    return parts
+
+
+# ============================================================
+# WORKER PROCESS
+# ============================================================
+class QueueWriter:
+    """Cùng interface write(table, row) với BulkWriter, chuyển về coordinator."""
+
+    def __init__(self, k: int, q):
+        self.k = k
+        self.q = q
+
+    def write(self, table: str, row: dict) -> None:
+        self.q.put(("row", self.k, table, row))
+
+
+async def _heartbeat(k: int, q) -> None:
+    while True:
+        q.put(("hb", k, time.time()))
+        await asyncio.sleep(HB_SEC)
+
+
+async def _worker(k: int, n: int, symbols: List[str], q, mysql: bool, restarted: bool = False) -> None:
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    snap = f"{SNAPSHOT_PATH}.w{k}" if SNAPSHOT_PATH else ""
+    share_weight(n)
+
+    print(f">>> worker {k} starting | symbols={len(symbols)}{' (restart)' if restarted else ''}")
+    hb = asyncio.ensure_future(_heartbeat(k, q))
+    try:
+        await _serve(k, n, symbols, q, mysql, restarted, snap)
+    finally:
+        hb.cancel()
+        await close_rest_clients()
+
+
+async def _serve(k: int, n: int, symbols: List[str], q, mysql: bool, restarted: bool, snap: str) -> None:
+    store = await load_state(symbols, snap)
+
+    def sink(profile: str):
+        def emit(now: int, side: str, sym: str, price: float) -> None:
+            q.put(("alert", k, now, side, sym, price, store.spread(store.ids[sym]), profile))
+
+        return emit
+
+    for strat in store.strategies:
+        strat.sink = sink(strat.name)
+    emit = store.strategies[0].sink
+
+    if mysql:
+        bar_sink = db_bar_sink(store, QueueWriter(k, q))
+        for bars in store.bars.levels:
+            store.bars.subscribe(bars.tf_sec, bar_sink)
+
+    recorder = TickRecorder(f"{RECORD_PATH}.w{k}") if RECORD_PATH else None
+
+    # coordinator giữ METRICS_PORT, worker k dùng METRICS_PORT+1+k
+    register_store(store)
+    register_strategies(store)
+    metrics = await start_metrics(METRICS_PORT + 1 + k if METRICS_PORT > 0 else 0)
+
+    # universe: worker tự xếp hạng lại, chỉ giữ symbol thuộc partition k
+    universe = Universe(store, keep=lambda s: owner(s, n) == k)
+    register_stats("universe", universe.stats)
+    register_stats("book", store.book.stats)
+    register_stats("rest", rest_client().stats)
+    if restarted:
+        # chưa có stream nào attach: rotate chỉ sửa store, stream mở với symbol mới
+        await universe.refresh()
+
+    tasks = [
+        ws_bookticker(store, recorder=recorder, universe=universe),
+        ws_bars(store, emit=emit, recorder=recorder, universe=universe),
+        run_heartbeat(HEARTBEAT_SEC, store, stale_sec=stale_after(HEARTBEAT_SEC)),
+        universe.run(),
+    ]
+    if snap and SNAPSHOT_SEC > 0:
+        tasks.append(run_snapshots(store, snap, SNAPSHOT_SEC))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if snap:
+            try:
+                save(store, snap)
+            except Exception as e:
+                print("snapshot error:", e)
+        if recorder is not None:
+            recorder.close()
+        if metrics is not None:
+            await metrics.cleanup()
+
+
+def worker_main(k: int, n: int, symbols: List[str], q, mysql: bool, restarted: bool = False) -> None:
+    try:
+        asyncio.run(_worker(k, n, symbols, q, mysql, restarted))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+# ============================================================
+# SUPERVISOR
+# ============================================================
+class WorkerHandle:
+    def __init__(self, ctx, k: int, n: int, symbols: List[str], q, mysql: bool):
+        self.ctx = ctx
+        self.k = k
+        self.n = n
+        self.symbols = symbols
+        self.q = q
+        self.mysql = mysql
+        self.proc: Optional[mp.process.BaseProcess] = None
+
+        self.last_hb = 0.0
+        self.restarts = 0
+        self.attempt = 0
+        self.next_start = 0.0
+
+    def start(self) -> None:
+        self.proc = self.ctx.Process(
+            target=worker_main,
+            args=(self.k, self.n, self.symbols, self.q, self.mysql, self.restarts > 0),
+            name=f"worker-{self.k}",
+            daemon=True,
+        )
+        self.proc.start()
+        # lần đầu còn warmup -> tính timeout từ lúc start
+        self.last_hb = time.monotonic()
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.is_alive()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.proc is None:
+            return
+        self.proc.terminate()   # SIGTERM -> worker ghi snapshot rồi thoát
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+
+
+async def supervise(workers: List[WorkerHandle], timeout: float = WORKER_TIMEOUT_SEC) -> None:
+    while True:
+        await asyncio.sleep(1.0)
+        now = time.monotonic()
+        for w in workers:
+            if w.alive() and now - w.last_hb > timeout:
+                print(f"[cluster] worker {w.k} no heartbeat for {now - w.last_hb:.0f}s -> kill")
+                w.proc.kill()
+                w.proc.join()
+
+            if w.alive():
+                continue
+            if w.next_start == 0.0:
+                code = w.proc.exitcode if w.proc is not None else None
+                w.next_start = now + backoff_s(w.attempt)
+                print(f"[cluster] worker {w.k} died (exit={code}), restart in {w.next_start - now:.1f}s")
+            elif now >= w.next_start:
+                w.next_start = 0.0
+                w.attempt += 1
+                w.restarts += 1
+                w.start()
+
+
+# ============================================================
+# COORDINATOR: dedup + cooldown + egress
+# ============================================================
+class AlertGate:
+    def __init__(self, cooldown: int = COOLDOWN_SEC, cooldowns: Optional[Dict[str, int]] = None):
+        self.cooldown = cooldown
+        self.cooldowns = cooldowns or {}          # profile -> cooldown riêng
+        self.last: Dict[Tuple[str, str], int] = {}
+        self.seen: Dict[Tuple[str, str, str, int], None] = {}
+
+        # metrics
+        self.received = 0
+        self.duplicates = 0
+        self.cooled = 0
+        self.passed = 0
+
+    def allow(self, now: int, side: str, sym: str, profile: str = "") -> bool:
+        self.received += 1
+        key = (profile, sym, side, now)
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen[key] = None
+        if len(self.seen) > 10_000:
+            for old in list(self.seen)[:5_000]:
+                del self.seen[old]
+
+        if now - self.last.get((profile, sym), 0) < self.cooldowns.get(profile, self.cooldown):
+            self.cooled += 1
+            return False
+        self.last[(profile, sym)] = now
+        self.passed += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "passed": self.passed,
+            "duplicates": self.duplicates,
+            "cooldown": self.cooled,
+        }
+
+
+def _pump(q, loop: asyncio.AbstractEventLoop, handle) -> None:
+    """Thread đọc mp.Queue (blocking) -> đẩy vào event loop."""
+    while True:
+        msg = q.get()
+        if msg is None:
+            return
+        loop.call_soon_threadsafe(handle, msg)
+
+
+async def run_cluster(symbols: Sequence[str], n_workers: int) -> None:
+    parts = partition(symbols, n_workers)
+    print(
+        f">>> starting cluster | symbols={sum(map(len, parts))} workers={n_workers} "
+        f"| partition={[len(p) for p in parts]}"
+    )
+
+    ctx = mp.get_context("spawn")
+    q = ctx.Queue()
+    delivery = await start_delivery()
+    writer = start_writer()
+    profiles: Dict[str, Profile] = {p.name: p for p in load_profiles()}
+    gate = AlertGate(cooldowns={p.name: p.cfg.COOLDOWN_SEC for p in profiles.values()})
+    named = len(profiles) > 1
+
+    delivery.enqueue(
+        f"✅ Bot STARTED | PROFILE={','.join(n.upper() for n in profiles)} | symbols={sum(map(len, parts))} "
+        f"| workers={n_workers}"
+    )
+
+    workers = [WorkerHandle(ctx, k, n_workers, p, q, writer is not None) for k, p in enumerate(parts)]
+    by_k = {w.k: w for w in workers}
+
+    def handle(msg) -> None:
+        kind, k = msg[0], msg[1]
+        w = by_k[k]
+        if kind == "hb":
+            w.last_hb = time.monotonic()
+            w.attempt = 0
+        elif kind == "alert":
+            _, _, now, side, sym, price, spread, name = msg
+            if gate.allow(now, side, sym, name):
+                p = profiles.get(name) if named else None
+                delivery.enqueue(
+                    format_alert(side, sym, price, p and p.name), key=now,
+                    chat_id=(p.chat_id or None) if p else None,
+                )
+                if writer is not None:
+                    writer.write(MYSQL_ALERT_TABLE, alert_row(now, side, sym, price, spread, p and p.name))
+        elif kind == "row" and writer is not None:
+            writer.write(msg[2], msg[3])
+
+    async def log_cluster(every: float = HEARTBEAT_SEC) -> None:
+        while True:
+            await asyncio.sleep(every)
+            ws = " ".join(
+                f"w{w.k}:{'up' if w.alive() else 'down'}/rs={w.restarts}" for w in workers
+            )
+            print(f"[cluster] {ws} | alerts {gate.stats()}")
+            print(f"[telegram] {delivery.stats()}")
+            if writer is not None:
+                print(f"[mysql] {writer.stats()}")
+
+    register_stats("alerts", gate.stats)
+    register_stats("telegram", delivery.stats)
+    if writer is not None:
+        register_stats("mysql", writer.stats)
+    metrics = await start_metrics()
+
+    loop = asyncio.get_running_loop()
+    pump = threading.Thread(target=_pump, args=(q, loop, handle), name="ipc-pump", daemon=True)
+    pump.start()
+    for w in workers:
+        w.start()
+
+    try:
+        await asyncio.gather(supervise(workers), log_cluster())
+    finally:
+        await loop.run_in_executor(None, lambda: [w.stop() for w in workers])
+        q.put(None)
+        await delivery.stop()
+        if writer is not None:
+            await loop.run_in_executor(None, writer.stop)
+        if metrics is not None:
+            await metrics.cleanup()
@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -38,19 +38,45 @@ class Config:
         "wss://fstream.binance.com/stream",
     )
     TOP_N: int = _i("TOP_N", 20)
+    # xếp lại top TOP_N theo quoteVolume mỗi UNIVERSE_SEC (0 = giữ nguyên lúc khởi động);
+    # symbol đang chạy chỉ bị loại khi rơi khỏi top TOP_N + UNIVERSE_BUFFER
+    UNIVERSE_SEC: int = _i("UNIVERSE_SEC", 3600)
+    UNIVERSE_BUFFER: int = _i("UNIVERSE_BUFFER", 5)
 
     # ===== Alert / Strategy Mode =====
     ALERT_PROFILE: str = _s("ALERT_PROFILE", "trade")   # trade | test
     ALERT_MODE: str = _s("ALERT_MODE", "signal")        # signal | rsi | macd
+    # nhiều strategy chạy chung 1 process: "name:mode,..." (vd "trend:signal,scalp:rsi")
+    # rỗng -> 1 profile ALERT_PROFILE/ALERT_MODE; override từng profile qua
+    # env <NAME>_<FIELD> (vd SCALP_COOLDOWN_SEC=300, SCALP_TELEGRAM_CHAT_ID=...)
+    PROFILES: str = _s("PROFILES", "")
 
     # ===== Telegram =====
     TELEGRAM_BOT_TOKEN: str = _s("TELEGRAM_BOT_TOKEN", "")
     TELEGRAM_CHAT_ID: str = _s("TELEGRAM_CHAT_ID", "")
+    TELEGRAM_QUEUE_MAX: int = _i("TELEGRAM_QUEUE_MAX", 1000)
+    TELEGRAM_GLOBAL_RATE: float = _f("TELEGRAM_GLOBAL_RATE", 30.0)   # msg/s toàn bot
+    TELEGRAM_CHAT_RATE: float = _f("TELEGRAM_CHAT_RATE", 1.0)        # msg/s mỗi chat
+
+    # ===== MySQL (bulk writer chạy nền) =====
+    MYSQL_ENABLED: int = _i("MYSQL_ENABLED", 0)
+    MYSQL_HOST: str = _s("MYSQL_HOST", "127.0.0.1")
+    MYSQL_PORT: int = _i("MYSQL_PORT", 3306)
+    MYSQL_USER: str = _s("MYSQL_USER", "")
+    MYSQL_PASSWORD: str = _s("MYSQL_PASSWORD", "")
+    MYSQL_DATABASE: str = _s("MYSQL_DATABASE", "")
+    MYSQL_BAR_TABLE: str = _s("MYSQL_BAR_TABLE", "bars")
+    MYSQL_ALERT_TABLE: str = _s("MYSQL_ALERT_TABLE", "alerts")
+    MYSQL_BATCH: int = _i("MYSQL_BATCH", 500)
+    MYSQL_FLUSH_SEC: float = _f("MYSQL_FLUSH_SEC", 2.0)
+    MYSQL_MAX_BUFFER: int = _i("MYSQL_MAX_BUFFER", 50000)
+    MYSQL_SPILL_PATH: str = _s("MYSQL_SPILL_PATH", "mysql_spill.jsonl")
 
     # ===== Loop / Debug =====
     LOOP_SEC: int = _i("LOOP_SEC", 10)
     HEARTBEAT_SEC: int = _i("HEARTBEAT_SEC", 60)
     DEBUG_ENABLED: int = _i("DEBUG_ENABLED", 1)
+    ALERT_DEBUG: int = _i("ALERT_DEBUG", 0)   # 1 -> in lý do bị chặn của từng symbol mỗi bar
 
     # ===== Global Risk Control =====
     COOLDOWN_SEC: int = _i("COOLDOWN_SEC", 600)
@@ -82,12 +108,83 @@ class Config:
     MACD_HIST_MIN_LONG: float = _f("MACD_HIST_MIN_LONG", -0.00015)
     MACD_HIST_MAX_SHORT: float = _f("MACD_HIST_MAX_SHORT", 0.00015)
 
+    # ===== Warm-up (seed indicator từ klines lúc khởi động) =====
+    WARMUP_ENABLED: int = _i("WARMUP_ENABLED", 1)
+    WARMUP_BARS: int = _i("WARMUP_BARS", 300)
+
+    # ===== REST (1 client dùng chung: pool keep-alive + weight budget / phút) =====
+    REST_CONCURRENCY: int = _i("REST_CONCURRENCY", 10)
+    REST_WEIGHT_LIMIT: int = _i("REST_WEIGHT_LIMIT", 1800)     # Binance: 2400 / phút / IP, chừa headroom
+    REST_RETRIES: int = _i("REST_RETRIES", 3)                  # số lần thử lại khi 429
+
+    # ===== Nguồn bar 5m: aggtrade (mọi trade) | kline (chỉ kline_5m đã đóng, ít frame / CPU hơn nhiều) =====
+    INGEST_MODE: str = _s("INGEST_MODE", "aggtrade")
+    KLINE_WAIT_SEC: float = _f("KLINE_WAIT_SEC", 3.0)          # scheduler chờ kline đóng của mọi symbol
+    KLINE_FILL_ENABLED: int = _i("KLINE_FILL_ENABLED", 1)      # kline vẫn thiếu -> lấy qua REST /fapi/v1/klines
+
+    # ===== aggTrade gap (id nhảy cóc sau reconnect) -> lấy lại qua REST /fapi/v1/aggTrades =====
+    BACKFILL_ENABLED: int = _i("BACKFILL_ENABLED", 1)
+    BACKFILL_MAX_IDS: int = _i("BACKFILL_MAX_IDS", 5000)       # gap lớn hơn -> bỏ qua
+    BACKFILL_WAIT_SEC: float = _f("BACKFILL_WAIT_SEC", 3.0)    # scheduler chờ backfill trước khi đóng bar
+
+    # ===== Bar close (scheduler chờ thêm grace sau biên bar) =====
+    BAR_CLOSE_GRACE_SEC: float = _f("BAR_CLOSE_GRACE_SEC", 2.0)
+
+    # ===== WS sharding (0 = tự tính theo WS_MAX_STREAMS) =====
+    WS_MAX_STREAMS: int = _i("WS_MAX_STREAMS", 200)
+    WS_SHARDS: int = _i("WS_SHARDS", 0)
+
+    # ===== WS decoder: auto | orjson | json | scan =====
+    DECODER: str = _s("DECODER", "auto")
+
+    # ===== bookTicker: 1 = giữ frame thô, chỉ parse khi đọc spread (RECORD_PATH -> parse hết) =====
+    BOOK_LAZY: int = _i("BOOK_LAZY", 1)
+    BOOK_MAX_STALE_SEC: float = _f("BOOK_MAX_STALE_SEC", 0.0)   # book cũ hơn -> bỏ (0 = tắt)
+
+    # ===== Recording (rỗng = tắt) =====
+    RECORD_PATH: str = _s("RECORD_PATH", "")
+
+    # ===== State snapshot (restore lúc khởi động, SNAPSHOT_SEC=0 -> chỉ ghi lúc tắt) =====
+    SNAPSHOT_PATH: str = _s("SNAPSHOT_PATH", "state.snap")
+    SNAPSHOT_SEC: int = _i("SNAPSHOT_SEC", 60)
+
+    # ===== Multi-process (WORKERS<=1 -> 1 process như cũ) =====
+    WORKERS: int = _i("WORKERS", 0)
+    WORKER_TIMEOUT_SEC: float = _f("WORKER_TIMEOUT_SEC", 60.0)   # không có heartbeat -> restart
+
+    # ===== Metrics (/metrics Prometheus, METRICS_PORT=0 -> tắt) =====
+    METRICS_HOST: str = _s("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = _i("METRICS_PORT", 9108)
+
 
 # ============================================================
 # Singleton export (RẤT QUAN TRỌNG)
 # ============================================================
 CFG = Config()
 
+
+def profile_config(name: str, base: Config = CFG) -> Config:
+    """
+    Config của 1 profile: base + env <NAME>_<FIELD> (ép theo kiểu của
+    field). Giá trị sai kiểu (vd SCALP_COOLDOWN_SEC=5m) -> ValueError
+    nêu tên biến, không lặng lẽ dùng giá trị base.
+    """
+    prefix = name.upper() + "_"
+    over = {}
+    for f in fields(Config):
+        raw = os.getenv(prefix + f.name)
+        if raw is None:
+            continue
+        kind = type(getattr(base, f.name))
+        try:
+            over[f.name] = kind(raw.strip())
+        except ValueError:
+            raise ValueError(
+                f"profile {name}: {prefix + f.name}={raw!r} is not a valid {kind.__name__}"
+            ) from None
+    return replace(base, **over)
+
+
 # ============================================================
 # Backward-compatible exports
 # (để main.py / alert_engine.py import trực tiếp)
@@ -95,16 +192,36 @@ CFG = Config()
 BINANCE_FUTURES_REST = CFG.BINANCE_FUTURES_REST
 BINANCE_FUTURES_WS = CFG.BINANCE_FUTURES_WS
 TOP_N = CFG.TOP_N
+UNIVERSE_SEC = CFG.UNIVERSE_SEC
+UNIVERSE_BUFFER = CFG.UNIVERSE_BUFFER
 
 ALERT_PROFILE = CFG.ALERT_PROFILE
 ALERT_MODE = CFG.ALERT_MODE
+PROFILES = CFG.PROFILES
 
 TELEGRAM_BOT_TOKEN = CFG.TELEGRAM_BOT_TOKEN
 TELEGRAM_CHAT_ID = CFG.TELEGRAM_CHAT_ID
+TELEGRAM_QUEUE_MAX = CFG.TELEGRAM_QUEUE_MAX
+TELEGRAM_GLOBAL_RATE = CFG.TELEGRAM_GLOBAL_RATE
+TELEGRAM_CHAT_RATE = CFG.TELEGRAM_CHAT_RATE
+
+MYSQL_ENABLED = CFG.MYSQL_ENABLED
+MYSQL_HOST = CFG.MYSQL_HOST
+MYSQL_PORT = CFG.MYSQL_PORT
+MYSQL_USER = CFG.MYSQL_USER
+MYSQL_PASSWORD = CFG.MYSQL_PASSWORD
+MYSQL_DATABASE = CFG.MYSQL_DATABASE
+MYSQL_BAR_TABLE = CFG.MYSQL_BAR_TABLE
+MYSQL_ALERT_TABLE = CFG.MYSQL_ALERT_TABLE
+MYSQL_BATCH = CFG.MYSQL_BATCH
+MYSQL_FLUSH_SEC = CFG.MYSQL_FLUSH_SEC
+MYSQL_MAX_BUFFER = CFG.MYSQL_MAX_BUFFER
+MYSQL_SPILL_PATH = CFG.MYSQL_SPILL_PATH
 
 LOOP_SEC = CFG.LOOP_SEC
 HEARTBEAT_SEC = CFG.HEARTBEAT_SEC
 DEBUG_ENABLED = CFG.DEBUG_ENABLED
+ALERT_DEBUG = CFG.ALERT_DEBUG
 
 COOLDOWN_SEC = CFG.COOLDOWN_SEC
 SPREAD_MAX = CFG.SPREAD_MAX
@@ -129,3 +246,35 @@ MACD_SLOW = CFG.MACD_SLOW
 MACD_SIGNAL = CFG.MACD_SIGNAL
 MACD_HIST_MIN_LONG = CFG.MACD_HIST_MIN_LONG
 MACD_HIST_MAX_SHORT = CFG.MACD_HIST_MAX_SHORT
+
+WARMUP_ENABLED = CFG.WARMUP_ENABLED
+WARMUP_BARS = CFG.WARMUP_BARS
+
+REST_CONCURRENCY = CFG.REST_CONCURRENCY
+REST_WEIGHT_LIMIT = CFG.REST_WEIGHT_LIMIT
+REST_RETRIES = CFG.REST_RETRIES
+
+RECORD_PATH = CFG.RECORD_PATH
+DECODER = CFG.DECODER
+BOOK_LAZY = CFG.BOOK_LAZY
+BOOK_MAX_STALE_SEC = CFG.BOOK_MAX_STALE_SEC
+WS_MAX_STREAMS = CFG.WS_MAX_STREAMS
+WS_SHARDS = CFG.WS_SHARDS
+BAR_CLOSE_GRACE_SEC = CFG.BAR_CLOSE_GRACE_SEC
+
+INGEST_MODE = CFG.INGEST_MODE
+KLINE_WAIT_SEC = CFG.KLINE_WAIT_SEC
+KLINE_FILL_ENABLED = CFG.KLINE_FILL_ENABLED
+
+BACKFILL_ENABLED = CFG.BACKFILL_ENABLED
+BACKFILL_MAX_IDS = CFG.BACKFILL_MAX_IDS
+BACKFILL_WAIT_SEC = CFG.BACKFILL_WAIT_SEC
+
+SNAPSHOT_PATH = CFG.SNAPSHOT_PATH
+SNAPSHOT_SEC = CFG.SNAPSHOT_SEC
+
+WORKERS = CFG.WORKERS
+WORKER_TIMEOUT_SEC = CFG.WORKER_TIMEOUT_SEC
+
+METRICS_HOST = CFG.METRICS_HOST
+METRICS_PORT = CFG.METRICS_PORT
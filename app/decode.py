@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+from typing import Callable, Iterable, Optional, Tuple
+
+try:  # parser nhanh nếu có cài
+    import orjson
+
+    _loads: Callable = orjson.loads
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover - tuỳ môi trường
+    _loads = json.loads
+    HAS_ORJSON = False
+
+__all__ = ["Decoder", "HAS_ORJSON", "book_quote", "frame_time", "kline_closed"]
+
+# (symbol, price, qty, trade_time_ms, agg_id)
+Trade = Tuple[str, float, float, int, int]
+# (symbol, bid, ask, time_ms)
+Book = Tuple[str, float, float, int]
+# kline đã đóng: (symbol, start_ms, open, high, low, close, volume, event_ms)
+Kline = Tuple[str, int, float, float, float, float, float, int]
+
+
+# ============================================================
+# FRAME DECODER (combined stream: {"stream": ..., "data": {...}})
+# ------------------------------------------------------------
+# 1) pre-filter: lấy "s" bằng str.find, symbol không theo dõi
+#    -> bỏ luôn, không parse.
+# 2) backend:
+#    - "orjson" / "json": parse rồi chỉ lấy field cần dùng
+#    - "scan": cắt thẳng field s/b/a/q/p/T/a (kline: field trong "k") bằng str.find,
+#      không dựng dict (nhanh hơn json stdlib khi không có orjson)
+#    - "auto": orjson nếu có, ngược lại scan
+# Trả về tuple hoặc None (frame lỗi / không liên quan).
+# kline: frame chưa đóng ("x":false) bị bỏ trước cả pre-filter
+# symbol (tính vào dropped), chỉ frame đóng bar mới parse.
+# ============================================================
+def _str_field(raw: str, key: str) -> Optional[str]:
+    # key dạng '"p":' -> giá trị chuỗi giữa 2 dấu " kế tiếp
+    k = raw.find(key)
+    if k < 0:
+        return None
+    k = raw.find('"', k + len(key)) + 1
+    if not k:
+        return None
+    return raw[k:raw.find('"', k)]
+
+
+def _int_field(raw: str, key: str) -> Optional[int]:
+    # key dạng '"T":' -> số nguyên tới , hoặc } (int() tự bỏ khoảng trắng)
+    k = raw.find(key)
+    if k < 0:
+        return None
+    k += len(key)
+    e = raw.find(",", k)
+    b = raw.find("}", k)
+    if e < 0 or 0 <= b < e:
+        e = b
+    return int(raw[k:e])
+
+
+def book_quote(raw) -> Tuple[float, float, int]:
+    """(bid, ask, time_ms) của 1 frame bookTicker (scan). Frame lỗi -> raise."""
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode()
+    return float(_str_field(raw, '"b":')), float(_str_field(raw, '"a":')), _int_field(raw, '"T":') or 0
+
+
+def frame_time(raw, key: str = '"T":') -> Optional[int]:
+    """Transaction time "T" của frame (lag của shard), không có / lỗi -> None.
+    kline: "T" là giờ đóng bar (tương lai) -> dùng event time key='"E":'."""
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode()
+    try:
+        return _int_field(raw, key)
+    except ValueError:
+        return None
+
+
+def kline_closed(raw: str) -> bool:
+    """Frame kline của bar đã đóng ("x":true), không parse frame."""
+    k = raw.find('"x":')
+    return k >= 0 and raw[k + 4:k + 10].lstrip().startswith("t")
+
+
+class Decoder:
+    def __init__(self, symbols: Iterable[str], backend: str = "auto"):
+        self.symbols = set(symbols)
+        if backend == "auto":
+            backend = "orjson" if HAS_ORJSON else "scan"
+        if backend == "orjson" and not HAS_ORJSON:
+            backend = "json"
+        if backend not in ("orjson", "json", "scan"):
+            raise ValueError(f"unknown decoder backend: {backend}")
+        self.backend = backend
+        self._loads = json.loads if backend == "json" else _loads
+
+        # counters
+        self.frames = 0
+        self.dropped = 0
+        self.errors = 0
+
+        if backend == "scan":
+            self.trade = self._trade_scan
+            self.book = self._book_scan
+            self.kline = self._kline_scan
+        else:
+            self.trade = self._trade_json
+            self.book = self._book_json
+            self.kline = self._kline_json
+
+    def symbol(self, raw) -> Optional[str]:
+        """Pre-filter: symbol của frame nếu đang theo dõi, ngược lại None."""
+        self.frames += 1
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        sym = _str_field(raw, '"s":')
+        if sym is None or sym not in self.symbols:
+            self.dropped += 1
+            return None
+        return sym
+
+    # --------------------------------------------------------
+    # json / orjson
+    # --------------------------------------------------------
+    def _trade_json(self, raw) -> Optional[Trade]:
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            d = self._loads(raw)["data"]
+            return sym, float(d["p"]), float(d["q"]), int(d.get("T", 0)), int(d.get("a", 0))
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _book_json(self, raw) -> Optional[Book]:
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            d = self._loads(raw)["data"]
+            return sym, float(d["b"]), float(d["a"]), int(d.get("T", 0))
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _kline_json(self, raw) -> Optional[Kline]:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        if not kline_closed(raw):
+            self.frames += 1
+            self.dropped += 1
+            return None
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            d = self._loads(raw)["data"]
+            k = d["k"]
+            return (sym, int(k["t"]), float(k["o"]), float(k["h"]), float(k["l"]),
+                    float(k["c"]), float(k["v"]), int(d.get("E", 0)))
+        except Exception:
+            self.errors += 1
+            return None
+
+    # --------------------------------------------------------
+    # scan (không dựng dict)
+    # --------------------------------------------------------
+    def _trade_scan(self, raw) -> Optional[Trade]:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            return (
+                sym,
+                float(_str_field(raw, '"p":')),
+                float(_str_field(raw, '"q":')),
+                _int_field(raw, '"T":') or 0,
+                _int_field(raw, '"a":') or 0,
+            )
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _book_scan(self, raw) -> Optional[Book]:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            return (
+                sym,
+                float(_str_field(raw, '"b":')),
+                float(_str_field(raw, '"a":')),
+                _int_field(raw, '"T":') or 0,
+            )
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _kline_scan(self, raw) -> Optional[Kline]:
+        if isinstance(raw, (bytes, bytearray)):
+            raw = raw.decode()
+        if not kline_closed(raw):
+            self.frames += 1
+            self.dropped += 1
+            return None
+        sym = self.symbol(raw)
+        if sym is None:
+            return None
+        try:
+            k = raw[raw.index('"k":'):]
+            return (
+                sym,
+                _int_field(k, '"t":'),
+                float(_str_field(k, '"o":')),
+                float(_str_field(k, '"h":')),
+                float(_str_field(k, '"l":')),
+                float(_str_field(k, '"c":')),
+                float(_str_field(k, '"v":')),
+                _int_field(raw, '"E":') or 0,
+            )
+        except Exception:
+            self.errors += 1
+            return None
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 
-from config import Config
-from indicators import ema, rsi, macd
+from .config import Config
+from .indicators import ema, rsi, macd
 
 @dataclass
 class MarketSnapshot:
@@ -24,28 +24,43 @@ def evaluate(cfg: Config, m: MarketSnapshot) -> Tuple[bool, str]:
     reasons: List[str] = []
 
     # 1) Spread
-    if cfg.enable_spread:
+    if cfg.ENABLE_SPREAD:
         sp = spread_ratio(m.bid, m.ask)
-        if sp > cfg.spread_max:
-            return False, f"SPREAD_FAIL sp={sp:.5f} > {cfg.spread_max:.5f}"
+        if sp > cfg.SPREAD_MAX:
+            return False, f"SPREAD_FAIL sp={sp:.5f} > {cfg.SPREAD_MAX:.5f}"
         reasons.append(f"SPREAD_OK sp={sp:.5f}")
 
     # 2) Regime / Trend (EMA gap as %)
-    if cfg.enable_regime:
-        ef = ema(m.closes, cfg.ema_fast)
-        es = ema(m.closes, cfg.ema_slow)
+    if cfg.ENABLE_REGIME:
+        ef = ema(m.closes, cfg.EMA_FAST)[0][-1]
+        es = ema(m.closes, cfg.EMA_SLOW)[0][-1]
         gap = abs(ef - es) / (m.last_price if m.last_price > 0 else 1.0)
-        if gap < cfg.regime_ema_gap:
-            return False, f"REGIME_FAIL gap={gap:.5f} < {cfg.regime_ema_gap:.5f}"
+        if gap < cfg.REGIME_EMA_GAP:
+            return False, f"REGIME_FAIL gap={gap:.5f} < {cfg.REGIME_EMA_GAP:.5f}"
         # direction (optional)
         trend = "UP" if ef >= es else "DOWN"
         reasons.append(f"REGIME_OK {trend} gap={gap:.5f}")
 
     # 3) RSI zone
-    r = rsi(m.closes, cfg.rsi_period)
-    if cfg.enable_rsi:
-        long_ok = cfg.rsi_long_min <= r <= cfg.rsi_long_max
-        short_ok = cfg.rsi_short_min <= r <= cfg.rsi_short_max
+    r = rsi(m.closes, cfg.RSI_PERIOD)[0][-1]
+    side = None
+    if cfg.ENABLE_RSI:
+        if r != r:
+            return False, "RSI_FAIL not ready"
+        long_ok = cfg.RSI_LONG_MIN <= r <= cfg.RSI_LONG_MAX
+        short_ok = cfg.RSI_SHORT_MIN <= r <= cfg.RSI_SHORT_MAX
         if not (long_ok or short_ok):
             return False, f"RSI_FAIL rsi={r:.2f}"
         side = "LONG" if long_ok else "SHORT"
+        reasons.append(f"RSI_OK {side} rsi={r:.2f}")
+
+    # 4) MACD histogram
+    if cfg.ENABLE_MACD:
+        h = macd(m.closes, cfg.MACD_FAST, cfg.MACD_SLOW, cfg.MACD_SIGNAL)[0][-1]
+        if side == "LONG" and h < cfg.MACD_HIST_MIN_LONG:
+            return False, f"MACD_FAIL hist={h:.6f}"
+        if side == "SHORT" and h > cfg.MACD_HIST_MAX_SHORT:
+            return False, f"MACD_FAIL hist={h:.6f}"
+        reasons.append(f"MACD_OK hist={h:.6f}")
+
+    return True, " | ".join(reasons)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .indicators import (
+    EMABank,
+    RSIBank,
+    VolumeSMABank,
+    DirectionalVolumeBank,
+    directional_volume,
+    ema,
+    rsi,
+    volume_sma,
+)
+
+# ============================================================
+# INDICATOR GRAPH
+# ------------------------------------------------------------
+# Strategy khai báo node cần dùng (Spec.ema(900, 26), ...),
+# graph dựng node + dependency 1 lần, node trùng key chỉ có 1
+# bản: MACD(12, 26, 9) trên 15m dùng chung EMA(26) 15m với
+# strategy nào khai báo EMA(26) 15m. Node không ai khai báo thì
+# không tồn tại -> không tính.
+#
+# Mỗi timeframe: 1 subscriber trên BarCascade, update các node
+# của timeframe đó theo thứ tự topo (dependency trước).
+# seed(tf, close, vol) chạy batch API trên ma trận (symbols x
+# bars) theo cùng thứ tự (warmup / gap fill).
+#
+# node.value: mảng (n,) giá trị hiện tại, NaN = chưa sẵn sàng.
+# ============================================================
+@dataclass(frozen=True)
+class Spec:
+    kind: str
+    tf: int
+    params: Tuple = ()
+
+    @property
+    def name(self) -> str:
+        """Tên ổn định (key trong snapshot)."""
+        return "_".join(str(x) for x in (self.kind, self.tf, *self.params)).replace(".", "_")
+
+    @staticmethod
+    def ema(tf: int, period: int) -> "Spec":
+        return Spec("ema", tf, (period,))
+
+    @staticmethod
+    def rsi(tf: int, period: int = 14) -> "Spec":
+        return Spec("rsi", tf, (period,))
+
+    @staticmethod
+    def macd(tf: int, fast: int = 12, slow: int = 26, signal: int = 9) -> "Spec":
+        return Spec("macd", tf, (fast, slow, signal))
+
+    @staticmethod
+    def vol_sma(tf: int, period: int = 20) -> "Spec":
+        return Spec("vol_sma", tf, (period,))
+
+    @staticmethod
+    def vol_ratio(tf: int, period: int = 20) -> "Spec":
+        return Spec("vol_ratio", tf, (period,))
+
+    @staticmethod
+    def vol_dir(tf: int) -> "Spec":
+        return Spec("vol_dir", tf)
+
+    @staticmethod
+    def prev(spec: "Spec") -> "Spec":
+        """Giá trị của `spec` tại bar trước (cross / đổi dấu)."""
+        return Spec("prev", spec.tf, (spec.kind, *spec.params))
+
+    def deps(self) -> List["Spec"]:
+        if self.kind == "macd":
+            fast, slow, _ = self.params
+            return [Spec.ema(self.tf, fast), Spec.ema(self.tf, slow)]
+        if self.kind == "vol_ratio":
+            return [Spec.vol_sma(self.tf, self.params[0])]
+        if self.kind == "prev":
+            return [Spec(self.params[0], self.tf, tuple(self.params[1:]))]
+        return []
+
+
+def _rows(series: np.ndarray) -> np.ndarray:
+    """Hàng có bar cuối (symbol có dữ liệu trong lần seed)."""
+    return np.flatnonzero(~np.isnan(series[:, -1])) if series.shape[1] else np.zeros(0, dtype=np.int64)
+
+
+# ============================================================
+# NODES
+# ------------------------------------------------------------
+# update(idx, close, vol): close/vol là mảng (n,) của bar vừa
+# đóng, chỉ đọc các hàng idx.
+# seed(close, vol) -> series (symbols x bars) của node, dùng làm
+# input cho node phụ thuộc.
+# ============================================================
+class EMANode:
+    def __init__(self, n: int, spec: Spec):
+        self.bank = EMABank(n, spec.params[0])
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.bank.value
+
+    def update(self, idx, close, vol) -> None:
+        self.bank.update(idx, close[idx])
+
+    def seed(self, close, vol) -> np.ndarray:
+        return ema(close, self.bank.period, state=self.bank)[0]
+
+
+class RSINode:
+    def __init__(self, n: int, spec: Spec):
+        self.bank = RSIBank(n, spec.params[0])
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.bank.value
+
+    def update(self, idx, close, vol) -> None:
+        self.bank.update(idx, close[idx])
+
+    def seed(self, close, vol) -> np.ndarray:
+        return rsi(close, self.bank.period, state=self.bank)[0]
+
+
+class MACDNode:
+    """fast/slow là EMA node dùng chung, node chỉ giữ EMA signal."""
+
+    def __init__(self, n: int, spec: Spec, fast: EMANode, slow: EMANode):
+        self.fast = fast
+        self.slow = slow
+        self.ema_signal = EMABank(n, spec.params[2])
+        self.macd = np.full(n, np.nan)
+        self.signal = np.full(n, np.nan)
+        self.hist = np.full(n, np.nan)
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.hist
+
+    def update(self, idx, close, vol) -> None:
+        self.macd[idx] = self.fast.value[idx] - self.slow.value[idx]
+        self.ema_signal.update(idx, self.macd[idx])
+        self.signal[idx] = self.ema_signal.value[idx]
+        self.hist[idx] = self.macd[idx] - self.signal[idx]
+
+    def seed_from(self, fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+        line = fast - slow
+        sig, _ = ema(line, self.ema_signal.period, state=self.ema_signal)
+        hist = line - sig
+        rows = _rows(line)
+        self.macd[rows] = line[rows, -1]
+        self.signal[rows] = sig[rows, -1]
+        self.hist[rows] = hist[rows, -1]
+        return hist
+
+
+class VolumeSMANode:
+    def __init__(self, n: int, spec: Spec):
+        self.bank = VolumeSMABank(n, spec.params[0])
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.bank.value
+
+    def update(self, idx, close, vol) -> None:
+        self.bank.update(idx, vol[idx])
+
+    def seed(self, close, vol) -> np.ndarray:
+        return volume_sma(vol, self.bank.period, state=self.bank)[0]
+
+
+class VolumeRatioNode:
+    """vol / SMA(vol), SMA chưa sẵn sàng hoặc = 0 -> 0.0."""
+
+    def __init__(self, n: int, spec: Spec, sma: VolumeSMANode):
+        self.sma = sma
+        self.value = np.zeros(n)
+
+    @staticmethod
+    def _ratio(vol, sma):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = vol / sma
+        return np.where(np.isnan(sma) | (sma == 0), 0.0, r)
+
+    def update(self, idx, close, vol) -> None:
+        self.value[idx] = self._ratio(vol[idx], self.sma.value[idx])
+
+    def seed_from(self, vol: np.ndarray, sma: np.ndarray) -> np.ndarray:
+        out = self._ratio(vol, sma)
+        rows = _rows(vol)
+        self.value[rows] = out[rows, -1]
+        return out
+
+
+class VolumeDirNode:
+    def __init__(self, n: int, spec: Spec):
+        self.bank = DirectionalVolumeBank(n)
+
+    @property
+    def value(self) -> np.ndarray:
+        return self.bank.value
+
+    def update(self, idx, close, vol) -> None:
+        self.bank.update(idx, close[idx], vol[idx])
+
+    def seed(self, close, vol) -> np.ndarray:
+        return directional_volume(close, vol, state=self.bank)[0]
+
+
+class PrevNode:
+    def __init__(self, n: int, spec: Spec, src):
+        self.src = src
+        self.last = np.full(n, np.nan)   # giá trị của src sau lần update gần nhất
+        self.value = np.full(n, np.nan)
+
+    def update(self, idx, close, vol) -> None:
+        self.value[idx] = self.last[idx]
+        self.last[idx] = self.src.value[idx]
+
+    def seed_from(self, src: np.ndarray) -> np.ndarray:
+        rows = _rows(src)
+        if src.shape[1] >= 2:
+            before = src[rows, -2]
+            self.value[rows] = np.where(np.isnan(before), self.last[rows], before)
+        else:
+            self.value[rows] = self.last[rows]
+        self.last[rows] = src[rows, -1]
+        out = np.full(src.shape, np.nan)
+        out[:, 1:] = src[:, :-1]
+        return out
+
+
+# ============================================================
+# GRAPH
+# ============================================================
+class IndicatorGraph:
+    def __init__(self, n: int, cascade):
+        self.n = n
+        self.cascade = cascade
+        self.nodes: Dict[str, object] = {}          # spec.name -> node (snapshot đi qua dict này)
+        self.specs: Dict[Spec, object] = {}
+        self.order: Dict[int, List[Spec]] = {}      # tf -> specs theo thứ tự topo
+
+    @property
+    def tfs(self) -> List[int]:
+        return sorted(self.order)
+
+    def require(self, spec: Spec):
+        """Thêm node (và dependency) nếu chưa có, trả về node."""
+        node = self.specs.get(spec)
+        if node is not None:
+            return node
+        deps = [self.require(d) for d in spec.deps()]
+        node = self._make(spec, deps)
+        self.specs[spec] = node
+        self.nodes[spec.name] = node
+        if spec.tf not in self.order:
+            self.cascade.subscribe(spec.tf, self._on_close)   # ValueError nếu tf không có trong cascade
+            self.order[spec.tf] = []
+        self.order[spec.tf].append(spec)
+        return node
+
+    def require_all(self, specs: Iterable[Spec]) -> None:
+        for s in specs:
+            self.require(s)
+
+    def _make(self, spec: Spec, deps: list):
+        n = self.n
+        kind = spec.kind
+        if kind == "ema":
+            return EMANode(n, spec)
+        if kind == "rsi":
+            return RSINode(n, spec)
+        if kind == "macd":
+            return MACDNode(n, spec, *deps)
+        if kind == "vol_sma":
+            return VolumeSMANode(n, spec)
+        if kind == "vol_ratio":
+            return VolumeRatioNode(n, spec, *deps)
+        if kind == "vol_dir":
+            return VolumeDirNode(n, spec)
+        if kind == "prev":
+            return PrevNode(n, spec, *deps)
+        raise ValueError(f"unknown indicator kind: {kind}")
+
+    def value(self, spec: Spec) -> np.ndarray:
+        return self.specs[spec].value
+
+    def _on_close(self, boundary: int, idx: np.ndarray, bars) -> None:
+        close, vol = bars.close, bars.vol
+        for spec in self.order[bars.tf_sec]:
+            self.specs[spec].update(idx, close, vol)
+
+    def seed(self, tf: int, close: np.ndarray, vol: Optional[np.ndarray] = None) -> Dict[Spec, np.ndarray]:
+        """
+        Chạy tiếp state của mọi node timeframe `tf` qua lịch sử (symbols x bars),
+        trả về series của từng node (giá trị sau mỗi bar).
+        """
+        if not close.shape[1] or tf not in self.order:
+            return {}
+        vol = np.zeros_like(close) if vol is None else vol
+        series: Dict[Spec, np.ndarray] = {}
+        for spec in self.order[tf]:
+            node = self.specs[spec]
+            deps = [series[d] for d in spec.deps()]
+            if spec.kind == "macd":
+                series[spec] = node.seed_from(*deps)
+            elif spec.kind == "vol_ratio":
+                series[spec] = node.seed_from(vol, *deps)
+            elif spec.kind == "prev":
+                series[spec] = node.seed_from(*deps)
+            else:
+                series[spec] = node.seed(close, vol)
+        return series
@@ -1,5 +1,10 @@
 from __future__ import annotations
 from collections import deque
+from math import sqrt
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 __all__ = [
     "RSI",
@@ -7,17 +12,54 @@ __all__ = [
     "MACD",
     "VolumeSMA",
     "DirectionalVolume",
+    "RollingMax",
+    "RollingMin",
+    "ATR",
+    "BollingerWidth",
+    "VWAP",
+    "Donchian",
+    "RSIBank",
+    "EMABank",
+    "MACDBank",
+    "VolumeSMABank",
+    "DirectionalVolumeBank",
+    "ema",
+    "rsi",
+    "macd",
+    "volume_sma",
+    "directional_volume",
+    "rolling_max",
+    "rolling_min",
+    "atr",
+    "bollinger_width",
+    "vwap",
+    "donchian",
 ]
 
+# ============================================================
+# Streaming indicators
+# ------------------------------------------------------------
+# Mọi update() là O(1) thời gian, bộ nhớ cố định (tối đa 1 cửa
+# sổ `period` phần tử), __slots__ để object nhỏ. Giá trị chưa
+# sẵn sàng = None.
+# ============================================================
+
 
 # ============================================================
 # RSI (Wilder)
+# ------------------------------------------------------------
+# `period` change đầu: trung bình cộng (seed của Wilder), sau đó
+# avg = avg + (x - avg) / period. Cùng 1 công thức cho cả 2 pha:
+# avg += (x - avg) / min(count, period).
 # ============================================================
 class RSI:
+    __slots__ = ("period", "avg_gain", "avg_loss", "count", "prev_close", "value")
+
     def __init__(self, period: int = 14):
         self.period = period
-        self.gains = deque(maxlen=period)
-        self.losses = deque(maxlen=period)
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
         self.prev_close = None
         self.value = None
 
@@ -29,25 +71,18 @@ class RSI:
         change = close - self.prev_close
         self.prev_close = close
 
-        gain = max(change, 0.0)
-        loss = max(-change, 0.0)
-
-        self.gains.append(gain)
-        self.losses.append(loss)
+        if self.count < self.period:
+            self.count += 1
+        k = self.count
+        self.avg_gain += (max(change, 0.0) - self.avg_gain) / k
+        self.avg_loss += (max(-change, 0.0) - self.avg_loss) / k
 
-        if len(self.gains) < self.period:
+        if k < self.period:
             self.value = None
-            return self.value
-
-        avg_gain = sum(self.gains) / self.period
-        avg_loss = sum(self.losses) / self.period
-
-        if avg_loss == 0:
+        elif self.avg_loss == 0:
             self.value = 100.0
         else:
-            rs = avg_gain / avg_loss
-            self.value = 100.0 - (100.0 / (1.0 + rs))
-
+            self.value = 100.0 - (100.0 / (1.0 + self.avg_gain / self.avg_loss))
         return self.value
 
 
@@ -55,6 +90,8 @@ class RSI:
 # EMA
 # ============================================================
 class EMA:
+    __slots__ = ("period", "mult", "value")
+
     def __init__(self, period: int):
         self.period = period
         self.mult = 2.0 / (period + 1.0)
@@ -72,6 +109,8 @@ class EMA:
 # MACD
 # ============================================================
 class MACD:
+    __slots__ = ("ema_fast", "ema_slow", "ema_signal", "macd", "signal", "hist")
+
     def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
         self.ema_fast = EMA(fast)
         self.ema_slow = EMA(slow)
@@ -105,24 +144,31 @@ class MACD:
 
 
 # ============================================================
-# Volume SMA
+# Volume SMA (running sum)
 # ============================================================
 class VolumeSMA:
+    __slots__ = ("period", "values", "total", "value")
+
     def __init__(self, period: int = 20):
         self.period = period
         self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.value = None
 
     def update(self, volume: float):
+        old = self.values[0] if len(self.values) == self.period else 0.0
         self.values.append(volume)
-        if len(self.values) < self.period:
-            return None
-        return sum(self.values) / self.period
+        self.total += volume - old
+        self.value = self.total / self.period if len(self.values) == self.period else None
+        return self.value
 
 
 # ============================================================
 # Directional Volume
 # ============================================================
 class DirectionalVolume:
+    __slots__ = ("prev_close", "value")
+
     def __init__(self):
         self.prev_close = None
         self.value = 0.0
@@ -142,3 +188,631 @@ class DirectionalVolume:
 
         self.prev_close = close
         return self.value
+
+
+# ============================================================
+# Rolling max / min (monotonic deque)
+# ------------------------------------------------------------
+# Deque giữ (n, x) giảm dần (max) / tăng dần (min): mỗi phần tử
+# vào và ra đúng 1 lần -> O(1) amortized. Sẵn sàng khi đủ period.
+# ============================================================
+class RollingMax:
+    __slots__ = ("period", "n", "window", "value")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.n = 0
+        self.window = deque()
+        self.value = None
+
+    def update(self, x: float):
+        w = self.window
+        while w and w[-1][1] <= x:
+            w.pop()
+        w.append((self.n, x))
+        if w[0][0] <= self.n - self.period:
+            w.popleft()
+        self.n += 1
+        self.value = w[0][1] if self.n >= self.period else None
+        return self.value
+
+
+class RollingMin(RollingMax):
+    __slots__ = ()
+
+    def update(self, x: float):
+        w = self.window
+        while w and w[-1][1] >= x:
+            w.pop()
+        w.append((self.n, x))
+        if w[0][0] <= self.n - self.period:
+            w.popleft()
+        self.n += 1
+        self.value = w[0][1] if self.n >= self.period else None
+        return self.value
+
+
+# ============================================================
+# ATR (Wilder, true range; bar đầu TR = high - low)
+# ============================================================
+class ATR:
+    __slots__ = ("period", "count", "avg", "prev_close", "value")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.count = 0
+        self.avg = 0.0
+        self.prev_close = None
+        self.value = None
+
+    def update(self, high: float, low: float, close: float):
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        if self.count < self.period:
+            self.count += 1
+        self.avg += (tr - self.avg) / self.count
+        self.value = self.avg if self.count >= self.period else None
+        return self.value
+
+
+# ============================================================
+# Bollinger width = (upper - lower) / middle = 2 * mult * std / mean
+# ------------------------------------------------------------
+# mean / M2 trượt theo cửa sổ (không cộng lại cả cửa sổ, không
+# dùng sum(x^2) để tránh mất chính xác). std = population (ddof=0).
+# ============================================================
+class BollingerWidth:
+    __slots__ = ("period", "mult", "values", "mean", "m2", "value")
+
+    def __init__(self, period: int = 20, mult: float = 2.0):
+        self.period = period
+        self.mult = mult
+        self.values = deque(maxlen=period)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value = None
+
+    def update(self, x: float):
+        w = self.values
+        if len(w) < self.period:
+            w.append(x)
+            d = x - self.mean
+            self.mean += d / len(w)
+            self.m2 += d * (x - self.mean)
+        else:
+            old = w[0]
+            w.append(x)
+            mean = self.mean + (x - old) / self.period
+            self.m2 += (x - old) * (x - mean + old - self.mean)
+            self.mean = mean
+
+        if len(w) < self.period or self.mean == 0:
+            self.value = None
+        else:
+            self.value = 2.0 * self.mult * sqrt(max(self.m2, 0.0) / self.period) / self.mean
+        return self.value
+
+
+# ============================================================
+# VWAP (typical price = (h + l + c) / 3)
+# ------------------------------------------------------------
+# period=None: cộng dồn tới khi reset() (vd đầu phiên),
+# period=N: cửa sổ trượt N bar (running sum).
+# ============================================================
+class VWAP:
+    __slots__ = ("period", "window", "pv", "vol", "value")
+
+    def __init__(self, period: Optional[int] = None):
+        self.period = period
+        self.window = deque(maxlen=period) if period else None
+        self.pv = 0.0
+        self.vol = 0.0
+        self.value = None
+
+    def reset(self) -> None:
+        if self.window is not None:
+            self.window.clear()
+        self.pv = 0.0
+        self.vol = 0.0
+        self.value = None
+
+    def update(self, high: float, low: float, close: float, volume: float):
+        pv = (high + low + close) / 3.0 * volume
+        w = self.window
+        if w is not None:
+            if len(w) == self.period:
+                old_pv, old_vol = w[0]
+                self.pv -= old_pv
+                self.vol -= old_vol
+            w.append((pv, volume))
+        self.pv += pv
+        self.vol += volume
+
+        full = w is None or len(w) == self.period
+        self.value = self.pv / self.vol if full and self.vol > 0 else None
+        return self.value
+
+
+# ============================================================
+# Donchian breakout
+# ------------------------------------------------------------
+# signal so close với kênh của `period` bar TRƯỚC đó:
+# +1 close > upper, -1 close < lower, 0 trong kênh, None khi
+# chưa đủ bar. upper/lower sau update = kênh gồm cả bar hiện tại.
+# ============================================================
+class Donchian:
+    __slots__ = ("period", "hi", "lo", "signal")
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.hi = RollingMax(period)
+        self.lo = RollingMin(period)
+        self.signal = None
+
+    @property
+    def upper(self):
+        return self.hi.value
+
+    @property
+    def lower(self):
+        return self.lo.value
+
+    def update(self, high: float, low: float, close: float):
+        up, lo = self.hi.value, self.lo.value
+        if up is None:
+            self.signal = None
+        elif close > up:
+            self.signal = 1
+        elif close < lo:
+            self.signal = -1
+        else:
+            self.signal = 0
+        self.hi.update(high)
+        self.lo.update(low)
+        return self.signal
+
+
+# ============================================================
+# Columnar banks (một hàng cho mỗi symbol id)
+# ------------------------------------------------------------
+# Cùng công thức với các class streaming ở trên, nhưng state
+# nằm trong mảng NumPy để update nhiều symbol trong 1 lần.
+# `idx` là mảng id (int) các symbol cần update, `values` cùng
+# độ dài. Giá trị chưa sẵn sàng = NaN (tương đương None).
+# ============================================================
+class RSIBank:
+    def __init__(self, n: int, period: int = 14):
+        self.period = period
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.prev_close = np.full(n, np.nan)
+        self.value = np.full(n, np.nan)
+
+    def update(self, idx: np.ndarray, close: np.ndarray) -> np.ndarray:
+        prev = self.prev_close[idx]
+        self.prev_close[idx] = close
+
+        has_prev = ~np.isnan(prev)
+        idx, close, prev = idx[has_prev], close[has_prev], prev[has_prev]
+        if idx.size:
+            change = close - prev
+            k = np.minimum(self.count[idx] + 1, self.period)
+            self.count[idx] = k
+            avg_gain = self.avg_gain[idx]
+            avg_loss = self.avg_loss[idx]
+            avg_gain += (np.maximum(change, 0.0) - avg_gain) / k
+            avg_loss += (np.maximum(-change, 0.0) - avg_loss) / k
+            self.avg_gain[idx] = avg_gain
+            self.avg_loss[idx] = avg_loss
+            self.value[idx] = np.where(k >= self.period, _rsi_value(avg_gain, avg_loss), np.nan)
+
+        return self.value
+
+    def load(self, idx: np.ndarray, src: "RSIBank", src_idx=slice(None)) -> None:
+        for name in ("avg_gain", "avg_loss", "count", "prev_close", "value"):
+            getattr(self, name)[idx] = getattr(src, name)[src_idx]
+
+    def row(self, i: int) -> RSI:
+        obj = RSI(self.period)
+        obj.avg_gain = float(self.avg_gain[i])
+        obj.avg_loss = float(self.avg_loss[i])
+        obj.count = int(self.count[i])
+        obj.prev_close = _opt(self.prev_close[i])
+        obj.value = _opt(self.value[i])
+        return obj
+
+    @classmethod
+    def from_objects(cls, objs) -> "RSIBank":
+        bank = cls(len(objs), objs[0].period)
+        for i, o in enumerate(objs):
+            bank.avg_gain[i] = o.avg_gain
+            bank.avg_loss[i] = o.avg_loss
+            bank.count[i] = o.count
+            bank.prev_close[i] = _nan(o.prev_close)
+            bank.value[i] = _nan(o.value)
+        return bank
+
+
+class EMABank:
+    def __init__(self, n: int, period: int):
+        self.period = period
+        self.mult = 2.0 / (period + 1.0)
+        self.value = np.full(n, np.nan)
+
+    def update(self, idx: np.ndarray, price: np.ndarray) -> np.ndarray:
+        cur = self.value[idx]
+        self.value[idx] = np.where(
+            np.isnan(cur), price, (price - cur) * self.mult + cur
+        )
+        return self.value
+
+    def load(self, idx: np.ndarray, src: "EMABank", src_idx=slice(None)) -> None:
+        self.value[idx] = src.value[src_idx]
+
+    def row(self, i: int) -> EMA:
+        obj = EMA(self.period)
+        obj.value = _opt(self.value[i])
+        return obj
+
+    @classmethod
+    def from_objects(cls, objs) -> "EMABank":
+        bank = cls(len(objs), objs[0].period)
+        bank.value[:] = [_nan(o.value) for o in objs]
+        return bank
+
+
+class MACDBank:
+    def __init__(self, n: int, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.ema_fast = EMABank(n, fast)
+        self.ema_slow = EMABank(n, slow)
+        self.ema_signal = EMABank(n, signal)
+
+        self.macd = np.full(n, np.nan)
+        self.signal = np.full(n, np.nan)
+        self.hist = np.full(n, np.nan)
+
+    def update(self, idx: np.ndarray, price: np.ndarray) -> np.ndarray:
+        self.ema_fast.update(idx, price)
+        self.ema_slow.update(idx, price)
+
+        self.macd[idx] = self.ema_fast.value[idx] - self.ema_slow.value[idx]
+        self.ema_signal.update(idx, self.macd[idx])
+        self.signal[idx] = self.ema_signal.value[idx]
+        self.hist[idx] = self.macd[idx] - self.signal[idx]
+        return self.hist
+
+    def load(self, idx: np.ndarray, src: "MACDBank", src_idx=slice(None)) -> None:
+        self.ema_fast.load(idx, src.ema_fast, src_idx)
+        self.ema_slow.load(idx, src.ema_slow, src_idx)
+        self.ema_signal.load(idx, src.ema_signal, src_idx)
+        for name in ("macd", "signal", "hist"):
+            getattr(self, name)[idx] = getattr(src, name)[src_idx]
+
+    def row(self, i: int) -> MACD:
+        obj = MACD(self.ema_fast.period, self.ema_slow.period, self.ema_signal.period)
+        obj.ema_fast = self.ema_fast.row(i)
+        obj.ema_slow = self.ema_slow.row(i)
+        obj.ema_signal = self.ema_signal.row(i)
+        obj.macd = _opt(self.macd[i])
+        obj.signal = _opt(self.signal[i])
+        obj.hist = _opt(self.hist[i])
+        return obj
+
+    @classmethod
+    def from_objects(cls, objs) -> "MACDBank":
+        o0 = objs[0]
+        bank = cls(len(objs), o0.ema_fast.period, o0.ema_slow.period, o0.ema_signal.period)
+        bank.ema_fast = EMABank.from_objects([o.ema_fast for o in objs])
+        bank.ema_slow = EMABank.from_objects([o.ema_slow for o in objs])
+        bank.ema_signal = EMABank.from_objects([o.ema_signal for o in objs])
+        bank.macd[:] = [_nan(o.macd) for o in objs]
+        bank.signal[:] = [_nan(o.signal) for o in objs]
+        bank.hist[:] = [_nan(o.hist) for o in objs]
+        return bank
+
+
+class VolumeSMABank:
+    def __init__(self, n: int, period: int = 20):
+        self.period = period
+        self.values = np.zeros((n, period))
+        self.pos = np.zeros(n, dtype=np.int64)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.total = np.zeros(n)
+        self.value = np.full(n, np.nan)
+
+    def update(self, idx: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        # ô chưa dùng của ring = 0 -> trừ luôn, không cần phân nhánh
+        pos = self.pos[idx]
+        old = self.values[idx, pos]
+        self.values[idx, pos] = volume
+        self.pos[idx] = (pos + 1) % self.period
+        self.count[idx] = np.minimum(self.count[idx] + 1, self.period)
+        total = self.total[idx] + (volume - old)
+        self.total[idx] = total
+
+        ready = self.count[idx] >= self.period
+        self.value[idx] = np.where(ready, total / self.period, np.nan)
+        return self.value
+
+    def load(self, idx: np.ndarray, src: "VolumeSMABank", src_idx=slice(None)) -> None:
+        for name in ("values", "pos", "count", "total", "value"):
+            getattr(self, name)[idx] = getattr(src, name)[src_idx]
+
+    def row(self, i: int) -> VolumeSMA:
+        obj = VolumeSMA(self.period)
+        k = int(self.count[i])
+        if k:
+            obj.values.extend(np.roll(self.values[i], -int(self.pos[i]))[-k:].tolist())
+        obj.total = float(self.total[i])
+        obj.value = _opt(self.value[i])
+        return obj
+
+    @classmethod
+    def from_objects(cls, objs) -> "VolumeSMABank":
+        bank = cls(len(objs), objs[0].period)
+        for i, o in enumerate(objs):
+            k = len(o.values)
+            bank.values[i, :k] = list(o.values)
+            bank.pos[i] = k % bank.period
+            bank.count[i] = k
+            bank.total[i] = o.total
+            bank.value[i] = _nan(o.value)
+        return bank
+
+
+class DirectionalVolumeBank:
+    def __init__(self, n: int):
+        self.prev_close = np.full(n, np.nan)
+        self.value = np.zeros(n)
+
+    def update(self, idx: np.ndarray, close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        prev = self.prev_close[idx]
+        vol = np.abs(volume)
+        out = np.where(close > prev, vol, np.where(close < prev, -vol, 0.0))
+        # lần đầu (prev NaN) -> so sánh False -> 0.0, giống class streaming
+        self.value[idx] = out
+        self.prev_close[idx] = close
+        return self.value
+
+    def load(self, idx: np.ndarray, src: "DirectionalVolumeBank", src_idx=slice(None)) -> None:
+        self.prev_close[idx] = src.prev_close[src_idx]
+        self.value[idx] = src.value[src_idx]
+
+    def row(self, i: int) -> DirectionalVolume:
+        obj = DirectionalVolume()
+        obj.prev_close = _opt(self.prev_close[i])
+        obj.value = float(self.value[i])
+        return obj
+
+    @classmethod
+    def from_objects(cls, objs) -> "DirectionalVolumeBank":
+        bank = cls(len(objs))
+        bank.prev_close[:] = [_nan(o.prev_close) for o in objs]
+        bank.value[:] = [o.value for o in objs]
+        return bank
+
+
+def _opt(x) -> Optional[float]:
+    return None if x != x else float(x)
+
+
+def _nan(x) -> float:
+    return np.nan if x is None else float(x)
+
+
+def _rsi_value(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+# ============================================================
+# Batch API (array in / array out)
+# ------------------------------------------------------------
+# Input: chuỗi 1-D (bars) hoặc ma trận 2-D (symbols x bars).
+# NaN trong input = bar không có dữ liệu -> bỏ qua, không update
+# (dùng để pad trái các symbol có lịch sử ngắn hơn).
+#
+# Trả về (output, state):
+#   - 1-D: state là object streaming (EMA, RSI, ...) -> gọi
+#     .update() tiếp từ bar cuối.
+#   - 2-D: state là *Bank tương ứng (load vào SymbolStore).
+# Truyền `state=` (object hoặc bank) để chạy tiếp từ state cũ.
+# Kết quả giống hệt gọi .update() lần lượt trên class streaming.
+# ============================================================
+def _prep(x, state, bank_cls, *args):
+    a = np.asarray(x, dtype=float)
+    one_d = a.ndim == 1
+    a2 = a.reshape(1, -1) if one_d else a
+    if state is None:
+        bank = bank_cls(a2.shape[0], *args)
+    elif isinstance(state, bank_cls):
+        bank = state
+    else:
+        bank = bank_cls.from_objects([state])
+    return a2, one_d, bank
+
+
+def _finish(out: np.ndarray, one_d: bool, bank):
+    if one_d:
+        return out[0], bank.row(0)
+    return out, bank
+
+
+def _run(a2: np.ndarray, step) -> np.ndarray:
+    """Chạy step(idx, col) qua từng bar, vectorized theo symbols."""
+    n, t = a2.shape
+    out = np.full((n, t), np.nan)
+    all_idx = np.arange(n)
+    valid = ~np.isnan(a2)
+    dense = bool(valid.all())
+    for j in range(t):
+        if dense:
+            idx = all_idx
+        else:
+            idx = all_idx[valid[:, j]]
+            if not idx.size:
+                continue
+        out[idx, j] = step(idx, a2[idx, j])[idx]
+    return out
+
+
+def ema(x, period: int, state=None):
+    a2, one_d, bank = _prep(x, state, EMABank, period)
+    return _finish(_run(a2, bank.update), one_d, bank)
+
+
+def macd(x, fast: int = 12, slow: int = 26, signal: int = 9, state=None):
+    """Trả về (hist, state); macd/signal đầy đủ nằm trong state."""
+    a2, one_d, bank = _prep(x, state, MACDBank, fast, slow, signal)
+    return _finish(_run(a2, bank.update), one_d, bank)
+
+
+def rsi(x, period: int = 14, state=None):
+    a2, one_d, bank = _prep(x, state, RSIBank, period)
+    n, t = a2.shape
+
+    if state is not None or t <= period or np.isnan(a2).any():
+        return _finish(_run(a2, bank.update), one_d, bank)
+
+    # fast path: không NaN, state mới -> đệ quy Wilder theo thời gian,
+    # vectorized theo symbols (cùng phép tính như RSIBank.update)
+    change = np.diff(a2, axis=1)
+    gain = np.maximum(change, 0.0)
+    loss = np.maximum(-change, 0.0)
+    avg_gain = np.zeros(n)
+    avg_loss = np.zeros(n)
+    out = np.full((n, t), np.nan)
+    for j in range(t - 1):
+        k = min(j + 1, period)
+        avg_gain += (gain[:, j] - avg_gain) / k
+        avg_loss += (loss[:, j] - avg_loss) / k
+        if k >= period:
+            out[:, j + 1] = _rsi_value(avg_gain, avg_loss)
+
+    bank.avg_gain[:] = avg_gain
+    bank.avg_loss[:] = avg_loss
+    bank.count[:] = period
+    bank.prev_close[:] = a2[:, -1]
+    bank.value[:] = out[:, -1]
+    return _finish(out, one_d, bank)
+
+
+def volume_sma(v, period: int = 20, state=None):
+    a2, one_d, bank = _prep(v, state, VolumeSMABank, period)
+    n, t = a2.shape
+
+    if state is not None or t < period or np.isnan(a2).any():
+        return _finish(_run(a2, bank.update), one_d, bank)
+
+    c = np.concatenate([np.zeros((n, 1)), np.cumsum(a2, axis=1)], axis=1)
+    out = np.full((n, t), np.nan)
+    out[:, period - 1:] = (c[:, period:] - c[:, :-period]) / period
+
+    bank.values[:] = a2[:, -period:]
+    bank.pos[:] = 0
+    bank.count[:] = period
+    bank.total[:] = c[:, -1] - c[:, -period - 1]
+    bank.value[:] = out[:, -1]
+    return _finish(out, one_d, bank)
+
+
+def directional_volume(close, volume, state=None):
+    c2, one_d, bank = _prep(close, state, DirectionalVolumeBank)
+    v2 = np.asarray(volume, dtype=float).reshape(c2.shape)
+    n, t = c2.shape
+
+    if t and not np.isnan(c2).any():
+        prev = np.concatenate([bank.prev_close[:, None], c2[:, :-1]], axis=1)
+        vol = np.abs(v2)
+        out = np.where(c2 > prev, vol, np.where(c2 < prev, -vol, 0.0))
+        bank.prev_close[:] = c2[:, -1]
+        bank.value[:] = out[:, -1]
+        return _finish(out, one_d, bank)
+
+    out = np.full((n, t), np.nan)
+    all_idx = np.arange(n)
+    for j in range(t):
+        idx = all_idx[~np.isnan(c2[:, j])]
+        if idx.size:
+            out[idx, j] = bank.update(idx, c2[idx, j], v2[idx, j])[idx]
+    return _finish(out, one_d, bank)
+
+
+# ============================================================
+# Batch reference (array in / array out, không có state)
+# ------------------------------------------------------------
+# Tính lại từ đầu bằng sliding window / cumsum, theo trục cuối
+# (1-D bars hoặc 2-D symbols x bars, không NaN). Dùng để kiểm
+# class streaming (tests/test_indicators.py) và cho nghiên cứu
+# offline. Chưa đủ bar = NaN.
+# ============================================================
+def _rolling(x, period: int, fn) -> np.ndarray:
+    a = np.asarray(x, dtype=float)
+    out = np.full(a.shape, np.nan)
+    if a.shape[-1] >= period:
+        out[..., period - 1:] = fn(sliding_window_view(a, period, axis=-1), axis=-1)
+    return out
+
+
+def rolling_max(x, period: int) -> np.ndarray:
+    return _rolling(x, period, np.max)
+
+
+def rolling_min(x, period: int) -> np.ndarray:
+    return _rolling(x, period, np.min)
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    h, l, c = (np.asarray(v, dtype=float) for v in (high, low, close))
+    tr = h - l
+    prev = c[..., :-1]
+    tr[..., 1:] = np.maximum(tr[..., 1:], np.maximum(np.abs(h[..., 1:] - prev), np.abs(l[..., 1:] - prev)))
+
+    out = np.full(tr.shape, np.nan)
+    t = tr.shape[-1]
+    if t < period:
+        return out
+    avg = tr[..., :period].mean(axis=-1)
+    out[..., period - 1] = avg
+    for j in range(period, t):
+        avg = avg + (tr[..., j] - avg) / period
+        out[..., j] = avg
+    return out
+
+
+def bollinger_width(x, period: int = 20, mult: float = 2.0) -> np.ndarray:
+    mean = _rolling(x, period, np.mean)
+    std = _rolling(x, period, np.std)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(mean == 0, np.nan, 2.0 * mult * std / mean)
+
+
+def vwap(high, low, close, volume, period: Optional[int] = None) -> np.ndarray:
+    h, l, c, v = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+    pv = (h + l + c) / 3.0 * v
+    if period:
+        num = _rolling(pv, period, np.sum)
+        den = _rolling(v, period, np.sum)
+    else:
+        num = np.cumsum(pv, axis=-1)
+        den = np.cumsum(v, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def donchian(high, low, close, period: int = 20):
+    """Trả về (signal, upper, lower); signal so với kênh của bar trước."""
+    c = np.asarray(close, dtype=float)
+    upper = rolling_max(high, period)
+    lower = rolling_min(low, period)
+    up = np.full(c.shape, np.nan)
+    lo = np.full(c.shape, np.nan)
+    up[..., 1:] = upper[..., :-1]
+    lo[..., 1:] = lower[..., :-1]
+    signal = np.where(c > up, 1.0, np.where(c < lo, -1.0, 0.0))
+    return np.where(np.isnan(up), np.nan, signal), upper, lower
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from .binance_client import rest_client
+from .config import BINANCE_FUTURES_REST, KLINE_FILL_ENABLED, KLINE_WAIT_SEC
+from .decode import Kline
+from .metrics import BACKFILL
+from .processor import TickProcessor
+from .state import SymbolStore
+
+
+# ============================================================
+# KLINE MODE: CHỜ BAR ĐÓNG TRƯỚC KHI SCHEDULER ĐÓNG BAR
+# ------------------------------------------------------------
+# INGEST_MODE=kline: bar 5m chỉ có dữ liệu khi kline đã đóng
+# ("x":true) tới, ngay sau biên bar. drain() (scheduler gọi
+# trước close_due): chờ tới khi mọi symbol đã có kline của bar
+# đang mở (bars_5m.open != NaN), tối đa `wait` giây; symbol
+# vẫn thiếu (frame mất khi reconnect, subscribe giữa chừng) lấy
+# qua REST /fapi/v1/klines (client dùng chung) nếu fill bật
+# (KLINE_FILL_ENABLED).
+# Không lấy được -> bar đóng như symbol không có trade (flat).
+# ============================================================
+class KlineCloser:
+    def __init__(
+        self,
+        store: SymbolStore,
+        processor: TickProcessor,
+        *,
+        rest_base: str = BINANCE_FUTURES_REST,
+        wait: float = KLINE_WAIT_SEC,
+        fill: bool = bool(KLINE_FILL_ENABLED),
+        clock: Callable[[], float] = time.time,
+        poll: float = 0.05,
+    ):
+        self.store = store
+        self.processor = processor
+        self.rest_base = rest_base
+        self.wait = wait
+        self.fill = fill
+        self.clock = clock
+        self.poll = poll
+
+        # stats
+        self.closes = 0
+        self.waited = 0       # số lần phải chờ kline tới muộn
+        self.missing = 0      # symbol vẫn thiếu kline sau khi chờ
+        self.filled = 0       # lấy lại được qua REST
+        self.errors = 0
+        self.last_wait_ms: Optional[float] = None
+
+    def pending(self) -> List[str]:
+        """Symbol chưa có kline đóng của bar đang mở (rỗng nếu bar chưa tới biên)."""
+        bars = self.store.bars_5m
+        if bars.open_bucket is None or (bars.open_bucket + 1) * bars.tf_sec > self.clock():
+            return []
+        o = bars.open
+        return [s for s, i in self.store.ids.items() if o[i] != o[i]]
+
+    async def fetch(self, symbol: str, bucket: int) -> Optional[Kline]:
+        tf = self.store.bars_5m.tf_sec
+        start_ms = bucket * tf * 1000
+        rows = await rest_client(self.rest_base).klines(symbol, f"{tf // 60}m", 1, start_ms)
+        if not rows or int(rows[0][0]) != start_ms or int(rows[0][6]) >= self.clock() * 1000:
+            return None   # chưa đóng / không có bar đó
+        r = rows[0]
+        return symbol, int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5]), int(r[6])
+
+    async def drain(self) -> None:
+        t0 = time.perf_counter()
+        self.closes += 1
+        missing = self.pending()
+        if not missing:
+            return
+        self.waited += 1
+        deadline = t0 + self.wait
+        while missing and time.perf_counter() < deadline:
+            await asyncio.sleep(self.poll)
+            missing = self.pending()
+        self.last_wait_ms = (time.perf_counter() - t0) * 1000
+        if not missing:
+            return
+
+        self.missing += len(missing)
+        bucket = self.store.bars_5m.open_bucket
+        if not self.fill:
+            print(f"[klines] {len(missing)} symbols without closed kline for bucket {bucket}")
+            return
+        t1 = time.perf_counter()
+        try:
+            res = await asyncio.wait_for(
+                asyncio.gather(*(self.fetch(s, bucket) for s in missing), return_exceptions=True),
+                self.wait,
+            )
+        except asyncio.TimeoutError:
+            self.errors += 1
+            print(f"[klines] bucket {bucket}: REST fill timed out ({len(missing)} symbols)")
+            return
+        got = [k for k in res if isinstance(k, tuple) and k[0] in self.store.ids]
+        self.errors += sum(isinstance(k, Exception) for k in res)
+        self.processor.klines(got)
+        self.filled += len(got)
+        BACKFILL.observe(time.perf_counter() - t1)
+        print(f"[klines] bucket {bucket}: {len(missing)} missing after {self.last_wait_ms:.0f}ms, "
+              f"REST filled {len(got)}")
+
+    def stats(self) -> dict:
+        return {
+            "closes": self.closes,
+            "waited": self.waited,
+            "missing": self.missing,
+            "filled": self.filled,
+            "errors": self.errors,
+            "late": self.processor.late_klines,
+            "klines": self.processor.klines_in,
+        }
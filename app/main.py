@@ -1,256 +1,585 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import os
 import time
-from typing import Dict
-
-import aiohttp
+from functools import partial
+from typing import Callable, Optional
 
 from .config import (
+    BINANCE_FUTURES_REST,
     BINANCE_FUTURES_WS,
+    TOP_N,
     TELEGRAM_BOT_TOKEN,
     TELEGRAM_CHAT_ID,
-    ALERT_PROFILE,
+    TELEGRAM_QUEUE_MAX,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_RATE,
     COOLDOWN_SEC,
     SPREAD_MAX,
+    WARMUP_ENABLED,
+    RECORD_PATH,
+    DECODER,
+    BOOK_LAZY,
+    BACKFILL_ENABLED,
+    BACKFILL_WAIT_SEC,
+    INGEST_MODE,
+    KLINE_FILL_ENABLED,
+    KLINE_WAIT_SEC,
+    HEARTBEAT_SEC,
+    MYSQL_ENABLED,
+    MYSQL_HOST,
+    MYSQL_PORT,
+    MYSQL_USER,
+    MYSQL_PASSWORD,
+    MYSQL_DATABASE,
+    MYSQL_BAR_TABLE,
+    MYSQL_ALERT_TABLE,
+    MYSQL_BATCH,
+    MYSQL_FLUSH_SEC,
+    MYSQL_MAX_BUFFER,
+    MYSQL_SPILL_PATH,
+    WS_MAX_STREAMS,
+    WS_SHARDS,
+    SNAPSHOT_PATH,
+    SNAPSHOT_SEC,
+    WORKERS,
+    METRICS_HOST,
+    METRICS_PORT,
 )
 
-from .symbols import FALLBACK_SYMBOLS
-from .telegram import send_telegram
-from .indicators import RSI, EMA, MACD, VolumeSMA, DirectionalVolume
-from .alert_engine import ctx_filters_signal, should_alert
-from .utils import backoff_s
+from .binance_client import close_rest_clients, rest_client
+from .symbols import get_top_usdt_symbols
+from .telegram import TelegramDelivery
+from .backfill import Backfiller
+from .decode import Decoder, frame_time
+from .klines import KlineCloser
+from .state import BarAccum, BarSub, SymbolStore
+from .pipeline import AlertSink, BarSink, format_alert
+from .processor import TickProcessor
+from .strategy import Profile
+from .metrics import (
+    DECODE,
+    STATE_UPDATE,
+    register_stats,
+    register_store,
+    register_streams,
+    run_heartbeat,
+    start_metrics_server,
+)
+from .mysql_writer import BulkWriter, MySQLConfig, mysql_connect
+from .recorder import TickRecorder
+from .streams import ConnectionManager, FrameHandler
+from .scheduler import run_bar_scheduler
+from .snapshot import restore, run_snapshots, save
+from .universe import Universe
+from .warmup import fill_gap, warmup
 
 
 # ============================================================
-# SYMBOL STATE
+# ALERT SINK (live) -> delivery queue, gộp theo biên bar
 # ============================================================
-class SymbolState:
-    def __init__(self):
-        # market
-        self.bid = None
-        self.ask = None
+def telegram_sink(delivery: TelegramDelivery, profile: Optional[Profile] = None) -> AlertSink:
+    """profile != None -> tag tên profile vào message, gửi chat riêng của profile (nếu có)."""
+    name = profile.name if profile else None
+    chat = (profile.chat_id or None) if profile else None
 
-        # buckets
-        self.last_5m_bucket = None
-        self.last_15m_bucket = None
+    def emit(now: int, side: str, sym: str, price: float) -> None:
+        delivery.enqueue(format_alert(side, sym, price, name), key=now, chat_id=chat)
 
-        # close price
-        self.close_5m = None
-        self.close_15m = None
+    return emit
 
-        # volume
-        self.vol_5m = 0.0
-        self.vol_15m = 0.0
 
-        # indicators
-        self.rsi_5m = RSI(14)
-        self.rsi_15m = RSI(14)
+def fanout(*sinks: AlertSink) -> AlertSink:
+    def emit(now: int, side: str, sym: str, price: float) -> None:
+        for sink in sinks:
+            sink(now, side, sym, price)
 
-        self.ema20_15m = EMA(20)
-        self.ema50_15m = EMA(50)
-        self.macd_15m = MACD()
-        self.ema50_1h = EMA(50)
+    return emit
 
-        self.vol_sma_5m = VolumeSMA(20)
-        self.vol_dir_5m = DirectionalVolume()
 
-        self.vol_ratio_5m = 0.0
-        self.vol_dir_5m_val = 0.0
-
-        # alert control
-        self.last_alert_sec = 0
+# ============================================================
+# DB SINKS -> BulkWriter (chỉ append buffer, thread nền flush)
+# ============================================================
+def alert_row(
+    now: int, side: str, sym: str, price: float, spread: float, profile: Optional[str] = None
+) -> dict:
+    return {
+        "symbol": sym, "sec": now, "side": side,
+        "prob": None, "pred_ret": None, "thr": None,
+        "mid": price, "spread": spread,
+        "message": format_alert(side, sym, price, profile),
+    }
+
+
+def db_alert_sink(store: SymbolStore, writer: BulkWriter, profile: Optional[str] = None) -> AlertSink:
+    def emit(now: int, side: str, sym: str, price: float) -> None:
+        spread = store.spread(store.ids[sym])
+        writer.write(MYSQL_ALERT_TABLE, alert_row(now, side, sym, price, spread, profile))
+
+    return emit
+
+
+def db_bar_sink(store: SymbolStore, writer: BulkWriter) -> BarSub:
+    """Subscriber của BarCascade: ghi OHLCV mọi timeframe."""
+    labels = {300: "5m", 900: "15m", 3600: "1h", 14400: "4h"}
+
+    def on_close(boundary: int, idx, bars: BarAccum) -> None:
+        tf = labels.get(bars.tf_sec, f"{bars.tf_sec}s")
+        sec = boundary - bars.tf_sec
+        for i in idx:
+            writer.write(MYSQL_BAR_TABLE, {
+                "symbol": store.symbols[i], "tf": tf, "sec": sec,
+                "open": float(bars.open[i]), "high": float(bars.high[i]),
+                "low": float(bars.low[i]), "close": float(bars.close[i]),
+                "volume": float(bars.vol[i]),
+            })
+
+    return on_close
+
+
+async def log_delivery(
+    delivery: TelegramDelivery,
+    writer: Optional[BulkWriter] = None,
+    every: float = HEARTBEAT_SEC,
+):
+    while True:
+        await asyncio.sleep(every)
+        print(f"[telegram] {delivery.stats()}")
+        if writer is not None:
+            print(f"[mysql] {writer.stats()}")
 
-    def mid(self):
-        if self.bid is None or self.ask is None:
-            return None
-        return (self.bid + self.ask) / 2
 
-    def spread(self):
-        m = self.mid()
-        if not m:
-            return 0.0
-        return (self.ask - self.bid) / m
+# ============================================================
+# STREAM STATS (per shard)
+# ============================================================
+async def log_streams(mgr: ConnectionManager, every: float = HEARTBEAT_SEC):
+    while True:
+        await asyncio.sleep(every)
+        print(f"[streams] {mgr.report()}")
 
 
 # ============================================================
 # WS: BOOK TICKER
+# ------------------------------------------------------------
+# Mặc định lazy (BOOK_LAZY=1): không parse bid/ask từng frame,
+# xem app/book.py. Có recorder thì parse hết để ghi lại.
 # ============================================================
-async def ws_bookticker(states: Dict[str, SymbolState], url: str):
+def book_handler(
+    store: SymbolStore,
+    decoder: Decoder,
+    *,
+    clock: Callable[[], float] = time.time,
+    recorder: Optional[TickRecorder] = None,
+    processor: Optional[TickProcessor] = None,
+    lazy: bool = bool(BOOK_LAZY),
+) -> FrameHandler:
+    if lazy and recorder is None and processor is None:
+        # chỉ lọc symbol + giữ frame thô mới nhất, parse khi đọc spread (store.book)
+        ingest, symbol = store.book.ingest, decoder.symbol
+
+        def handle_lazy(frames):
+            t0 = time.perf_counter()
+            ingest(frames, symbol)
+            DECODE.observe(time.perf_counter() - t0)
+            return frame_time(frames[-1])
+
+        return handle_lazy
+
+    # book không đóng bar -> không cần alert sink
+    proc = processor or TickProcessor(store, emit=lambda *a: None)
+    decode = decoder.book
+
+    def handle(frames):
+        t0 = time.perf_counter()
+        ticks = [t for t in map(decode, frames) if t is not None]
+        DECODE.observe(time.perf_counter() - t0)
+        if not ticks:
+            return None
+        proc.books(ticks)
+        if recorder is not None:
+            recv_ms = int(clock() * 1000)
+            for sym, bid, ask, t_ms in ticks:
+                recorder.book(sym, recv_ms, t_ms, bid, ask)
+        return ticks[-1][3]
+
+    return handle
+
+
+async def ws_bookticker(
+    store: SymbolStore,
+    base_url: str = BINANCE_FUTURES_WS,
+    *,
+    decoder: Optional[Decoder] = None,
+    clock: Callable[[], float] = time.time,
+    recorder: Optional[TickRecorder] = None,
+    universe: Optional[Universe] = None,
+):
     print(">>> ws_bookticker started")
-    while True:
-        try:
-            async with aiohttp.ClientSession() as s:
-                async with s.ws_connect(url, heartbeat=30) as ws:
-                    async for msg in ws:
-                        data = json.loads(msg.data).get("data", {})
-                        sym = data.get("s")
-                        if sym in states:
-                            states[sym].bid = float(data["b"])
-                            states[sym].ask = float(data["a"])
-        except Exception as e:
-            print("bookticker error:", e)
-            await asyncio.sleep(5)
+    decoder = decoder or Decoder(store.ids, DECODER)
+    mgr = ConnectionManager(
+        base_url,
+        list(store.ids),
+        "bookTicker",
+        book_handler(store, decoder, clock=clock, recorder=recorder),
+        max_streams=WS_MAX_STREAMS,
+        n_shards=WS_SHARDS,
+        clock=clock,
+    )
+    register_streams(mgr)
+    if universe is not None:
+        universe.attach(mgr, decoder)
+    await asyncio.gather(mgr.run(), log_streams(mgr))
 
 
 # ============================================================
 # WS: AGG TRADE (CORE LOOP)
+# ------------------------------------------------------------
+# Shard gom mọi frame đang chờ thành 1 batch; handler chỉ decode
+# + ghi recorder, phần state / bar / alert là TickProcessor.
 # ============================================================
-async def ws_aggtrade(states: Dict[str, SymbolState], url: str):
+def trade_handler(
+    store: SymbolStore,
+    decoder: Decoder,
+    *,
+    clock: Callable[[], float] = time.time,
+    emit: AlertSink,
+    on_bar: Optional[BarSink] = None,
+    recorder: Optional[TickRecorder] = None,
+    processor: Optional[TickProcessor] = None,
+) -> FrameHandler:
+    """Batch frame -> decode -> TickProcessor (logic trade/bar nằm ở processor)."""
+    proc = processor or TickProcessor(store, emit, on_bar)
+    decode = decoder.trade
+
+    def handle(frames):
+        t0 = time.perf_counter()
+        ticks = [t for t in map(decode, frames) if t is not None]
+        t1 = time.perf_counter()
+        DECODE.observe(t1 - t0)
+        if not ticks:
+            return None
+
+        now_ms = int(clock() * 1000)
+        if recorder is not None:
+            for sym, price, qty, t_ms, agg_id in ticks:
+                recorder.trade(sym, now_ms, t_ms, price, qty, agg_id)
+
+        proc.trades(ticks, now_ms)
+        STATE_UPDATE.observe(time.perf_counter() - t1)
+        return ticks[-1][3]
+
+    return handle
+
+
+async def ws_aggtrade(
+    store: SymbolStore,
+    base_url: str = BINANCE_FUTURES_WS,
+    *,
+    emit: AlertSink,
+    on_bar: Optional[BarSink] = None,
+    decoder: Optional[Decoder] = None,
+    clock: Callable[[], float] = time.time,
+    recorder: Optional[TickRecorder] = None,
+    universe: Optional[Universe] = None,
+    rest_base: str = BINANCE_FUTURES_REST,
+    backfill: bool = bool(BACKFILL_ENABLED),
+):
     print(">>> ws_aggtrade started")
+    decoder = decoder or Decoder(store.ids, DECODER)
+    proc = TickProcessor(store, emit, on_bar)
+
+    # trade mất khi reconnect -> lấy lại theo aggTrade id, kịp trước khi đóng bar
+    filler: Optional[Backfiller] = None
+    drain = None
+    if backfill:
+        filler = Backfiller(proc, rest_base=rest_base)
+        proc.on_gap = filler.submit
+        register_stats("backfill", filler.stats)
+        drain = partial(filler.drain, BACKFILL_WAIT_SEC)
+
+    mgr = ConnectionManager(
+        base_url,
+        list(store.ids),
+        "aggTrade",
+        trade_handler(store, decoder, clock=clock, emit=emit, recorder=recorder, processor=proc),
+        max_streams=WS_MAX_STREAMS,
+        n_shards=WS_SHARDS,
+        clock=clock,
+    )
+    register_streams(mgr)
+    if universe is not None:
+        universe.attach(mgr, decoder)
+    try:
+        await asyncio.gather(
+            mgr.run(),
+            log_streams(mgr),
+            run_bar_scheduler(store, emit, clock=clock, on_bar=on_bar, drain=drain),
+        )
+    finally:
+        if filler is not None:
+            await filler.close()
 
-    # ---- START MESSAGE (BẮT BUỘC) ----
-    await send_telegram(
-        TELEGRAM_BOT_TOKEN,
-        TELEGRAM_CHAT_ID,
-        f"✅ Bot STARTED | PROFILE={ALERT_PROFILE.upper()} | symbols={len(states)}",
+
+# ============================================================
+# WS: KLINE 5M (INGEST_MODE=kline)
+# ------------------------------------------------------------
+# Chỉ kline đã đóng mới được parse (decoder bỏ frame "x":false),
+# mỗi symbol 1 frame / 5m thay vì mọi trade; 15m/1h/4h vẫn gộp
+# từ 5m. Scheduler chờ kline đóng của mọi symbol (KlineCloser)
+# rồi mới đóng bar -> cùng bar như mode aggTrade.
+# ============================================================
+def kline_handler(
+    store: SymbolStore,
+    decoder: Decoder,
+    *,
+    emit: AlertSink,
+    on_bar: Optional[BarSink] = None,
+    processor: Optional[TickProcessor] = None,
+) -> FrameHandler:
+    """Batch frame kline -> decode (chỉ frame đóng bar) -> TickProcessor.klines."""
+    proc = processor or TickProcessor(store, emit, on_bar)
+    decode = decoder.kline
+
+    def handle(frames):
+        t0 = time.perf_counter()
+        ticks = [t for t in map(decode, frames) if t is not None]
+        t1 = time.perf_counter()
+        DECODE.observe(t1 - t0)
+        if ticks:
+            proc.klines(ticks)
+            STATE_UPDATE.observe(time.perf_counter() - t1)
+        # "T" của kline là giờ đóng bar -> lag theo event time
+        return frame_time(frames[-1], '"E":')
+
+    return handle
+
+
+async def ws_kline(
+    store: SymbolStore,
+    base_url: str = BINANCE_FUTURES_WS,
+    *,
+    emit: AlertSink,
+    on_bar: Optional[BarSink] = None,
+    decoder: Optional[Decoder] = None,
+    clock: Callable[[], float] = time.time,
+    universe: Optional[Universe] = None,
+    rest_base: str = BINANCE_FUTURES_REST,
+    fill: bool = bool(KLINE_FILL_ENABLED),
+):
+    print(">>> ws_kline started")
+    decoder = decoder or Decoder(store.ids, DECODER)
+    proc = TickProcessor(store, emit, on_bar)
+    closer = KlineCloser(store, proc, rest_base=rest_base, fill=fill, clock=clock)
+    register_stats("klines", closer.stats)
+
+    mgr = ConnectionManager(
+        base_url,
+        list(store.ids),
+        f"kline_{store.bars_5m.tf_sec // 60}m",
+        kline_handler(store, decoder, emit=emit, processor=proc),
+        max_streams=WS_MAX_STREAMS,
+        n_shards=WS_SHARDS,
+        clock=clock,
+    )
+    register_streams(mgr)
+    if universe is not None:
+        universe.attach(mgr, decoder)
+    await asyncio.gather(
+        mgr.run(),
+        log_streams(mgr),
+        run_bar_scheduler(store, emit, clock=clock, on_bar=on_bar, drain=closer.drain),
     )
 
-    while True:
+
+def ws_bars(
+    store: SymbolStore,
+    *,
+    emit: AlertSink,
+    recorder: Optional[TickRecorder] = None,
+    universe: Optional[Universe] = None,
+    mode: str = INGEST_MODE,
+):
+    """Nguồn bar 5m theo INGEST_MODE: aggtrade (mặc định) | kline."""
+    if mode == "kline":
+        if recorder is not None:
+            print(">>> INGEST_MODE=kline: recorder chỉ ghi bookTicker")
+        return ws_kline(store, emit=emit, universe=universe)
+    if mode != "aggtrade":
+        raise ValueError(f"unknown INGEST_MODE: {mode}")
+    return ws_aggtrade(store, emit=emit, recorder=recorder, universe=universe)
+
+
+def stale_after(every: float, mode: str = INGEST_MODE) -> float:
+    """Ngưỡng staleness của heartbeat: mode kline chỉ có dữ liệu mỗi bar 5m."""
+    return max(every, 300 + KLINE_WAIT_SEC) if mode == "kline" else every
+
+
+# ============================================================
+# STARTUP STATE: snapshot + gap fill, không có thì warmup đầy đủ
+# ============================================================
+async def load_state(symbols, snapshot_path: str = SNAPSHOT_PATH) -> SymbolStore:
+    if snapshot_path and os.path.exists(snapshot_path):
+        store = SymbolStore(symbols)
         try:
-            async with aiohttp.ClientSession() as s:
-                async with s.ws_connect(url, heartbeat=30) as ws:
-                    async for msg in ws:
-                        data = json.loads(msg.data).get("data", {})
-                        sym = data.get("s")
-                        if sym not in states:
-                            continue
-
-                        st = states[sym]
-                        qty = float(data["q"])
-                        mid = st.mid()
-                        if mid is None:
-                            continue
-
-                        now = int(time.time())
-
-                        # =======================
-                        # 5M BUCKET
-                        # =======================
-                        bucket_5m = now // 300
-                        if st.last_5m_bucket is None:
-                            st.last_5m_bucket = bucket_5m
-
-                        if bucket_5m != st.last_5m_bucket:
-                            if st.close_5m is not None:
-                                # update indicators
-                                st.rsi_5m.update(st.close_5m)
-
-                                vol = st.vol_5m
-                                sma = st.vol_sma_5m.update(vol)
-                                st.vol_ratio_5m = vol / sma if sma else 0.0
-                                st.vol_dir_5m_val = st.vol_dir_5m.update(
-                                    st.close_5m, vol
-                                )
-
-                                ctx = {
-                                    "rsi": st.rsi_5m.value,
-                                    "rsi15": st.rsi_15m.value,
-                                    "ema20": st.ema20_15m.value,
-                                    "ema50": st.ema50_15m.value,
-                                    "ema50_1h": st.ema50_1h.value,
-                                    "macd": st.macd_15m.hist,
-                                    "vol_ratio": st.vol_ratio_5m,
-                                    "vol_dir": st.vol_dir_5m_val,
-                                }
-
-                                spread = st.spread()
-
-                                # -------- LONG --------
-                                ok_ctx, reasons = ctx_filters_signal(ctx, "LONG")
-                                if ok_ctx:
-                                    ok_alert, _ = should_alert(
-                                        now_s=now,
-                                        last_alert_sec=st.last_alert_sec,
-                                        spread=spread,
-                                    )
-                                    if ok_alert:
-                                        st.last_alert_sec = now
-                                        asyncio.create_task(
-                                            send_telegram(
-                                                TELEGRAM_BOT_TOKEN,
-                                                TELEGRAM_CHAT_ID,
-                                                f"🚨 LONG {sym}\nPrice: {st.close_5m:.6f}",
-                                            )
-                                        )
-
-                                # -------- SHORT --------
-                                ok_ctx, reasons = ctx_filters_signal(ctx, "SHORT")
-                                if ok_ctx:
-                                    ok_alert, _ = should_alert(
-                                        now_s=now,
-                                        last_alert_sec=st.last_alert_sec,
-                                        spread=spread,
-                                    )
-                                    if ok_alert:
-                                        st.last_alert_sec = now
-                                        asyncio.create_task(
-                                            send_telegram(
-                                                TELEGRAM_BOT_TOKEN,
-                                                TELEGRAM_CHAT_ID,
-                                                f"🚨 SHORT {sym}\nPrice: {st.close_5m:.6f}",
-                                            )
-                                        )
-
-                            # reset 5m
-                            st.last_5m_bucket = bucket_5m
-                            st.vol_5m = 0.0
-
-                        st.close_5m = mid
-
-                        # =======================
-                        # 15M BUCKET
-                        # =======================
-                        bucket_15m = now // 900
-                        if st.last_15m_bucket is None:
-                            st.last_15m_bucket = bucket_15m
-
-                        if bucket_15m != st.last_15m_bucket:
-                            if st.close_15m is not None:
-                                st.rsi_15m.update(st.close_15m)
-                                st.ema20_15m.update(st.close_15m)
-                                st.ema50_15m.update(st.close_15m)
-                                st.macd_15m.update(st.close_15m)
-                                st.ema50_1h.update(st.close_15m)
-
-                            st.last_15m_bucket = bucket_15m
-                            st.vol_15m = 0.0
-
-                        st.close_15m = mid
-
-                        # =======================
-                        # VOLUME ACCUM
-                        # =======================
-                        st.vol_5m += qty
-                        st.vol_15m += qty
+            rep = restore(store, snapshot_path)
+            if await fill_gap(store) is not None:
+                if rep["new_symbols"] and WARMUP_ENABLED:
+                    await warmup(store, symbols=rep["new_symbols"])
+                return store
+            print("[snapshot] gap not fillable (too old / REST failed), full warmup")
+        except Exception as e:
+            print("snapshot restore error:", e)
 
+    store = SymbolStore(symbols)
+    if WARMUP_ENABLED:
+        try:
+            await warmup(store)
         except Exception as e:
-            print("aggtrade error:", e)
-            await asyncio.sleep(backoff_s(1))
+            print("warmup error:", e)
+    return store
 
 
 # ============================================================
-# MAIN
+# OBSERVABILITY: /metrics + heartbeat
 # ============================================================
-async def main():
-    symbols = FALLBACK_SYMBOLS
-    states = {s: SymbolState() for s in symbols}
+def profile_names(store: SymbolStore) -> str:
+    return ",".join(s.name.upper() for s in store.strategies)
+
+
+def register_strategies(store: SymbolStore) -> None:
+    """Reject counters từng profile: alert_rules_* (1 profile) / alert_rules_<name>_*."""
+    if len(store.strategies) == 1:
+        register_stats("alert_rules", store.strategies[0].predicate.stats)
+        return
+    for strat in store.strategies:
+        register_stats(f"alert_rules_{strat.name}", strat.predicate.stats)
+
+
+async def start_metrics(port: int = METRICS_PORT):
+    if port <= 0:
+        return None
+    try:
+        return await start_metrics_server(METRICS_HOST, port)
+    except OSError as e:
+        print("metrics server error:", e)
+        return None
+
+
+# ============================================================
+# EGRESS (Telegram + MySQL), dùng chung cho main và coordinator
+# ============================================================
+async def start_delivery() -> TelegramDelivery:
+    delivery = TelegramDelivery(
+        TELEGRAM_BOT_TOKEN,
+        TELEGRAM_CHAT_ID,
+        maxsize=TELEGRAM_QUEUE_MAX,
+        global_rate=TELEGRAM_GLOBAL_RATE,
+        chat_rate=TELEGRAM_CHAT_RATE,
+    )
+    await delivery.start()
+    return delivery
+
 
-    url_book = f"{BINANCE_FUTURES_WS}?streams=" + "/".join(
-        f"{s.lower()}@bookTicker" for s in symbols
+def start_writer() -> Optional[BulkWriter]:
+    if not MYSQL_ENABLED:
+        return None
+    mcfg = MySQLConfig(
+        MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD,
+        MYSQL_DATABASE, MYSQL_BAR_TABLE, MYSQL_ALERT_TABLE,
     )
-    url_trade = f"{BINANCE_FUTURES_WS}?streams=" + "/".join(
-        f"{s.lower()}@aggTrade" for s in symbols
+    writer = BulkWriter(
+        lambda: mysql_connect(mcfg, autocommit=False),
+        batch_size=MYSQL_BATCH,
+        flush_interval=MYSQL_FLUSH_SEC,
+        max_buffer=MYSQL_MAX_BUFFER,
+        spill_path=MYSQL_SPILL_PATH,
     )
+    writer.start()
+    return writer
+
+
+# ============================================================
+# MAIN
+# ============================================================
+async def main():
+    symbols = await get_top_usdt_symbols(BINANCE_FUTURES_REST, TOP_N)
+
+    if WORKERS > 1:
+        from .cluster import run_cluster
+
+        await close_rest_clients()   # coordinator không gọi REST nữa, worker có client riêng
+        await run_cluster(symbols, WORKERS)
+        return
 
     print(f">>> starting bot | symbols={len(symbols)}")
 
-    await asyncio.gather(
-        ws_bookticker(states, url_book),
-        ws_aggtrade(states, url_trade),
+    store = await load_state(symbols)
+    universe = Universe(store)
+
+    recorder = TickRecorder(RECORD_PATH) if RECORD_PATH else None
+    if recorder is not None:
+        print(f">>> recording ticks to {RECORD_PATH}")
+
+    delivery = await start_delivery()
+
+    # ---- START MESSAGE (BẮT BUỘC) ----
+    delivery.enqueue(
+        f"✅ Bot STARTED | PROFILE={profile_names(store)} | symbols={len(store)}"
     )
 
+    emit = telegram_sink(delivery)
+    writer = start_writer()
+    if writer is not None:
+        emit = fanout(emit, db_alert_sink(store, writer))
+        bar_sink = db_bar_sink(store, writer)
+        for bars in store.bars.levels:
+            store.bars.subscribe(bars.tf_sec, bar_sink)
+    if len(store.strategies) > 1:
+        # nhiều profile: message có tên profile, chat riêng theo profile
+        for strat in store.strategies:
+            sinks = [telegram_sink(delivery, strat.profile)]
+            if writer is not None:
+                sinks.append(db_alert_sink(store, writer, strat.name))
+            strat.sink = fanout(*sinks)
+
+    register_store(store)
+    register_strategies(store)
+    register_stats("telegram", delivery.stats)
+    register_stats("universe", universe.stats)
+    register_stats("book", store.book.stats)
+    register_stats("rest", rest_client().stats)
+    if writer is not None:
+        register_stats("mysql", writer.stats)
+    metrics = await start_metrics()
+
+    tasks = [
+        ws_bookticker(store, recorder=recorder, universe=universe),
+        ws_bars(store, emit=emit, recorder=recorder, universe=universe),
+        log_delivery(delivery, writer),
+        run_heartbeat(HEARTBEAT_SEC, store, stale_sec=stale_after(HEARTBEAT_SEC)),
+        universe.run(),
+    ]
+    if SNAPSHOT_PATH and SNAPSHOT_SEC > 0:
+        tasks.append(run_snapshots(store, SNAPSHOT_PATH, SNAPSHOT_SEC))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if SNAPSHOT_PATH:
+            try:
+                save(store, SNAPSHOT_PATH)
+            except Exception as e:
+                print("snapshot error:", e)
+        await delivery.stop()
+        if writer is not None:
+            await asyncio.get_running_loop().run_in_executor(None, writer.stop)
+        if recorder is not None:
+            recorder.close()
+        if metrics is not None:
+            await metrics.cleanup()
+        await close_rest_clients()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ============================================================
+# METRICS (không phụ thuộc prometheus_client)
+# ------------------------------------------------------------
+# Histogram bucket cố định: observe() = 1 bisect + 2 phép cộng,
+# đủ rẻ để gọi trên hot path (mỗi frame WS). Giá trị lấy từ
+# nơi khác (shard WS, store, Telegram...) đăng ký bằng collector
+# và chỉ được đọc lúc render /metrics.
+# ============================================================
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Dict[str, str]
+Sample = Tuple[str, Labels, float]          # (tên metric đầy đủ, labels, value)
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]   # (name, type, help, samples)
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _num(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v in (float("inf"), float("-inf")):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Optional[Labels] = None,
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # phần tử cuối = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Xấp xỉ theo cận trên của bucket (đủ cho heartbeat log)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        acc = 0
+        for k, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return self.buckets[k] if k < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def samples(self) -> List[Sample]:
+        out: List[Sample] = []
+        acc = 0
+        for le, c in zip((*self.buckets, float("inf")), self.counts):
+            acc += c
+            out.append((self.name + "_bucket", {**self.labels, "le": _num(le)}, acc))
+        out.append((self.name + "_sum", self.labels, self.sum))
+        out.append((self.name + "_count", self.labels, self.count))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Histogram] = []
+        self.collectors: List[Collector] = []
+
+    def histogram(self, name: str, help: str, **labels: str) -> Histogram:
+        h = Histogram(name, help, labels)
+        self.metrics.append(h)
+        return h
+
+    def register(self, fn: Collector) -> None:
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        families: Dict[str, Tuple[str, str, List[Sample]]] = {}
+        for m in self.metrics:
+            families.setdefault(m.name, ("histogram", m.help, []))[2].extend(m.samples())
+        for fn in self.collectors:
+            try:
+                for name, kind, help, samples in fn():
+                    families.setdefault(name, (kind, help, []))[2].extend(samples)
+            except Exception as e:
+                print("metrics collector error:", e)
+
+        lines = []
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sname, labels, v in samples:
+                lines.append(f"{sname}{_labels(labels)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- hot path stages (giây) ----
+_STAGE = "bot_stage_seconds"
+_STAGE_HELP = "Per-stage processing time"
+DECODE = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="decode")
+STATE_UPDATE = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="state_update")
+BAR_CLOSE = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="bar_close")
+INDICATORS = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="indicators")
+CTX_FILTERS = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="ctx_filters")
+ALERT_ENQUEUE = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="alert_enqueue")
+ALERT_SEND = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="alert_send")
+BACKFILL = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="backfill")   # gap -> trade đã chèn
+REST = REGISTRY.histogram(_STAGE, _STAGE_HELP, stage="rest")           # 1 request REST (không tính chờ budget)
+
+STAGES = {
+    h.labels["stage"]: h
+    for h in (DECODE, STATE_UPDATE, BAR_CLOSE, INDICATORS, CTX_FILTERS, ALERT_ENQUEUE, ALERT_SEND, BACKFILL, REST)
+}
+
+
+# ============================================================
+# COLLECTORS (đọc lúc render, không tốn gì trên hot path)
+# ============================================================
+def register_streams(mgr) -> None:
+    """
+    ConnectionManager -> msgs / lag / reconnects theo shard. msgs/s lấy
+    bằng rate() phía Prometheus (sh.rate() để dành cho log_streams).
+    """
+    def collect():
+        shards = mgr.shards
+        lbl = [{"shard": sh.name} for sh in shards]
+        yield ("bot_ws_messages_total", "counter", "WS frames received",
+               [("bot_ws_messages_total", l, sh.msgs) for l, sh in zip(lbl, shards)])
+        yield ("bot_ws_batches_total", "counter", "Handler calls (frames drained per loop iteration)",
+               [("bot_ws_batches_total", l, sh.batches) for l, sh in zip(lbl, shards)])
+        yield ("bot_ws_lag_ms", "gauge", "Exchange event time to local receive (EWMA)",
+               [("bot_ws_lag_ms", l, float("nan") if sh.lag_ms is None else sh.lag_ms)
+                for l, sh in zip(lbl, shards)])
+        yield ("bot_ws_reconnects_total", "counter", "WS reconnects",
+               [("bot_ws_reconnects_total", l, sh.reconnects) for l, sh in zip(lbl, shards)])
+        yield ("bot_ws_connected", "gauge", "1 if the shard is connected",
+               [("bot_ws_connected", l, int(sh.connected)) for l, sh in zip(lbl, shards)])
+
+    REGISTRY.register(collect)
+
+
+def register_store(store, clock: Callable[[], float] = time.time) -> None:
+    """Staleness theo symbol = now - trade time gần nhất (mode kline: kline đóng gần nhất)."""
+    def collect():
+        now_ms = clock() * 1000
+        last = store.last_tick_ms
+        yield ("bot_symbol_staleness_seconds", "gauge", "Seconds since last trade (kline mode: closed kline) per symbol",
+               [("bot_symbol_staleness_seconds", {"symbol": s},
+                 (now_ms - last[i]) / 1000 if last[i] else float("nan"))
+                for i, s in enumerate(store.symbols) if s])
+        yield ("bot_late_trades_total", "counter", "Trades that arrived after their bar closed",
+               [("bot_late_trades_total", {}, store.bars_5m.late_trades)])
+
+    REGISTRY.register(collect)
+
+
+def register_stats(prefix: str, stats: Callable[[], dict]) -> None:
+    """dict số từ .stats() (Telegram, BulkWriter...) -> gauge bot_<prefix>_<key>."""
+    def collect():
+        for k, v in stats().items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                name = f"bot_{prefix}_{k}"
+                yield (name, "gauge", f"{prefix} {k}", [(name, {}, v)])
+
+    REGISTRY.register(collect)
+
+
+# ============================================================
+# HTTP /metrics (aiohttp)
+# ============================================================
+async def start_metrics_server(host: str, port: int):
+    from aiohttp import web
+
+    async def metrics(_req):
+        return web.Response(
+            body=REGISTRY.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f">>> metrics on http://{host}:{port}/metrics")
+    return runner
+
+
+# ============================================================
+# HEARTBEAT (tóm tắt định kỳ ra log)
+# ============================================================
+def _ms(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v * 1000:.3g}"
+
+
+async def run_heartbeat(every: float, store=None, *, stale_sec: float = 0.0) -> None:
+    """stale_sec: ngưỡng đếm symbol không có dữ liệu (0 = every)."""
+    stale_sec = stale_sec or every
+    while True:
+        await asyncio.sleep(every)
+        parts = [
+            f"{name} p50={_ms(h.quantile(0.5))} p99={_ms(h.quantile(0.99))}ms n={h.count}"
+            for name, h in STAGES.items()
+            if h.count
+        ]
+        if store is not None:
+            now_ms = time.time() * 1000
+            stale = int((((now_ms - store.last_tick_ms) > stale_sec * 1000) & store.active).sum())
+            parts.append(f"stale>{stale_sec:g}s={stale}/{len(store)}")
+        print("[heartbeat] " + " | ".join(parts))
@@ -1,6 +1,14 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
-import mysql.connector
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .utils import backoff_s
 
 @dataclass
 class MySQLConfig:
@@ -12,17 +20,22 @@ class MySQLConfig:
     bar_table: str
     alert_table: str
 
+def mysql_connect(cfg: MySQLConfig, autocommit: bool = True):
+    import mysql.connector  # optional dependency, chỉ cần khi bật MySQL
+
+    return mysql.connector.connect(
+        host=cfg.host,
+        port=cfg.port,
+        user=cfg.user,
+        password=cfg.password,
+        database=cfg.database,
+        autocommit=autocommit,
+    )
+
 class MySQLWriter:
     def __init__(self, cfg: MySQLConfig):
         self.cfg = cfg
-        self.conn = mysql.connector.connect(
-            host=cfg.host,
-            port=cfg.port,
-            user=cfg.user,
-            password=cfg.password,
-            database=cfg.database,
-            autocommit=True,
-        )
+        self.conn = mysql_connect(cfg)
 
     def insert_bars(self, rows: List[Dict[str, Any]]) -> None:
         if not rows:
@@ -44,3 +57,302 @@ class MySQLWriter:
         cur = self.conn.cursor()
         cur.execute(sql, (symbol, sec, side, prob, pred_ret, thr, mid, spread, message))
         cur.close()
+
+
+# ============================================================
+# BUFFERED BULK WRITER (không block event loop)
+# ------------------------------------------------------------
+# - write(table, row) chỉ append vào buffer trong RAM (có lock)
+# - 1 background thread flush theo kích thước (batch_size) hoặc
+#   thời gian (flush_interval) bằng INSERT nhiều dòng
+# - DB chậm / lỗi: buffer đầy (max_buffer) -> dòng mới vào deque
+#   overflow (RAM), thread spill cả lô ra file jsonl (write() không
+#   đụng file); khi DB hồi phục thread đọc spill lại và ghi tiếp
+# - INSERT lỗi: DB vẫn trả lời "SELECT 1" -> lỗi dữ liệu: chia đôi
+#   batch tới khi cô lập dòng lỗi, dòng đó ra reject file (không
+#   chặn các dòng sau); không -> lỗi kết nối: đóng connection,
+#   giữ batch, backoff rồi thử lại
+# - connect: factory DB-API (mysql.connector, sqlite3, ...),
+#   placeholder theo paramstyle ("%s" cho MySQL, "?" cho SQLite);
+#   connection chỉ được dùng / đóng trong thread writer
+# ============================================================
+Row = Tuple[str, Dict[str, Any]]
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        *,
+        placeholder: str = "%s",
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        max_buffer: int = 50_000,
+        spill_path: Optional[str] = None,
+        reject_path: Optional[str] = None,
+    ):
+        self.connect = connect
+        self.placeholder = placeholder
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spill_path = spill_path
+        self.reject_path = reject_path or (f"{spill_path}.rejected" if spill_path else None)
+
+        self._buf: Deque[Row] = deque()
+        self._overflow: Deque[Row] = deque()   # buffer đầy -> chờ thread spill
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+
+        # metrics
+        self.rows_written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_batch = 0
+
+    # --------------------------------------------------------
+    # lifecycle
+    # --------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bulk-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush phần còn lại rồi dừng thread (chạy trong executor nếu gọi từ async)."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # thread vẫn đang dùng connection (DB treo) -> để thread tự đóng
+                print(f"bulk writer: thread still running after {timeout:g}s")
+                return
+            self._thread = None
+        self._close_conn()
+
+    def stats(self) -> dict:
+        return {
+            "buffer": len(self._buf),
+            "overflow": len(self._overflow),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "last_batch": self.last_batch,
+            "last_flush_ms": self.last_flush_ms,
+            "errors": self.errors,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+    # --------------------------------------------------------
+    # producer (gọi từ asyncio loop, O(1))
+    # --------------------------------------------------------
+    def write(self, table: str, row: Dict[str, Any]) -> None:
+        with self._lock:
+            if len(self._buf) < self.max_buffer:
+                self._buf.append((table, row))
+                full = len(self._buf) >= self.batch_size
+            else:
+                full = True
+                self._overflow.append((table, row))
+        if full:
+            self._wake.set()
+
+    # --------------------------------------------------------
+    # spill
+    # --------------------------------------------------------
+    def _spill(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        if not self.spill_path:
+            self.dropped += len(rows)
+            return
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for table, row in rows:
+                f.write(json.dumps([table, row], default=str) + "\n")
+        self.spilled += len(rows)
+
+    def _spill_overflow(self) -> None:
+        with self._lock:
+            rows, self._overflow = list(self._overflow), deque()
+        self._spill(rows)
+
+    def _reject(self, rows: List[Row], err: Exception) -> None:
+        """Dòng DB không nhận (sai cột / kiểu / constraint) -> reject file, không thử lại."""
+        self.rejected += len(rows)
+        print(f"bulk writer: rejected {len(rows)} row(s): {err}")
+        if not self.reject_path:
+            return
+        with open(self.reject_path, "a", encoding="utf-8") as f:
+            for table, row in rows:
+                f.write(json.dumps([table, row, str(err)], default=str) + "\n")
+
+    def _load_spill(self) -> None:
+        """DB đã ổn + buffer trống -> nạp lại spill file vào buffer."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        tmp = self.spill_path + ".loading"
+        with self._lock:
+            os.replace(self.spill_path, tmp)
+        with open(tmp, encoding="utf-8") as f:
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        os.remove(tmp)
+        with self._lock:
+            self._buf.extendleft(reversed(rows))
+            overflow = len(self._buf) - self.max_buffer
+            if overflow > 0:
+                self._spill([self._buf.pop() for _ in range(overflow)][::-1])
+
+    # --------------------------------------------------------
+    # consumer thread
+    # --------------------------------------------------------
+    def _take(self) -> List[Row]:
+        with self._lock:
+            n = min(self.batch_size, len(self._buf))
+            return [self._buf.popleft() for _ in range(n)]
+
+    def _insert(self, rows: List[Row]) -> None:
+        # gom theo (table, cột) -> 1 INSERT nhiều dòng / nhóm
+        groups: Dict[Tuple[str, Tuple[str, ...]], List[tuple]] = {}
+        for table, row in rows:
+            cols = tuple(row.keys())
+            groups.setdefault((table, cols), []).append(tuple(row[c] for c in cols))
+
+        cur = self._connection().cursor()
+        try:
+            for (table, cols), vals in groups.items():
+                one = "(" + ",".join([self.placeholder] * len(cols)) + ")"
+                sql = f"INSERT INTO {table} ({','.join(cols)}) VALUES " + ",".join([one] * len(vals))
+                cur.execute(sql, [v for row in vals for v in row])
+            self._conn.commit()
+        finally:
+            cur.close()
+
+    # --------------------------------------------------------
+    # connection (chỉ gọi trong thread writer)
+    # --------------------------------------------------------
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def _close_conn(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _rollback(self) -> None:
+        try:
+            if self._conn is not None:
+                self._conn.rollback()
+        except Exception:
+            self._close_conn()
+
+    def _alive(self) -> bool:
+        """DB còn trả lời (reconnect nếu cần) -> lỗi vừa rồi là lỗi dữ liệu."""
+        try:
+            cur = self._connection().cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchall()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            self._close_conn()
+            return False
+
+    def _isolate(self, rows: List[Row]) -> None:
+        """
+        Lỗi dữ liệu: chia đôi batch tới khi cô lập dòng lỗi -> reject,
+        phần còn lại ghi bình thường. Mất kết nối giữa chừng: phần
+        chưa ghi về đầu buffer rồi raise.
+        """
+        stack = [rows]
+        while stack:
+            part = stack.pop()
+            try:
+                self._insert(part)
+            except Exception as e:
+                self._rollback()
+                if not self._alive():
+                    rest = [r for p in [part, *reversed(stack)] for r in p]
+                    with self._lock:
+                        self._buf.extendleft(reversed(rest))
+                    raise
+                if len(part) == 1:
+                    self._reject(part, e)
+                    continue
+                mid = len(part) // 2
+                stack += [part[mid:], part[:mid]]
+                continue
+            self.rows_written += len(part)
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        finally:
+            self._close_conn()
+
+    def _loop(self) -> None:
+        attempt = 0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._stop.is_set()
+            self._spill_overflow()
+
+            while True:
+                rows = self._take()
+                if not rows:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    self._insert(rows)
+                except Exception as e:
+                    print("bulk writer error:", e)
+                    self.errors += 1
+                    self._rollback()
+                    if self._alive():
+                        try:
+                            self._isolate(rows)
+                            continue
+                        except Exception:
+                            pass   # mất kết nối lúc tách batch, rows đã về buffer
+                    else:
+                        with self._lock:
+                            self._buf.extendleft(reversed(rows))
+                        self._close_conn()
+                    if stopping:
+                        # không chờ DB nữa: đẩy hết ra spill
+                        with self._lock:
+                            rest, self._buf = list(self._buf), deque()
+                        self._spill(rest)
+                        self._spill_overflow()
+                        return
+                    self._stop.wait(backoff_s(attempt))
+                    attempt += 1
+                    break
+                attempt = 0
+                self.flushes += 1
+                self.rows_written += len(rows)
+                self.last_batch = len(rows)
+                self.last_flush_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+            self._spill_overflow()
+            if not stopping and not self._buf and attempt == 0:
+                self._load_spill()
+            if stopping and not self._buf:
+                return
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+from .config import ALERT_DEBUG
+from .metrics import ALERT_ENQUEUE, BAR_CLOSE, CTX_FILTERS, INDICATORS
+from .state import SymbolStore
+from .strategy import AlertSink, Strategy
+
+# AlertSink: sink(now, side, symbol, price) -> live: gửi Telegram, replay: print
+# bar sink(boundary_sec, ids) -> gọi sau mỗi lần đóng bar 5m (vd ghi DB)
+BarSink = Callable[[int, np.ndarray], None]
+
+
+def format_alert(side: str, sym: str, price: float, profile: Optional[str] = None) -> str:
+    tag = f" [{profile}]" if profile else ""
+    return f"🚨 {side} {sym}{tag}\nPrice: {price:.6f}"
+
+
+# ============================================================
+# 5M ALERTS (sau khi store đã update indicator)
+# ------------------------------------------------------------
+# Mỗi strategy: 1 lần evaluate() cho mọi symbol vừa đóng bar,
+# LONG + SHORT cùng lúc (predicate đã compile từ config của
+# profile lúc khởi động), cooldown riêng, gửi qua sink riêng
+# (không có -> `emit`).
+# ============================================================
+def alerts_5m(store: SymbolStore, idx, now: int, emit: AlertSink) -> None:
+    idx = np.asarray(idx)
+    if not idx.size:
+        return
+    spread = store.spreads(idx)
+    close = store.bars_5m.close
+    for strat in store.strategies:
+        _alerts(strat, store, idx, now, strat.sink or emit, spread, close)
+
+
+def _alerts(
+    strat: Strategy, store: SymbolStore, idx: np.ndarray, now: int,
+    emit: AlertSink, spread: np.ndarray, close: np.ndarray,
+) -> None:
+    pred = strat.predicate
+    t0 = time.perf_counter()
+    cols = strat.ctx_arrays(idx)
+    long_ok, short_ok = pred.evaluate(cols, now, strat.last_alert_sec[idx], spread)
+    CTX_FILTERS.observe(time.perf_counter() - t0)
+
+    if ALERT_DEBUG:
+        for k in np.flatnonzero(~(long_ok | short_ok)):
+            ctx = strat.ctx(int(idx[k]))
+            print(f"[alert] {strat.name} {store.symbols[idx[k]]} LONG {pred.explain(ctx, 'LONG')} "
+                  f"SHORT {pred.explain(ctx, 'SHORT')}")
+
+    for k in np.flatnonzero(long_ok | short_ok):
+        i = int(idx[k])
+        sym = store.symbols[i]
+        price = float(close[i])
+        strat.last_alert_sec[i] = now
+        t0 = time.perf_counter()
+        if long_ok[k]:
+            emit(now, "LONG", sym, price)
+        if short_ok[k]:
+            emit(now, "SHORT", sym, price)
+        ALERT_ENQUEUE.observe(time.perf_counter() - t0)
+
+
+# ============================================================
+# BAR CLOSE (batch cho mọi symbol, theo biên 5m)
+# ------------------------------------------------------------
+# advance_to(bucket): đóng lần lượt các bar 5m cho tới khi bar
+# đang mở = `bucket`. Mỗi bar đóng tại biên (bucket+1)*300 và
+# dùng biên đó làm `now` cho cooldown. Bar 5m được gộp lên
+# 15m/1h/4h sau khi xét alert (alert 5m dùng 15m đã đóng trước).
+# ============================================================
+def advance_to(
+    store: SymbolStore, bucket: int, emit: AlertSink, on_bar: Optional[BarSink] = None
+) -> int:
+    bars = store.bars_5m
+    closed = 0
+    while bars.open_bucket is not None and bars.open_bucket < bucket:
+        boundary = (bars.open_bucket + 1) * bars.tf_sec
+        t0 = time.perf_counter()
+
+        idx = store.bars.close_base(boundary)
+        INDICATORS.observe(time.perf_counter() - t0)
+        if on_bar is not None:
+            on_bar(boundary, idx)
+        alerts_5m(store, idx, boundary, emit)
+        store.bars.propagate(boundary, idx)
+        BAR_CLOSE.observe(time.perf_counter() - t0)
+        closed += 1
+    return closed
+
+
+def close_due(
+    store: SymbolStore, now: float, emit: AlertSink, grace: float, on_bar: Optional[BarSink] = None
+) -> int:
+    """Đóng mọi bar đã qua biên + grace tính theo đồng hồ `now` (giây)."""
+    return advance_to(store, int(now - grace) // store.bars_5m.tf_sec, emit, on_bar)
+
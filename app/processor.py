@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from itertools import groupby
+from typing import Callable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .decode import Book, Kline, Trade
+from .pipeline import AlertSink, BarSink, advance_to
+from .state import SymbolStore
+
+# batch trade >= ngưỡng này -> cập nhật bar bằng numpy (add_many),
+# nhỏ hơn thì vòng lặp scalar rẻ hơn (ufunc.at có overhead cố định)
+VECTOR_MIN = 64
+
+
+class Gap(NamedTuple):
+    """aggTrade id first..last (gồm 2 đầu) bị mất giữa 2 trade liên tiếp của 1 symbol."""
+    symbol: str
+    first: int
+    last: int
+    pre_ms: int    # trade time trước gap
+    post_ms: int   # trade time sau gap
+
+    @property
+    def size(self) -> int:
+        return self.last - self.first + 1
+
+
+# (price, qty, t_ms, agg_id) lấy lại qua REST
+Fill = Tuple[float, float, int, int]
+
+
+# ============================================================
+# TICK PROCESSOR (không I/O)
+# ------------------------------------------------------------
+# Nhận batch tick đã decode (mọi frame WS đang chờ trong buffer
+# của 1 shard), cập nhật state trong 1 lượt:
+#   trade -> catch-up đóng bar (advance_to) -> bar accum 5m
+#          -> last_tick_ms
+#   book  -> bid/ask
+#   kline -> (INGEST_MODE=kline) ghi đè cả bar 5m của bucket
+# Đóng bar theo lịch (indicator, ctx, LONG/SHORT gate, alert)
+# vẫn do scheduler gọi close_due trên cùng store. Không đọc
+# đồng hồ, không đụng socket: live, bench, replay dùng chung.
+#
+# on_gap != None: theo dõi aggTrade id từng symbol, id nhảy cóc
+# (mất frame khi reconnect) -> on_gap(Gap). Trade lấy lại được
+# đưa vào bằng backfill() (xem app/backfill.py).
+# ============================================================
+class TickProcessor:
+    def __init__(
+        self,
+        store: SymbolStore,
+        emit: AlertSink,
+        on_bar: Optional[BarSink] = None,
+        *,
+        vector_min: int = VECTOR_MIN,
+        on_gap: Optional[Callable[[Gap], None]] = None,
+    ):
+        self.store = store
+        self.emit = emit
+        self.on_bar = on_bar
+        self.vector_min = vector_min
+        self.on_gap = on_gap
+
+        # stats
+        self.batches = 0
+        self.trades_in = 0
+        self.books_in = 0
+        self.klines_in = 0
+        self.late_klines = 0
+
+    # --------------------------------------------------------
+    # trades: (symbol, price, qty, t_ms, agg_id)
+    # --------------------------------------------------------
+    def trades(self, ticks: Sequence[Trade], now_ms: int = 0) -> None:
+        """now_ms thay cho t_ms = 0 (frame không có trade time)."""
+        if not ticks:
+            return
+        self.batches += 1
+        self.trades_in += len(ticks)
+        if len(ticks) >= self.vector_min:
+            self._trades_vec(ticks, now_ms)
+            return
+
+        store, emit, on_bar, on_gap = self.store, self.emit, self.on_bar, self.on_gap
+        bars = store.bars_5m
+        ids = store.ids
+        last = store.last_tick_ms
+        last_id = store.last_agg_id
+        tf = bars.tf_sec
+        for sym, price, qty, t_ms, agg_id in ticks:
+            t_ms = t_ms or now_ms
+            t = t_ms // 1000
+            if bars.open_bucket is not None and t // tf > bars.open_bucket + 1:
+                advance_to(store, t // tf - 1, emit, on_bar)
+            i = ids[sym]
+            if on_gap is not None and agg_id > last_id[i]:
+                prev = int(last_id[i])
+                if prev and agg_id > prev + 1:
+                    on_gap(Gap(sym, prev + 1, agg_id - 1, int(last[i]), t_ms))
+                last_id[i] = agg_id
+            bars.add(i, t, price, qty)
+            last[i] = t_ms
+
+    def _trades_vec(self, ticks: Sequence[Trade], now_ms: int) -> None:
+        store = self.store
+        bars = store.bars_5m
+        ids = store.ids
+        n = len(ticks)
+        idx = np.fromiter((ids[x[0]] for x in ticks), dtype=np.int64, count=n)
+        price = np.fromiter((x[1] for x in ticks), dtype=np.float64, count=n)
+        qty = np.fromiter((x[2] for x in ticks), dtype=np.float64, count=n)
+        t_ms = np.fromiter((x[3] for x in ticks), dtype=np.int64, count=n)
+        t_ms[t_ms == 0] = now_ms
+        if self.on_gap is not None:
+            agg = np.fromiter((x[4] for x in ticks), dtype=np.int64, count=n)
+            self._check_ids(idx, agg, t_ms)
+        t_sec = t_ms // 1000
+        bucket = t_sec // bars.tf_sec
+
+        # cắt batch tại chỗ trade vượt quá bar kế tiếp -> đóng bar rồi đi tiếp
+        start = 0
+        while start < n:
+            if bars.open_bucket is None:
+                bars.add(int(idx[start]), int(t_sec[start]), float(price[start]), float(qty[start]))
+                start += 1
+                continue
+            over = np.flatnonzero(bucket[start:] > bars.open_bucket + 1)
+            if over.size and over[0] == 0:
+                advance_to(store, int(bucket[start]) - 1, self.emit, self.on_bar)
+                continue
+            end = start + int(over[0]) if over.size else n
+            s = slice(start, end)
+            bars.add_many(idx[s], t_sec[s], price[s], qty[s])
+            start = end
+
+        np.maximum.at(store.last_tick_ms, idx, t_ms)
+
+    def _check_ids(self, idx: np.ndarray, agg: np.ndarray, t_ms: np.ndarray) -> None:
+        """Gap theo id trong batch: so mỗi trade với trade trước của cùng symbol."""
+        store = self.store
+        last_id = store.last_agg_id
+        order = np.lexsort((agg, idx))
+        si, sa, st = idx[order], agg[order], t_ms[order]
+        head = np.ones(len(si), dtype=bool)
+        head[1:] = si[1:] != si[:-1]
+        prev = np.where(head, last_id[si], np.roll(sa, 1))
+        prev_t = np.where(head, store.last_tick_ms[si], np.roll(st, 1))
+        for k in np.flatnonzero((prev > 0) & (sa > prev + 1)).tolist():
+            self.on_gap(Gap(store.symbols[si[k]], int(prev[k]) + 1, int(sa[k]) - 1,
+                            int(prev_t[k]), int(st[k])))
+        np.maximum.at(last_id, idx, agg)
+
+    def backfill(self, gap: Gap, fills: Sequence[Fill]) -> Tuple[int, int]:
+        """
+        Chèn trade của gap (sort theo id) vào bar 5m đang mở / kế tiếp.
+        Trả về (merged, lost): lost = trade thuộc bar đã đóng / symbol đã bỏ.
+        """
+        i = self.store.ids.get(gap.symbol)
+        if i is None:
+            return 0, len(fills)
+        bars = self.store.bars_5m
+        tf_ms = bars.tf_sec * 1000
+        pre_b, post_b = gap.pre_ms // tf_ms, gap.post_ms // tf_ms
+        merged = lost = 0
+        for b, group in groupby(fills, key=lambda f: f[2] // tf_ms):
+            rows = list(group)
+            ok = bars.insert(
+                i, b, [r[0] for r in rows], [r[1] for r in rows],
+                keep_open=b == pre_b, keep_close=b == post_b,
+            )
+            if ok:
+                merged += len(rows)
+            else:
+                lost += len(rows)
+        return merged, lost
+
+    # --------------------------------------------------------
+    # klines đã đóng: (symbol, start_ms, o, h, l, c, v, event_ms)
+    # --------------------------------------------------------
+    def klines(self, ticks: Sequence[Kline]) -> None:
+        """
+        Kline là OHLCV đầy đủ của bucket -> put() thay cho add() từng
+        trade; level 15m/1h/4h vẫn gộp từ 5m như mode aggTrade.
+        Kline của bar đã đóng (tới quá muộn) bị bỏ và đếm.
+        """
+        if not ticks:
+            return
+        self.batches += 1
+        self.klines_in += len(ticks)
+        store, emit, on_bar = self.store, self.emit, self.on_bar
+        bars = store.bars_5m
+        ids = store.ids
+        last = store.last_tick_ms
+        tf_ms = bars.tf_sec * 1000
+        for sym, start_ms, o, h, l, c, v, t_ms in ticks:
+            b = start_ms // tf_ms
+            if bars.open_bucket is not None and b > bars.open_bucket + 1:
+                advance_to(store, b - 1, emit, on_bar)
+            i = ids[sym]
+            if not bars.put(i, b, o, h, l, c, v):
+                self.late_klines += 1
+            if t_ms > last[i]:
+                last[i] = t_ms
+
+    # --------------------------------------------------------
+    # books: (symbol, bid, ask, t_ms)
+    # --------------------------------------------------------
+    def books(self, ticks: Sequence[Book]) -> None:
+        if not ticks:
+            return
+        self.books_in += len(ticks)
+        store = self.store
+        ids, bid, ask = store.ids, store.bid, store.ask
+        for sym, b, a, _ in ticks:
+            i = ids[sym]
+            bid[i] = b
+            ask[i] = a
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "trades": self.trades_in,
+            "books": self.books_in,
+            "klines": self.klines_in,
+            "late_klines": self.late_klines,
+            "avg_batch": round((self.trades_in + self.klines_in) / self.batches, 1) if self.batches else 0.0,
+        }
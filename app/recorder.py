@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import gzip
+import os
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# ============================================================
+# BINARY TICK RECORDING
+# ------------------------------------------------------------
+# File = MAGIC (8 byte) + các record cố định 43 byte (little-endian):
+#
+#   kind u1 | sym u2 | recv_ms i8 | t_ms i8 | a f8 | b f8 | id i8
+#
+#   KIND_SYM   : định nghĩa symbol id -> tên (tên nằm trong 24 byte a|b|id)
+#   KIND_TRADE : aggTrade  (a=price, b=qty, id=aggTradeId)
+#   KIND_BOOK  : bookTicker (a=bid, b=ask)
+#
+# recv_ms = giờ local lúc nhận frame (đồng hồ bot đã thấy),
+# t_ms    = event/trade time của Binance.
+# Record cố định -> đọc lại bằng np.frombuffer, không parse từng dòng.
+# Đuôi .gz -> nén gzip.
+# ============================================================
+MAGIC = b"TREC0001"
+
+KIND_SYM = 0
+KIND_TRADE = 1
+KIND_BOOK = 2
+
+_REC = struct.Struct("<BHqqddq")
+_SYM = struct.Struct("<BHqq24s")
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("kind", "u1"),
+        ("sym", "<u2"),
+        ("recv_ms", "<i8"),
+        ("t_ms", "<i8"),
+        ("a", "<f8"),
+        ("b", "<f8"),
+        ("id", "<i8"),
+    ]
+)
+assert RECORD_DTYPE.itemsize == _REC.size == _SYM.size
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class TickRecorder:
+    """Ghi aggTrade/bookTicker thô ra file nhị phân (append)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sym_ids: Dict[str, int] = {}
+        self.records = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            symbols, _ = load_recording(path)
+            self.sym_ids = {s: k for k, s in enumerate(symbols)}
+
+        self._f = _open(path, "ab")
+        if not exists:
+            self._f.write(MAGIC)
+
+    def __enter__(self) -> "TickRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _sym(self, sym: str) -> int:
+        k = self.sym_ids.get(sym)
+        if k is None:
+            k = self.sym_ids[sym] = len(self.sym_ids)
+            self._f.write(_SYM.pack(KIND_SYM, k, 0, 0, sym.encode()[:24]))
+        return k
+
+    def trade(self, sym: str, recv_ms: int, t_ms: int, price: float, qty: float, agg_id: int = 0) -> None:
+        self._f.write(_REC.pack(KIND_TRADE, self._sym(sym), recv_ms, t_ms, price, qty, agg_id))
+        self.records += 1
+
+    def book(self, sym: str, recv_ms: int, t_ms: int, bid: float, ask: float) -> None:
+        self._f.write(_REC.pack(KIND_BOOK, self._sym(sym), recv_ms, t_ms, bid, ask, 0))
+        self.records += 1
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+
+def load_recording(path: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Trả về (symbols, records) với records là structured array
+    (RECORD_DTYPE) chỉ gồm TRADE/BOOK; records["sym"] là index vào symbols.
+    """
+    with _open(path, "rb") as f:
+        raw = f.read()
+    if raw[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"not a tick recording: {path}")
+
+    body = raw[len(MAGIC):]
+    # bỏ record cuối bị ghi dở (crash giữa chừng)
+    body = body[: len(body) - len(body) % RECORD_DTYPE.itemsize]
+    rec = np.frombuffer(body, dtype=RECORD_DTYPE)
+
+    defs = rec[rec["kind"] == KIND_SYM]
+    symbols: List[str] = [""] * len(defs)
+    raw_defs = defs.tobytes()
+    for k in range(len(defs)):
+        _, sid, _, _, name = _SYM.unpack_from(raw_defs, k * _SYM.size)
+        symbols[sid] = name.rstrip(b"\0").decode()
+
+    return symbols, rec[rec["kind"] != KIND_SYM]
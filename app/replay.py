@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from .config import BAR_CLOSE_GRACE_SEC
+from .pipeline import AlertSink, close_due
+from .processor import TickProcessor
+from .recorder import KIND_BOOK, KIND_TRADE, load_recording
+from .state import SymbolStore
+
+
+def print_alert(now: int, side: str, sym: str, price: float) -> None:
+    ts = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[replay] {ts} {side:<5} {sym:<12} {price:.6f}")
+
+
+# ============================================================
+# REPLAY
+# ------------------------------------------------------------
+# Đưa file recording qua đúng TickProcessor.trades / close_due
+# (bucket -> indicator -> alert_engine) như live: bar theo trade
+# time, scheduler giả lập bằng recv_ms đã ghi, nhanh hết mức CPU.
+# Trade đi theo batch: mọi trade tới trước lần close_due kế tiếp
+# (recv < biên + grace), tối đa `batch` trade / lần.
+#
+# bookTicker không cần đi qua từng record: chỉ khi đổi bucket
+# (bar close) mới đồng bộ bid/ask mới nhất của mọi symbol vào
+# store (spread cho alert gate).
+# ============================================================
+def replay(
+    path: str,
+    *,
+    emit: Optional[AlertSink] = None,
+    store: Optional[SymbolStore] = None,
+    grace: float = BAR_CLOSE_GRACE_SEC,
+    batch: int = 4096,
+) -> dict:
+    t0 = time.perf_counter()
+    emit = emit or print_alert
+
+    symbols, rec = load_recording(path)
+    store = store or SymbolStore(symbols)
+    # id trong file -> id trong store (-1 = symbol không theo dõi)
+    to_store = np.array([store.ids.get(s, -1) for s in symbols] or [-1], dtype=np.int64)
+
+    kind = rec["kind"]
+    sym = rec["sym"].astype(np.int64)
+    is_book = kind == KIND_BOOK
+    n = len(rec)
+
+    bid = rec["a"]
+    ask = rec["b"]
+
+    # book index theo từng symbol (để sync lúc bar close)
+    book_idx = {
+        s: np.flatnonzero(is_book & (sym == s)) for s in np.unique(sym[is_book])
+    }
+
+    def sync_book(k: int) -> None:
+        for s, ks in book_idx.items():
+            i = to_store[s]
+            j = np.searchsorted(ks, k, side="right") - 1
+            if i >= 0 and j >= 0:
+                store.bid[i] = bid[ks[j]]
+                store.ask[i] = ask[ks[j]]
+
+    # ---- trade: OHLCV theo giá trade (a = price, b = qty) ----
+    tk = np.flatnonzero((kind == KIND_TRADE) & (to_store[sym] >= 0))
+    prices = rec["a"][tk].tolist()
+    qtys = rec["b"][tk].tolist()
+    recv_ms = rec["recv_ms"][tk]
+    nows = recv_ms / 1000
+    t_ms = np.where(rec["t_ms"][tk] > 0, rec["t_ms"][tk], recv_ms).tolist()
+    names = [store.symbols[i] for i in to_store[sym[tk]].tolist()]
+    ticks = [(s, p, q, t, 0) for s, p, q, t in zip(names, prices, qtys, t_ms)]
+
+    alerts = 0
+
+    def counting_emit(now, side, s, price):
+        nonlocal alerts
+        alerts += 1
+        emit(now, side, s, price)
+
+    processor = TickProcessor(store, counting_emit)
+    bars = store.bars_5m
+    k, n_trades = 0, len(ticks)
+    while k < n_trades:
+        if bars.open_bucket is None:
+            processor.trades(ticks[k:k + 1])
+            k += 1
+            continue
+        # scheduler giả lập: đồng hồ = recv time, đóng bar sau biên + grace
+        due = (bars.open_bucket + 1) * bars.tf_sec + grace
+        if nows[k] >= due:
+            sync_book(int(tk[k]))
+            close_due(store, float(nows[k]), counting_emit, grace)
+            continue
+        # catch-up trong batch chỉ đẩy biên ra xa hơn -> không trade nào trong batch tới hạn
+        hit = np.flatnonzero(nows[k:k + batch] >= due)
+        end = k + (int(hit[0]) if hit.size else min(batch, n_trades - k))
+        processor.trades(ticks[k:end])
+        k = end
+
+    elapsed = time.perf_counter() - t0
+    report = {
+        "records": n,
+        "trades": n_trades,
+        "alerts": alerts,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": int(n / elapsed) if elapsed else 0,
+    }
+    print(
+        f"[replay] records={n} trades={n_trades} alerts={alerts} "
+        f"in {report['elapsed_s']}s ({report['records_per_s']}/s)"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay a tick recording through the alert pipeline")
+    ap.add_argument("path")
+    args = ap.parse_args()
+    replay(args.path)
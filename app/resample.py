@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
-@dataclass
+@dataclass(slots=True)
 class Candle:
     start_sec: int
     end_sec: int
@@ -19,6 +19,20 @@ class TimeframeResampler:
         self.o = self.h = self.l = self.c = None
         self.v = 0.0
 
+    def current(self) -> Optional[Candle]:
+        """Candle đang mở (chưa đóng), None nếu chưa có tick."""
+        if self.cur_start is None:
+            return None
+        return Candle(
+            start_sec=self.cur_start,
+            end_sec=self.cur_end,
+            open=self.o,
+            high=self.h,
+            low=self.l,
+            close=self.c,
+            volume=self.v,
+        )
+
     def update(self, sec: int, price: float, volume: float) -> Tuple[Optional[Candle], bool]:
         # Determine bucket
         start = (sec // self.tf_sec) * self.tf_sec
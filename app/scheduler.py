@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from .config import BAR_CLOSE_GRACE_SEC
+from .pipeline import AlertSink, BarSink, close_due
+from .state import SymbolStore
+
+
+# ============================================================
+# BAR SCHEDULER
+# ------------------------------------------------------------
+# 1 task duy nhất: ngủ tới biên 5m kế tiếp + grace rồi đóng bar
+# cho toàn bộ symbol trong 1 batch (biên 15m/1h/4h luôn trùng
+# biên 5m). Alert đi ra ngay tại biên, không chờ trade kế tiếp.
+# drain(): chờ việc đang dở cần vào bar trước khi đóng (backfill).
+# ============================================================
+async def run_bar_scheduler(
+    store: SymbolStore,
+    emit: AlertSink,
+    *,
+    clock: Callable[[], float] = time.time,
+    grace: float = BAR_CLOSE_GRACE_SEC,
+    tf_sec: int = 300,
+    on_bar: Optional[BarSink] = None,
+    drain: Optional[Callable[[], Awaitable[None]]] = None,
+):
+    print(f">>> bar scheduler started | tf={tf_sec}s grace={grace}s")
+    while True:
+        now = clock()
+        deadline = (int(now - grace) // tf_sec + 1) * tf_sec + grace
+        await asyncio.sleep(max(0.0, deadline - now))
+        if drain is not None:
+            await drain()
+        try:
+            close_due(store, clock(), emit, grace, on_bar)
+        except Exception as e:
+            print("bar scheduler error:", e)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .state import BarAccum, SymbolStore, get_path, resolve, row_arrays
+
+# ============================================================
+# STATE SNAPSHOT (binary, có version)
+# ------------------------------------------------------------
+# Layout:
+#   MAGIC (8) | VERSION u16 | header_len u32 | header (json utf-8)
+#   | các mảng raw (C order, nối liền) | crc32 u32 (của mọi byte trước)
+# header = {taken_at, symbols, bars: {name: open_bucket, ...},
+#           arrays: [[path, dtype, shape, offset], ...]}
+#
+# path là đường dẫn attribute / key dict trong store
+# ("graph.nodes.rsi_300_14.bank.avg_gain", "last_alert.trade",
+# "bars_5m.close", ...), lấy tự động qua state.row_arrays nên
+# thêm node / strategy mới không phải sửa file này.
+# Restore map theo tên symbol (universe đổi vẫn dùng được), mảng
+# đổi shape (vd đổi period) bị bỏ qua và giữ giá trị mặc định.
+# ============================================================
+MAGIC = b"TSNAP001"
+VERSION = 3   # 2: RSI Wilder (avg_gain/avg_loss), VolumeSMA running total; 3: indicator graph
+_PREFIX = struct.Struct("<8sHI")
+_CRC = struct.Struct("<I")
+
+
+def capture(store: SymbolStore) -> Tuple[dict, List[np.ndarray]]:
+    """
+    Copy state (chạy trên event loop, chỉ là memcpy vài trăm KB).
+    Phần serialize + ghi file chạy ở thread riêng qua write_snapshot.
+    """
+    header = {
+        "taken_at": time.time(),
+        "symbols": list(store.symbols),
+        "bars": {
+            name: {"open_bucket": v.open_bucket, "late_trades": v.late_trades}
+            for name, v in vars(store).items()
+            if isinstance(v, BarAccum)
+        },
+        "arrays": [],
+    }
+    blobs = []
+    offset = 0
+    for path, a in row_arrays(store):
+        if a.ndim == 0 or a.shape[0] != store.n:
+            continue
+        a = np.ascontiguousarray(a).copy()
+        header["arrays"].append([path, a.dtype.str, list(a.shape), offset])
+        blobs.append(a)
+        offset += a.nbytes
+    return header, blobs
+
+
+def write_snapshot(path: str, header: dict, blobs: List[np.ndarray]) -> int:
+    """Ghi ra file tạm rồi os.replace -> crash giữa chừng không hỏng snapshot cũ."""
+    head = json.dumps(header, separators=(",", ":")).encode()
+    tmp = f"{path}.tmp"
+    crc = 0
+    size = 0
+    with open(tmp, "wb") as f:
+        for chunk in (_PREFIX.pack(MAGIC, VERSION, len(head)), head, *(memoryview(b).cast("B") for b in blobs)):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            f.write(chunk)
+        f.write(_CRC.pack(crc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return size + _CRC.size
+
+
+def save(store: SymbolStore, path: str) -> int:
+    header, blobs = capture(store)
+    return write_snapshot(path, header, blobs)
+
+
+def load(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _PREFIX.size + _CRC.size:
+        raise ValueError(f"{path}: snapshot bị cắt")
+    magic, version, hlen = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: không phải snapshot")
+    if version != VERSION:
+        raise ValueError(f"{path}: snapshot version {version} (cần {VERSION})")
+    body = memoryview(data)[:-_CRC.size]
+    if zlib.crc32(body) != _CRC.unpack_from(data, len(data) - _CRC.size)[0]:
+        raise ValueError(f"{path}: crc sai")
+
+    start = _PREFIX.size
+    header = json.loads(bytes(body[start:start + hlen]))
+    base = start + hlen
+    arrays = {}
+    for name, dtype, shape, offset in header["arrays"]:
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(
+            body, dtype=np.dtype(dtype), count=count, offset=base + offset
+        ).reshape(shape)
+    return header, arrays
+
+
+def restore(store: SymbolStore, path: str) -> dict:
+    """Nạp snapshot vào store (map theo symbol). Trả về số liệu restore."""
+    t0 = time.perf_counter()
+    header, arrays = load(path)
+
+    src_ids = {s: k for k, s in enumerate(header["symbols"])}
+    pairs = [(i, src_ids[s]) for i, s in enumerate(store.symbols) if s and s in src_ids]
+    dst = np.array([p[0] for p in pairs], dtype=np.int64)
+    src = np.array([p[1] for p in pairs], dtype=np.int64)
+
+    skipped = []
+    for name, a in arrays.items():
+        obj, leaf = resolve(store, name)
+        cur = get_path(obj, leaf) if obj is not None else None
+        if not isinstance(cur, np.ndarray) or cur.shape[1:] != a.shape[1:] or cur.dtype != a.dtype:
+            skipped.append(name)
+            continue
+        cur[dst] = a[src]
+
+    for name, b in header["bars"].items():
+        bars = getattr(store, name, None)
+        if isinstance(bars, BarAccum):
+            bars.open_bucket = b["open_bucket"]
+            bars.late_trades = b["late_trades"]
+
+    report = {
+        "taken_at": header["taken_at"],
+        "age_s": round(time.time() - header["taken_at"], 1),
+        "symbols": len(dst),
+        "new_symbols": [s for s in store.symbols if s and s not in src_ids],
+        "skipped": skipped,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+    print(
+        f"[snapshot] restored {path} | symbols={report['symbols']} "
+        f"new={len(report['new_symbols'])} age={report['age_s']}s in {report['elapsed_ms']}ms"
+        + (f" | skipped={skipped}" if skipped else "")
+    )
+    return report
+
+
+# ============================================================
+# PERIODIC SNAPSHOT (copy trên loop, ghi file trong executor)
+# ============================================================
+async def run_snapshots(store: SymbolStore, path: str, every: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(every)
+        try:
+            header, blobs = capture(store)
+            t0 = time.perf_counter()
+            size = await loop.run_in_executor(None, write_snapshot, path, header, blobs)
+            print(f"[snapshot] {path} {size} bytes in {(time.perf_counter() - t0) * 1000:.1f}ms")
+        except Exception as e:
+            print("snapshot error:", e)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Inspect a state snapshot")
+    ap.add_argument("path")
+    args = ap.parse_args()
+    h, arrs = load(args.path)
+    print(f"taken_at={h['taken_at']} symbols={len(h['symbols'])} bars={h['bars']}")
+    for k, v in arrs.items():
+        print(f"  {k:<28} {v.dtype} {v.shape}")
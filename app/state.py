@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .book import TopOfBook
+from .graph import IndicatorGraph
+from .resample import Candle
+from .strategy import Profile, Strategy, load_profiles
+
+
+# ============================================================
+# BAR ACCUMULATOR (OHLCV columnar của 1 timeframe)
+# ------------------------------------------------------------
+# Level thấp nhất nhận trade theo event time của Binance:
+# bar đang mở = bucket `open_bucket`, trade thuộc bucket kế tiếp
+# (tới trước khi scheduler kịp đóng bar) vào buffer `next_*`,
+# trade trễ (bucket đã đóng) gộp vào bar đang mở và được đếm.
+# Level cao hơn chỉ nhận bar đã đóng qua merge().
+# close không reset khi sang bar mới: bar không có trade có
+# O=H=L=C = close cũ, volume = 0 (điền lúc seal()).
+# ============================================================
+class BarAccum:
+    def __init__(self, n: int, tf_sec: int):
+        self.tf_sec = tf_sec
+        self.open_bucket: Optional[int] = None
+
+        self.open = np.full(n, np.nan)
+        self.high = np.full(n, np.nan)
+        self.low = np.full(n, np.nan)
+        self.close = np.full(n, np.nan)
+        self.vol = np.zeros(n)
+
+        self.next_open = np.full(n, np.nan)
+        self.next_high = np.full(n, np.nan)
+        self.next_low = np.full(n, np.nan)
+        self.next_close = np.full(n, np.nan)
+        self.next_vol = np.zeros(n)
+
+        self.late_trades = 0
+
+    def add(self, i: int, t_sec: int, price: float, qty: float) -> None:
+        b = t_sec // self.tf_sec
+        if self.open_bucket is None:
+            self.open_bucket = b
+
+        if b > self.open_bucket:
+            o, h, l, c, v = self.next_open, self.next_high, self.next_low, self.next_close, self.next_vol
+        else:
+            if b < self.open_bucket:
+                self.late_trades += 1
+            o, h, l, c, v = self.open, self.high, self.low, self.close, self.vol
+
+        if o[i] != o[i]:
+            o[i] = h[i] = l[i] = price
+        elif price > h[i]:
+            h[i] = price
+        elif price < l[i]:
+            l[i] = price
+        c[i] = price
+        v[i] += qty
+
+    def add_many(self, idx: np.ndarray, t_sec: np.ndarray, price: np.ndarray, qty: np.ndarray) -> None:
+        """
+        add() cho cả batch (cùng kết quả như gọi add() lần lượt theo thứ tự).
+        Caller đảm bảo mọi trade thuộc bucket <= open_bucket + 1.
+        """
+        b = t_sec // self.tf_sec
+        if self.open_bucket is None:
+            self.open_bucket = int(b[0])
+        nxt = b > self.open_bucket
+        self.late_trades += int((b < self.open_bucket).sum())
+
+        for sel, (o, h, l, c, v) in (
+            (~nxt, (self.open, self.high, self.low, self.close, self.vol)),
+            (nxt, (self.next_open, self.next_high, self.next_low, self.next_close, self.next_vol)),
+        ):
+            if not sel.any():
+                continue
+            i, p = idx[sel], price[sel]
+            u, first = np.unique(i, return_index=True)
+            _, last = np.unique(i[::-1], return_index=True)
+            ou = o[u]
+            o[u] = np.where(np.isnan(ou), p[first], ou)
+            np.fmax.at(h, i, p)
+            np.fmin.at(l, i, p)
+            c[u] = p[len(i) - 1 - last]
+            np.add.at(v, i, qty[sel])
+
+    def insert(
+        self, i: int, bucket: int, prices: Sequence[float], qtys: Sequence[float],
+        *, keep_open: bool, keep_close: bool,
+    ) -> bool:
+        """
+        Chèn trade đến muộn (backfill, theo thứ tự thời gian, cùng bucket)
+        vào bar đang mở / bar kế tiếp của symbol i. keep_open / keep_close:
+        bar đã có trade trước / sau đoạn chèn thì giữ open / close hiện tại.
+        Bucket đã đóng -> False (không sửa được nữa).
+        """
+        if self.open_bucket is None or not self.open_bucket <= bucket <= self.open_bucket + 1:
+            return False
+        if bucket > self.open_bucket:
+            o, h, l, c, v = self.next_open, self.next_high, self.next_low, self.next_close, self.next_vol
+        else:
+            o, h, l, c, v = self.open, self.high, self.low, self.close, self.vol
+        hi, lo = max(prices), min(prices)
+        if o[i] != o[i]:
+            o[i], h[i], l[i] = prices[0], hi, lo
+        else:
+            if not keep_open:
+                o[i] = prices[0]
+            h[i] = max(h[i], hi)
+            l[i] = min(l[i], lo)
+        if not keep_close or c[i] != c[i]:
+            c[i] = prices[-1]
+        v[i] += sum(qtys)
+        return True
+
+    def put(self, i: int, bucket: int, o: float, h: float, l: float, c: float, v: float) -> bool:
+        """
+        Ghi đè bar của symbol i bằng OHLCV đầy đủ của bucket (kline đã
+        đóng) vào bar đang mở / bar kế tiếp. Bucket khác -> False.
+        """
+        if self.open_bucket is None:
+            self.open_bucket = bucket
+        if bucket == self.open_bucket:
+            arrs = self.open, self.high, self.low, self.close, self.vol
+        elif bucket == self.open_bucket + 1:
+            arrs = self.next_open, self.next_high, self.next_low, self.next_close, self.next_vol
+        else:
+            return False
+        for a, x in zip(arrs, (o, h, l, c, v)):
+            a[i] = x
+        return True
+
+    def merge(self, idx: np.ndarray, src: "BarAccum") -> None:
+        """Gộp bar đã đóng (đã seal) của timeframe nhỏ hơn, các hàng idx."""
+        o = self.open[idx]
+        self.open[idx] = np.where(np.isnan(o), src.open[idx], o)
+        self.high[idx] = np.fmax(self.high[idx], src.high[idx])
+        self.low[idx] = np.fmin(self.low[idx], src.low[idx])
+        self.close[idx] = src.close[idx]
+        self.vol[idx] += src.vol[idx]
+
+    def seal(self) -> np.ndarray:
+        """Chốt bar đang mở, trả về id các symbol có bar (đã có close)."""
+        idx = np.flatnonzero(~np.isnan(self.close))
+        c = self.close[idx]
+        for a in (self.open, self.high, self.low):
+            v = a[idx]
+            a[idx] = np.where(np.isnan(v), c, v)
+        return idx
+
+    def roll(self) -> None:
+        """Sang bar kế tiếp (gọi sau khi đã dùng bar cũ)."""
+        has_next = ~np.isnan(self.next_close)
+        self.close[has_next] = self.next_close[has_next]
+        self.open[:] = self.next_open
+        self.high[:] = self.next_high
+        self.low[:] = self.next_low
+        self.vol[:] = self.next_vol
+        for a in (self.next_open, self.next_high, self.next_low, self.next_close):
+            a[:] = np.nan
+        self.next_vol[:] = 0.0
+        if self.open_bucket is not None:
+            self.open_bucket += 1
+
+    def reset(self) -> None:
+        """Bỏ bar đang mở (vd sau gap fill: bar cũ đã có từ klines)."""
+        self.open_bucket = None
+        for a in (self.open, self.high, self.low, self.close,
+                  self.next_open, self.next_high, self.next_low, self.next_close):
+            a[:] = np.nan
+        self.vol[:] = 0.0
+        self.next_vol[:] = 0.0
+
+    def candle(self, i: int) -> Optional[Candle]:
+        """Bar đang mở của symbol i (high/low chưa seal có thể NaN)."""
+        if self.open_bucket is None or self.close[i] != self.close[i]:
+            return None
+        start = self.open_bucket * self.tf_sec
+        c = float(self.close[i])
+        o, h, l = (c if x != x else float(x) for x in (self.open[i], self.high[i], self.low[i]))
+        return Candle(start, start + self.tf_sec - 1, o, h, l, c, float(self.vol[i]))
+
+
+# ============================================================
+# CASCADE 5m -> 15m -> 1h -> 4h
+# ------------------------------------------------------------
+# Chỉ level 0 nhận trade (O(1)/tick dù bao nhiêu timeframe);
+# level k chỉ nhận bar đã đóng của level k-1 lúc đóng bar.
+# subscribe(tf, fn): fn(boundary, idx, bars) được gọi khi bar
+# timeframe đó đóng (indicator, DB sink, ...).
+# ============================================================
+BarSub = Callable[[int, np.ndarray, BarAccum], None]
+
+
+class BarCascade:
+    def __init__(self, n: int, tfs: Sequence[int] = (300, 900, 3600, 14400)):
+        self.levels = [BarAccum(n, tf) for tf in tfs]
+        self.subs: Dict[int, List[BarSub]] = {tf: [] for tf in tfs}
+
+    @property
+    def base(self) -> BarAccum:
+        return self.levels[0]
+
+    def subscribe(self, tf_sec: int, fn: BarSub) -> None:
+        if tf_sec not in self.subs:
+            raise ValueError(f"timeframe {tf_sec}s not in cascade {list(self.subs)}")
+        self.subs[tf_sec].append(fn)
+
+    def _fire(self, boundary: int, idx: np.ndarray, bars: BarAccum) -> None:
+        for fn in self.subs[bars.tf_sec]:
+            fn(boundary, idx, bars)
+
+    def close_base(self, boundary: int) -> np.ndarray:
+        """Đóng bar level 0 tại biên `boundary`, trả về id các symbol vừa đóng."""
+        idx = self.base.seal()
+        if idx.size:
+            self._fire(boundary, idx, self.base)
+        return idx
+
+    def propagate(self, boundary: int, idx: np.ndarray) -> None:
+        """Sau close_base: gộp lên level trên, đóng level nào chạm biên rồi roll."""
+        for lower, upper in zip(self.levels, self.levels[1:]):
+            if idx.size:
+                if upper.open_bucket is None:
+                    upper.open_bucket = (boundary - lower.tf_sec) // upper.tf_sec
+                upper.merge(idx, lower)
+            lower.roll()
+            if boundary % upper.tf_sec:
+                return
+            idx = upper.seal()
+            if idx.size:
+                self._fire(boundary, idx, upper)
+        self.levels[-1].roll()
+
+
+# ============================================================
+# ROW ARRAYS
+# ------------------------------------------------------------
+# Duyệt mọi ndarray trong store (đệ quy qua object / dict key
+# str, bỏ attribute "_..."): path = "graph.nodes.rsi_300_14.bank
+# .avg_gain", "last_alert.trade", "bars_5m.close", ... Dùng cho
+# snapshot và add/remove symbol -> thêm bank / node mới không
+# phải sửa chỗ nào khác. Object dùng chung (EMA node của MACD)
+# chỉ gặp 1 lần, theo path đầu tiên.
+# ============================================================
+def _children(obj) -> dict:
+    if isinstance(obj, dict):
+        return {k: v for k, v in obj.items() if isinstance(k, str)}
+    return {k: v for k, v in vars(obj).items() if not k.startswith("_")}
+
+
+def row_arrays(obj, prefix: str = "", seen=None) -> List[Tuple[str, np.ndarray]]:
+    seen = set() if seen is None else seen
+    out = []
+    for name, v in _children(obj).items():
+        if id(v) in seen:
+            continue
+        path = prefix + name
+        if isinstance(v, np.ndarray):
+            seen.add(id(v))
+            out.append((path, v))
+        elif isinstance(v, dict) or (hasattr(v, "__dict__") and not isinstance(v, type)):
+            seen.add(id(v))
+            out.extend(row_arrays(v, path + ".", seen))
+    return out
+
+
+def get_path(obj, name: str):
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def resolve(obj, path: str):
+    """path -> (object cha, tên lá); (None, lá) nếu không có."""
+    *parents, leaf = path.split(".")
+    for p in parents:
+        obj = get_path(obj, p)
+        if obj is None:
+            return None, leaf
+    return obj, leaf
+
+
+# ============================================================
+# COLUMNAR SYMBOL STORE
+# ------------------------------------------------------------
+# Mỗi symbol được intern thành 1 id (int) = chỉ số hàng.
+# Toàn bộ market data + state indicator nằm trong mảng NumPy
+# cấp phát sẵn, nên bar close update mọi symbol trong 1 lần.
+# Indicator chỉ gồm node mà các strategy khai báo (graph).
+#
+# Universe đổi lúc chạy: remove() trả hàng về giá trị ban đầu
+# (slot trống, symbols[i] = ""), add() dùng lại slot trống,
+# hết slot mới nới mảng (x2) -> n = số hàng >= len(store).
+# ============================================================
+class SymbolStore:
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        profiles: Optional[Sequence[Profile]] = None,
+        capacity: int = 0,
+    ):
+        # bỏ trùng, giữ thứ tự
+        syms = [s for s in dict.fromkeys(symbols) if s]
+        n = self.n = max(len(syms), capacity)
+        self.symbols: List[str] = syms + [""] * (n - len(syms))
+        self.ids: Dict[str, int] = {s: i for i, s in enumerate(syms)}
+
+        # market (bid/ask parse lazy từ book, xem sync_book)
+        self.bid = np.full(n, np.nan)
+        self.ask = np.full(n, np.nan)
+        self.book = TopOfBook()
+
+        # bars (bucket chung cho cả store, theo event time)
+        self.bars = BarCascade(n, (300, 900, 3600, 14400))
+        self.bars_5m, self.bars_15m, self.bars_1h, self.bars_4h = self.bars.levels
+
+        # trade time gần nhất (staleness) + aggTrade id gần nhất (phát hiện gap)
+        self.last_tick_ms = np.zeros(n, dtype=np.int64)
+        self.last_agg_id = np.zeros(n, dtype=np.int64)
+
+        # indicators (node dùng chung giữa các strategy) + alert control
+        self.graph = IndicatorGraph(n, self.bars)
+        self.last_alert: Dict[str, np.ndarray] = {}   # profile -> last_alert_sec
+        self.profiles: List[Profile] = list(load_profiles() if profiles is None else profiles)
+        self.strategies: List[Strategy] = [Strategy(p, self) for p in self.profiles]
+
+        # giá trị ban đầu của 1 hàng theo path (lazy, cho remove / grow)
+        self._blank: Optional[Dict[str, np.ndarray]] = None
+
+    def alert_clock(self, name: str) -> np.ndarray:
+        """Mảng cooldown (giây alert gần nhất) của 1 profile."""
+        if name not in self.last_alert:
+            self.last_alert[name] = np.zeros(self.n, dtype=np.int64)
+        return self.last_alert[name]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, sym: str) -> bool:
+        return sym in self.ids
+
+    @property
+    def active(self) -> np.ndarray:
+        """Mask các hàng đang có symbol."""
+        m = np.zeros(self.n, dtype=bool)
+        m[list(self.ids.values())] = True
+        return m
+
+    # --------------------------------------------------------
+    # universe (add / remove symbol lúc chạy)
+    # --------------------------------------------------------
+    def _rows(self) -> List[Tuple[str, np.ndarray]]:
+        return [(p, a) for p, a in row_arrays(self) if a.ndim and a.shape[0] == self.n]
+
+    def _blank_rows(self) -> Dict[str, np.ndarray]:
+        if self._blank is None:
+            tmpl = SymbolStore([], self.profiles, capacity=1)
+            self._blank = {p: a[0].copy() for p, a in tmpl._rows()}
+        return self._blank
+
+    def _reset(self, idx: Sequence[int]) -> None:
+        blank = self._blank_rows()
+        for path, a in self._rows():
+            a[idx] = blank[path]
+
+    def _grow(self, n: int) -> None:
+        blank = self._blank_rows()
+        for path, a in self._rows():
+            new = np.empty((n, *a.shape[1:]), dtype=a.dtype)
+            new[:self.n] = a
+            new[self.n:] = blank[path]
+            obj, leaf = resolve(self, path)
+            if isinstance(obj, dict):
+                obj[leaf] = new
+            else:
+                setattr(obj, leaf, new)
+        self.symbols += [""] * (n - self.n)
+        self.n = self.graph.n = n
+
+    def add(self, symbols: Iterable[str]) -> List[int]:
+        """Thêm symbol (đã có thì bỏ qua), trả về id của symbol mới."""
+        new = [s for s in dict.fromkeys(symbols) if s and s not in self.ids]
+        free = [i for i, s in enumerate(self.symbols) if not s]
+        if len(new) > len(free):
+            self._grow(max(self.n * 2, len(self) + len(new)))
+            free = [i for i, s in enumerate(self.symbols) if not s]
+        out = []
+        for s, i in zip(new, free):
+            self.symbols[i] = s
+            self.ids[s] = i
+            out.append(i)
+        return out
+
+    def remove(self, symbols: Iterable[str]) -> List[int]:
+        """Bỏ symbol: mọi mảng của hàng đó về giá trị ban đầu, slot được dùng lại."""
+        gone = [s for s in dict.fromkeys(symbols) if s in self.ids]
+        idx = [self.ids.pop(s) for s in gone]
+        for i in idx:
+            self.symbols[i] = ""
+        self.book.discard(gone)
+        if idx:
+            self._reset(idx)
+        return idx
+
+    # --------------------------------------------------------
+    # market
+    # --------------------------------------------------------
+    def sync_book(self, i: Optional[int] = None) -> None:
+        """Parse frame bookTicker đang chờ (của hàng i, None = mọi symbol) vào bid/ask."""
+        if self.book.pending:
+            self.book.flush(self.ids, self.bid, self.ask, None if i is None else (self.symbols[i],))
+
+    def mid(self, i: int) -> Optional[float]:
+        self.sync_book(i)
+        b = self.bid[i]
+        a = self.ask[i]
+        if b != b or a != a:
+            return None
+        return (b + a) / 2
+
+    def spread(self, i: int) -> float:
+        m = self.mid(i)
+        if not m:
+            return 0.0
+        return (self.ask[i] - self.bid[i]) / m
+
+    def spreads(self, idx: np.ndarray) -> np.ndarray:
+        """spread() cho cả mảng id."""
+        self.sync_book()
+        b = self.bid[idx]
+        a = self.ask[idx]
+        m = (b + a) / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = (a - b) / m
+        return np.where(np.isnan(m) | (m == 0), 0.0, s)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .alert_engine import AlertPredicate, compile_predicate, ctx_specs
+from .config import CFG, Config, PROFILES, profile_config
+
+# sink(now, side, symbol, price), cùng kiểu với pipeline.AlertSink
+AlertSink = Callable[[int, str, str, float], None]
+
+
+def opt(x: float) -> Optional[float]:
+    """NaN -> None (ctx của alert_engine dùng None cho 'chưa sẵn sàng')."""
+    return None if x != x else float(x)
+
+
+# ============================================================
+# PROFILES
+# ------------------------------------------------------------
+# PROFILES="trend:signal,scalp:rsi" -> 2 strategy chạy chung 1
+# store / 1 indicator graph, mỗi cái có config (env override
+# <NAME>_<FIELD>), cooldown và chat Telegram riêng.
+# PROFILES rỗng -> 1 profile ALERT_PROFILE/ALERT_MODE như cũ.
+# ============================================================
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    mode: str
+    cfg: Config
+
+    @property
+    def chat_id(self) -> str:
+        return self.cfg.TELEGRAM_CHAT_ID
+
+
+def load_profiles(spec: str = PROFILES, base: Config = CFG) -> List[Profile]:
+    if not spec.strip():
+        return [Profile(base.ALERT_PROFILE, base.ALERT_MODE, base)]
+    out: Dict[str, Profile] = {}
+    for item in spec.split(","):
+        name, _, mode = item.strip().partition(":")
+        if not name:
+            continue
+        if name in out:
+            raise ValueError(f"duplicate profile: {name}")
+        cfg = profile_config(name, base)
+        out[name] = Profile(name, mode.strip() or cfg.ALERT_MODE, cfg)
+    return list(out.values())
+
+
+# ============================================================
+# STRATEGY
+# ------------------------------------------------------------
+# Predicate compile từ config của profile; chỉ require vào graph
+# các node mà rule của nó đọc (predicate.needs), node trùng với
+# strategy khác dùng chung. Cooldown = mảng trong store
+# (store.alert_clock) để snapshot giữ lại qua restart.
+# ============================================================
+class Strategy:
+    def __init__(self, profile: Profile, store, sink: Optional[AlertSink] = None):
+        self.profile = profile
+        self.name = profile.name
+        self.sink = sink
+        self.predicate: AlertPredicate = compile_predicate(profile.cfg, profile.mode)
+
+        specs = ctx_specs(profile.cfg)
+        self.specs = {k: specs[k] for k in self.predicate.needs}
+        self.nodes = {k: store.graph.require(s) for k, s in self.specs.items()}
+        store.alert_clock(self.name)
+        self._clocks = store.last_alert     # mảng có thể bị thay khi store nới capacity
+
+    @property
+    def last_alert_sec(self) -> np.ndarray:
+        return self._clocks[self.name]
+
+    def ctx_arrays(self, idx: np.ndarray) -> Dict[str, np.ndarray]:
+        """ctx dạng cột cho các hàng idx (NaN = chưa sẵn sàng)."""
+        return {k: node.value[idx] for k, node in self.nodes.items()}
+
+    def ctx(self, i: int) -> dict:
+        return {k: opt(node.value[i]) for k, node in self.nodes.items()}
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+
+from .utils import backoff_s
+
+# handler(raw_frames) -> event/trade time ms của frame cuối có time (None nếu không có)
+FrameHandler = Callable[[List[object]], Optional[int]]
+
+# trần số frame / batch để 1 shard không giữ event loop quá lâu
+MAX_BATCH = 1024
+
+
+_NO_BUFFER_WARNED = False
+
+# receive() tự xử lý PING / PONG rồi chờ frame kế tiếp -> không tính
+_INTERNAL = (aiohttp.WSMsgType.PING, aiohttp.WSMsgType.PONG)
+
+
+def _ready(ws) -> bool:
+    """
+    Còn frame aiohttp đã đọc sẵn mà receive() trả về ngay (không chờ
+    socket)? aiohttp không có API public cho việc này: đọc queue của
+    reader (`_reader._buffer`, phần tử (msg, size), có ở DataQueue bản
+    cũ lẫn WebSocketDataQueue >= 3.10). PING / PONG không tính: chỉ
+    còn chúng trong buffer thì receive() sẽ chờ frame dữ liệu kế tiếp,
+    batch đã gom phải đi luôn. Không đọc được buffer -> False: vẫn nhận đủ
+    frame, chỉ mất gom batch (1 frame / lần gọi handler), cảnh báo 1 lần.
+    """
+    global _NO_BUFFER_WARNED
+    try:
+        buf = ws._reader._buffer
+        return any(getattr(item[0], "type", None) not in _INTERNAL for item in buf)
+    except (AttributeError, TypeError, IndexError):
+        if not _NO_BUFFER_WARNED:
+            _NO_BUFFER_WARNED = True
+            print(f"[ws] aiohttp {aiohttp.__version__}: reader buffer not readable -> no frame batching")
+        return False
+
+
+_CLOSING = (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED)
+
+
+def shard_symbols(symbols: Sequence[str], n_shards: int) -> List[List[str]]:
+    """Chia round-robin để các shard có số symbol (và tải) gần bằng nhau."""
+    n_shards = max(1, min(n_shards, len(symbols) or 1))
+    return [list(symbols[k::n_shards]) for k in range(n_shards)]
+
+
+# ============================================================
+# 1 SHARD = 1 WS CONNECTION
+# ------------------------------------------------------------
+# subscribe() / unsubscribe(): đổi stream trên connection đang
+# mở bằng message SUBSCRIBE / UNSUBSCRIBE của Binance (không
+# reconnect); đang mất kết nối thì chỉ sửa danh sách, URL lần
+# connect sau đã có đủ. Frame trả lời ({"result"/"error", "id"})
+# không đi vào handler.
+# ============================================================
+class StreamShard:
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        symbols: Sequence[str],
+        stream: str,
+        handler: FrameHandler,
+        *,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.symbols = list(symbols)
+        self.stream = stream
+        self.handler = handler
+        self.clock = clock
+
+        # stats
+        self.msgs = 0
+        self.reconnects = 0
+        self.lag_ms: Optional[float] = None   # EWMA (local - exchange time)
+        self.batches = 0
+        self.max_batch = 0
+        self.connected = False
+        self.control_sent = 0
+        self.control_errors = 0
+        self._rate_msgs = 0
+        self._rate_t = time.monotonic()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._req_id = 0
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}?streams=" + "/".join(self._streams(self.symbols))
+
+    def _streams(self, symbols: Sequence[str]) -> List[str]:
+        return [f"{s.lower()}@{self.stream}" for s in symbols]
+
+    async def _control(self, method: str, symbols: Sequence[str]) -> None:
+        ws = self._ws
+        if ws is None or ws.closed or not symbols:
+            return
+        self._req_id += 1
+        await ws.send_str(json.dumps({"method": method, "params": self._streams(symbols), "id": self._req_id}))
+        self.control_sent += 1
+
+    def _on_control(self, data: str) -> None:
+        if '"error"' in data:
+            self.control_errors += 1
+            print(f"{self.name} control error: {data}")
+
+    async def subscribe(self, symbols: Sequence[str]) -> None:
+        new = [s for s in dict.fromkeys(symbols) if s not in self.symbols]
+        self.symbols += new
+        await self._control("SUBSCRIBE", new)
+
+    async def unsubscribe(self, symbols: Sequence[str]) -> None:
+        gone = [s for s in dict.fromkeys(symbols) if s in self.symbols]
+        self.symbols = [s for s in self.symbols if s not in gone]
+        await self._control("UNSUBSCRIBE", gone)
+
+    def rate(self) -> float:
+        """msgs/sec từ lần gọi rate() trước."""
+        now = time.monotonic()
+        dt = now - self._rate_t
+        r = (self.msgs - self._rate_msgs) / dt if dt > 0 else 0.0
+        self._rate_msgs, self._rate_t = self.msgs, now
+        return r
+
+    async def run(self) -> None:
+        attempt = 0
+        while True:
+            if not self.symbols:
+                # shard trống (universe đã chuyển hết symbol đi) -> chờ subscribe
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                async with aiohttp.ClientSession() as s:
+                    async with s.ws_connect(self.url, heartbeat=30) as ws:
+                        self.connected = True
+                        self._ws = ws
+                        print(f">>> {self.name} connected | symbols={len(self.symbols)}")
+                        async for msg in ws:
+                            # gom mọi frame đã nằm sẵn trong buffer -> 1 batch,
+                            # receive() khi buffer còn dữ liệu trả về ngay (không yield)
+                            batch = [msg.data] if msg.type == aiohttp.WSMsgType.TEXT else []
+                            while len(batch) < MAX_BATCH and _ready(ws):
+                                msg = await ws.receive()
+                                if msg.type == aiohttp.WSMsgType.TEXT:
+                                    batch.append(msg.data)
+                                elif msg.type in _CLOSING:
+                                    break
+                            ctl = [d for d in batch if not d.startswith('{"stream"')]
+                            if ctl:
+                                # trả lời SUBSCRIBE / UNSUBSCRIBE (hiếm) -> tách khỏi batch
+                                for data in ctl:
+                                    self._on_control(data)
+                                batch = [d for d in batch if d.startswith('{"stream"')]
+                            if not batch:
+                                continue
+                            attempt = 0
+                            self.msgs += len(batch)
+                            self.batches += 1
+                            self.max_batch = max(self.max_batch, len(batch))
+                            t_ms = self.handler(batch)
+                            if t_ms:
+                                lag = self.clock() * 1000 - t_ms
+                                self.lag_ms = lag if self.lag_ms is None else self.lag_ms * 0.99 + lag * 0.01
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"{self.name} error:", e)
+            finally:
+                self.connected = False
+                self._ws = None
+
+            self.reconnects += 1
+            await asyncio.sleep(backoff_s(attempt))
+            attempt += 1
+
+
+# ============================================================
+# CONNECTION MANAGER (N shard -> cùng 1 handler / state store)
+# ============================================================
+class ConnectionManager:
+    """subscribe() đưa symbol mới vào shard ít stream nhất còn chỗ, hết chỗ mở shard mới."""
+
+    def __init__(
+        self,
+        base_url: str,
+        symbols: Sequence[str],
+        stream: str,
+        handler: FrameHandler,
+        *,
+        max_streams: int = 200,
+        n_shards: int = 0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if n_shards <= 0:
+            n_shards = -(-len(symbols) // max_streams)  # ceil
+        self.base_url = base_url
+        self.stream = stream
+        self.handler = handler
+        self.max_streams = max_streams
+        self.clock = clock
+        self.shards = [
+            StreamShard(f"{stream}#{k}", base_url, syms, stream, handler, clock=clock)
+            for k, syms in enumerate(shard_symbols(symbols, n_shards))
+        ]
+        self._tasks: List[asyncio.Task] = []
+
+    async def run(self) -> None:
+        self._tasks = [asyncio.ensure_future(sh.run()) for sh in self.shards]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for t in self._tasks:
+                t.cancel()
+
+    async def subscribe(self, symbols: Sequence[str]) -> None:
+        have = {s for sh in self.shards for s in sh.symbols}
+        plan: Dict[StreamShard, List[str]] = {}
+
+        def load(sh: StreamShard) -> int:
+            return len(sh.symbols) + len(plan.get(sh, ()))
+
+        for sym in dict.fromkeys(symbols):
+            if sym in have:
+                continue
+            sh = min(self.shards, key=load, default=None)
+            if sh is None or load(sh) >= self.max_streams:
+                sh = StreamShard(
+                    f"{self.stream}#{len(self.shards)}", self.base_url, [], self.stream,
+                    self.handler, clock=self.clock,
+                )
+                self.shards.append(sh)
+                if self._tasks:
+                    self._tasks.append(asyncio.ensure_future(sh.run()))
+            plan.setdefault(sh, []).append(sym)
+        for sh, syms in plan.items():
+            await sh.subscribe(syms)
+
+    async def unsubscribe(self, symbols: Sequence[str]) -> None:
+        gone = set(symbols)
+        for sh in self.shards:
+            syms = [s for s in sh.symbols if s in gone]
+            if syms:
+                await sh.unsubscribe(syms)
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "shard": sh.name,
+                "symbols": len(sh.symbols),
+                "connected": sh.connected,
+                "msgs": sh.msgs,
+                "avg_batch": round(sh.msgs / sh.batches, 1) if sh.batches else 0.0,
+                "rate": round(sh.rate(), 1),
+                "lag_ms": None if sh.lag_ms is None else round(sh.lag_ms, 1),
+                "reconnects": sh.reconnects,
+            }
+            for sh in self.shards
+        ]
+
+    def report(self) -> str:
+        return " | ".join(
+            f"{s['shard']} {s['rate']}/s lag={s['lag_ms']}ms rc={s['reconnects']}"
+            for s in self.stats()
+        )
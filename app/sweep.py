@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .alert_engine import compile_predicate, ctx_specs
+from .config import CFG, Config
+from .graph import IndicatorGraph, Spec
+from .state import BarCascade
+
+# ============================================================
+# PARAMETER SWEEP (offline, process pool)
+# ------------------------------------------------------------
+# Lưới / mẫu ngẫu nhiên override Config (REGIME_EMA_GAP, dải RSI,
+# ngưỡng MACD, COOLDOWN_SEC, ALERT_MODE, ...) chạy trên bar 5m
+# lịch sử (tick archive hoặc file .npz đã lưu):
+#
+#   1. Gom mọi indicator node mà các config cần (ctx_specs +
+#      predicate.needs, trùng chỉ 1 bản như graph live), tính
+#      series 1 lần bằng batch API, dóng về lưới 5m theo đúng
+#      thứ tự cascade (alert 5m chỉ thấy bar 15m/1h đã đóng
+#      TRƯỚC biên đó).
+#   2. Series + forward return ghi ra .npy tạm, worker mở bằng
+#      mmap -> mọi process dùng chung 1 bản, không tính lại.
+#   3. Mỗi config: predicate.signal() trên cả ma trận
+#      (symbols x bars), cooldown đi tuần tự theo symbol (LONG
+#      chặn SHORT cùng bar như live).
+#
+# Không có bid/ask lịch sử -> bỏ qua filter spread.
+# ============================================================
+TF = 300
+HORIZONS = (3, 12, 48)        # forward return sau 15m / 1h / 4h (số bar 5m)
+WARMUP = 600                  # bỏ 600 bar 5m đầu (EMA50 1h cần ~50h)
+
+
+@dataclass
+class Bars:
+    """Bar 5m (symbols x bars), bar 0 mở tại t0 (giây, biên 1h); close đã forward-fill."""
+
+    symbols: List[str]
+    t0: int
+    close: np.ndarray
+    vol: np.ndarray
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, symbols=np.array(self.symbols), t0=self.t0, close=self.close, vol=self.vol)
+
+    @staticmethod
+    def load(path: str) -> "Bars":
+        z = np.load(path)
+        return Bars([str(s) for s in z["symbols"]], int(z["t0"]), z["close"], z["vol"])
+
+
+def _ffill(a: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN theo hàng (NaN đầu hàng giữ nguyên)."""
+    ok = ~np.isnan(a)
+    pos = np.where(ok, np.arange(a.shape[1]), 0)
+    np.maximum.accumulate(pos, axis=1, out=pos)
+    return np.take_along_axis(a, pos, axis=1)
+
+
+def bars_from_archive(archive, symbols: Sequence[str], t0_ms: int, t1_ms: int) -> Bars:
+    """Dựng bar 5m từ tick archive cho [t0, t1), chỉ bar đã kết thúc trước t1."""
+    t0 = t0_ms // 1000 // 3600 * 3600      # biên 1h -> 15m / 1h / 4h thẳng hàng
+    n, T = len(symbols), max(0, (t1_ms // 1000 - t0) // TF)
+    close = np.full((n, T), np.nan)
+    vol = np.zeros((n, T))
+    for i, sym in enumerate(symbols):
+        ts, price, qty = archive.read(sym, t0 * 1000, (t0 + T * TF) * 1000)
+        if not len(ts):
+            continue
+        b = (ts // 1000 - t0) // TF
+        last = np.flatnonzero(np.r_[b[1:] != b[:-1], True])
+        close[i, b[last]] = price[last]
+        vol[i] = np.bincount(b, weights=qty, minlength=T)
+    return Bars(list(symbols), t0, _ffill(close), vol)
+
+
+def resample(close: np.ndarray, vol: np.ndarray, r: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Gộp r bar 5m -> 1 bar (chỉ nhóm đủ r bar): close cuối, volume cộng."""
+    n, T = close.shape
+    g = T // r
+    return close[:, r - 1:g * r:r], vol[:, :g * r].reshape(n, g, r).sum(axis=2)
+
+
+def _align(series: np.ndarray, r: int, T: int) -> np.ndarray:
+    """
+    Series timeframe r*5m -> lưới 5m: giá trị alert thấy tại bar 5m j.
+    Biên của bar 5m j cũng là biên bar lớn -> bar lớn đó đóng SAU alert
+    (cascade: close_base -> alert -> propagate) -> k = j // r - 1.
+    """
+    if r == 1:
+        return series
+    k = np.arange(T) // r - 1
+    ok = (k >= 0) & (k < series.shape[1])
+    out = np.full((series.shape[0], T), np.nan)
+    out[:, ok] = series[:, k[ok]]
+    return out
+
+
+# ============================================================
+# GRID
+# ============================================================
+_FIELDS = {f.name: f for f in fields(Config)}
+
+
+def _cast(key: str, raw: str):
+    return type(getattr(CFG, key))(raw)
+
+
+def parse_grid(items: Sequence[str]) -> Dict[str, list]:
+    """
+    "KEY=a,b,c" hoặc "KEY=start:stop:step" (gồm cả stop), ép theo kiểu
+    field của Config.
+    """
+    grid: Dict[str, list] = {}
+    for item in items:
+        key, _, spec = item.partition("=")
+        key = key.strip()
+        if key not in _FIELDS:
+            raise ValueError(f"unknown Config field: {key}")
+        if spec.count(":") == 2:
+            a, b, step = (float(x) for x in spec.split(":"))
+            typ = type(getattr(CFG, key))
+            grid[key] = list(dict.fromkeys(typ(v) for v in np.arange(a, b + step / 2, step).round(10).tolist()))
+        else:
+            grid[key] = [_cast(key, v.strip()) for v in spec.split(",") if v.strip()]
+    return grid
+
+
+def grid_configs(grid: Dict[str, list], sample: int = 0, seed: int = 0) -> List[dict]:
+    """Tích Descartes của grid; sample > 0 -> lấy ngẫu nhiên `sample` tổ hợp (không lặp)."""
+    keys = list(grid)
+    sizes = [len(grid[k]) for k in keys]
+    total = int(np.prod(sizes)) if keys else 1
+    if sample and sample < total:
+        picks = random.Random(seed).sample(range(total), sample)
+        combos = [np.unravel_index(p, sizes) for p in sorted(picks)]
+        return [{k: grid[k][int(c)] for k, c in zip(keys, combo)} for combo in combos]
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))]
+
+
+# ============================================================
+# PRECOMPUTE (process chính, 1 lần)
+# ============================================================
+def _needs(cfg: Config) -> Dict[str, Spec]:
+    specs = ctx_specs(cfg)
+    return {k: specs[k] for k in compile_predicate(cfg).needs}
+
+
+def precompute(bars: Bars, cfgs: Sequence[Config], horizons: Sequence[int] = HORIZONS) -> Dict[str, np.ndarray]:
+    """{spec.name: series dóng lưới 5m, "fwd_<h>": forward return h bar}."""
+    n, T = bars.close.shape
+    graph = IndicatorGraph(n, BarCascade(n))
+    for cfg in cfgs:
+        graph.require_all(_needs(cfg).values())
+
+    out: Dict[str, np.ndarray] = {}
+    for tf in graph.tfs:
+        r = tf // TF
+        close, vol = resample(bars.close, bars.vol, r) if r > 1 else (bars.close, bars.vol)
+        for spec, series in graph.seed(tf, close, vol).items():
+            out[spec.name] = _align(series, r, T)
+
+    c = bars.close
+    for h in horizons:
+        fwd = np.full((n, T), np.nan)
+        if h < T:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                fwd[:, :T - h] = c[:, h:] / c[:, :T - h] - 1.0
+        out[f"fwd_{h}"] = fwd
+    return out
+
+
+# ============================================================
+# WORKER
+# ============================================================
+_SHARED: Dict[str, np.ndarray] = {}
+
+
+def _init(root: str, names: Sequence[str]) -> None:
+    for name in names:
+        _SHARED[name] = np.load(os.path.join(root, f"{name}.npy"), mmap_mode="r")
+
+
+def _cooldown(cand: np.ndarray, gap: int) -> np.ndarray:
+    """
+    Mask candidate (symbols x bars) -> mask alert: alert kế tiếp cùng symbol
+    phải cách >= gap bar. Con trỏ "candidate kế tiếp được phép" tính
+    vectorized 1 lần, vòng lặp Python chỉ đi qua các alert.
+    """
+    T = cand.shape[1]
+    p = np.flatnonzero(cand)
+    nxt = np.minimum(
+        np.searchsorted(p, p + gap),                 # hết cooldown
+        np.searchsorted(p, (p // T + 1) * T),        # hoặc candidate đầu của symbol sau
+    ).tolist()
+    keep = []
+    k = 0
+    while k < len(nxt):
+        keep.append(k)
+        k = nxt[k]
+    out = np.zeros(cand.shape, dtype=bool)
+    out.reshape(-1)[p[keep]] = True
+    return out
+
+
+def evaluate(over: dict, base: Config, horizons: Sequence[int], warmup: int) -> dict:
+    cfg = replace(base, **over)
+    pred = compile_predicate(cfg)
+    fwd0 = _SHARED[f"fwd_{horizons[0]}"]
+    shape = fwd0.shape
+    cols = {k: _SHARED[s.name] for k, s in _needs(cfg).items()}
+    long_ok, short_ok = pred.signal(cols, shape)
+    long_ok[:, :warmup] = False
+    short_ok[:, :warmup] = False
+
+    if pred.cooldown > 0:
+        keep = _cooldown(long_ok | short_ok, -(-pred.cooldown // TF))
+        long_ok &= keep
+        short_ok = keep & ~long_ok
+
+    li, lj = np.nonzero(long_ok)
+    si, sj = np.nonzero(short_ok)
+    row = {**over, "alerts": len(li) + len(si), "long": len(li), "short": len(si)}
+    for h in horizons:
+        f = _SHARED[f"fwd_{h}"]
+        ret = np.concatenate([f[li, lj], -f[si, sj]])
+        ret = ret[~np.isnan(ret)]
+        row[f"ret_{h}"] = float(ret.mean()) if ret.size else float("nan")
+        if h == horizons[0]:
+            row[f"hit_{h}"] = float((ret > 0).mean()) if ret.size else float("nan")
+    return row
+
+
+def _run_chunk(chunk: List[dict], base: Config, horizons: Sequence[int], warmup: int) -> List[dict]:
+    return [evaluate(over, base, horizons, warmup) for over in chunk]
+
+
+# ============================================================
+# SWEEP
+# ============================================================
+def sweep(
+    bars: Bars,
+    overrides: Sequence[dict],
+    *,
+    base: Config = CFG,
+    horizons: Sequence[int] = HORIZONS,
+    warmup: int = WARMUP,
+    workers: Optional[int] = None,
+    chunk: int = 16,
+) -> List[dict]:
+    t0 = time.perf_counter()
+    horizons = tuple(horizons)
+    cfgs = [replace(base, **o) for o in overrides]
+    shared = precompute(bars, cfgs, horizons)
+    t_pre = time.perf_counter() - t0
+    print(
+        f"[sweep] symbols={len(bars.symbols)} bars={bars.close.shape[1]} configs={len(cfgs)} "
+        f"| {len(shared) - len(horizons)} indicator series in {t_pre:.1f}s"
+    )
+
+    chunks = [list(overrides[k:k + chunk]) for k in range(0, len(overrides), chunk)]
+    rows: List[dict] = []
+    with tempfile.TemporaryDirectory(prefix="sweep-") as root:
+        for name, a in shared.items():
+            np.save(os.path.join(root, f"{name}.npy"), a)
+        del shared
+        names = [f[:-4] for f in os.listdir(root)]
+
+        if workers == 1:
+            _init(root, names)
+            for c in chunks:
+                rows += _run_chunk(c, base, horizons, warmup)
+            _SHARED.clear()
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init, initargs=(root, names)) as pool:
+                futs = [pool.submit(_run_chunk, c, base, horizons, warmup) for c in chunks]
+                every = max(1, len(futs) // 10)
+                for k, fut in enumerate(as_completed(futs), 1):
+                    rows += fut.result()
+                    if k % every == 0:
+                        print(f"[sweep] {len(rows)}/{len(overrides)} configs")
+
+    elapsed = time.perf_counter() - t0
+    print(f"[sweep] {len(rows)} configs in {elapsed:.1f}s ({len(rows) / max(elapsed - t_pre, 1e-9):.0f}/s)")
+    return rows
+
+
+def rank(rows: List[dict], key: str, min_alerts: int = 1) -> List[dict]:
+    """Giảm dần theo `key`; config ít hơn min_alerts alert (hoặc key NaN) xếp cuối."""
+    def score(r):
+        v = r.get(key, float("nan"))
+        ok = r["alerts"] >= min_alerts and v == v
+        return (0, -v) if ok else (1, 0.0)
+
+    return sorted(rows, key=score)
+
+
+def print_table(rows: List[dict], keys: Sequence[str], top: int = 20) -> None:
+    metrics = [k for k in rows[0] if k not in keys] if rows else []
+    head = ["#", *keys, *metrics]
+    body = []
+    for n, r in enumerate(rows[:top], 1):
+        cells = [str(n)]
+        for k in keys:
+            cells.append(str(r[k]))
+        for k in metrics:
+            v = r[k]
+            if k.startswith("ret_") and v == v:
+                cells.append(f"{v * 100:+.3f}%")
+            elif k.startswith("hit_") and v == v:
+                cells.append(f"{v * 100:.1f}%")
+            else:
+                cells.append(str(v))
+        body.append(cells)
+    widths = [max(len(x) for x in col) for col in zip(head, *body)]
+    for cells in (head, *body):
+        print("  ".join(c.rjust(w) for c, w in zip(cells, widths)))
+
+
+def write_csv(path: str, rows: List[dict]) -> None:
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def _ms(date: str) -> int:
+    return int(datetime.fromisoformat(date).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+if __name__ == "__main__":
+    # python -m app.sweep --archive archive/ --days 30 \
+    #     --grid REGIME_EMA_GAP=0.001:0.005:0.001 --grid RSI_LONG_MIN=40,45,50 --sample 2000
+    ap = argparse.ArgumentParser(description="Sweep Config overrides over historical 5m bars")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--archive", help="tick archive root (app.tick_archive)")
+    src.add_argument("--bars", help="bars .npz saved by --save")
+    ap.add_argument("--symbols", default="", help="comma list (default: every symbol in the archive)")
+    ap.add_argument("--end", default="", help="UTC date/time, default: last archived tick")
+    ap.add_argument("--days", type=float, default=30.0)
+    ap.add_argument("--save", default="", help="write the bars to .npz for later runs")
+    ap.add_argument("--grid", action="append", default=[], help="KEY=a,b,c or KEY=start:stop:step")
+    ap.add_argument("--sample", type=int, default=0, help="random sample of N grid points")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--horizons", default=",".join(map(str, HORIZONS)), help="forward return horizons (5m bars)")
+    ap.add_argument("--warmup", type=int, default=WARMUP, help="leading 5m bars without alerts")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--sort", default="", help="ranking column (default ret_<first horizon>)")
+    ap.add_argument("--min-alerts", type=int, default=20)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", default="sweep.csv")
+    args = ap.parse_args()
+
+    if args.bars:
+        data = Bars.load(args.bars)
+    else:
+        from .tick_archive import TickArchive
+
+        arc = TickArchive(args.archive)
+        syms = [s for s in args.symbols.split(",") if s] or arc.symbols()
+        end = _ms(args.end) if args.end else max(
+            (int(ix["t_last"][-1]) + 1 for ix in map(arc.index, syms) if len(ix)), default=0
+        )
+        data = bars_from_archive(arc, syms, end - int(args.days * 86400_000), end)
+        arc.close()
+    if args.save:
+        data.save(args.save)
+        print(f"[sweep] bars saved to {args.save}")
+
+    grid = parse_grid(args.grid)
+    horizons = [int(h) for h in args.horizons.split(",") if h]
+    result = sweep(
+        data, grid_configs(grid, args.sample, args.seed),
+        horizons=horizons, warmup=args.warmup, workers=args.workers,
+    )
+    result = rank(result, args.sort or f"ret_{horizons[0]}", args.min_alerts)
+    print_table(result, list(grid), args.top)
+    if args.out and result:
+        write_csv(args.out, result)
+        print(f"[sweep] {len(result)} rows -> {args.out}")
@@ -1,6 +1,7 @@
-import aiohttp
 from typing import List
 
+from .binance_client import rest_client
+
 # fallback danh sách USDT thanh khoản cao (futures)
 FALLBACK_SYMBOLS = [
     # ==================================================
@@ -43,8 +44,6 @@ FALLBACK_SYMBOLS = [
     # EXTREME (chỉ bật khi muốn stress test)
     # ==================================================
     "SHIBUSDT",
-    "FLOKIUSDT",
-    "BONKUSDT",
 
      # ==================================================
     # SUNG BO SUNG
@@ -57,39 +56,27 @@ FALLBACK_SYMBOLS = [
 ]
 
 
-async def get_top_usdt_symbols(rest_base: str, top_n: int) -> List[str]:
-    url = f"{rest_base}/fapi/v1/ticker/24hr"
+def fallback_symbols(top_n: int) -> List[str]:
+    return list(dict.fromkeys(FALLBACK_SYMBOLS))[:top_n]
 
-    try:
-        async with aiohttp.ClientSession() as s:
-            async with s.get(url, timeout=15) as r:
-                # Binance block / legal block
-                if r.status != 200:
-                    raise RuntimeError(f"Binance REST error {r.status}")
-                data = await r.json()
-
-        rows = []
-        for it in data:
-            sym = it.get("symbol", "")
-            if not sym.endswith("USDT"):
-                continue
-            try:
-                qv = float(it.get("quoteVolume", 0.0))
-            except Exception:
-                qv = 0.0
-            rows.append((qv, sym))
-
-        rows.sort(reverse=True, key=lambda x: x[0])
-        symbols = [sym for _, sym in rows[:top_n]]
-
-        if not symbols:
-            raise RuntimeError("Empty symbol list from Binance")
 
+async def fetch_top_usdt_symbols(rest_base: str, top_n: int) -> List[str]:
+    """Top USDT theo quoteVolume 24h. Lỗi REST (block / 429 / 418) -> raise (caller tự chọn fallback)."""
+    symbols = await rest_client(rest_base).top_symbols_by_quote_volume(top_n)
+
+    if not symbols:
+        raise RuntimeError("Empty symbol list from Binance")
+    return symbols
+
+
+async def get_top_usdt_symbols(rest_base: str, top_n: int) -> List[str]:
+    try:
+        symbols = await fetch_top_usdt_symbols(rest_base, top_n)
         print(f"[symbols] Loaded {len(symbols)} symbols from Binance REST")
         return symbols
 
     except Exception as e:
         # FALLBACK MODE
-        fallback = FALLBACK_SYMBOLS[:FALLBACK_SYMBOLS]
+        fallback = fallback_symbols(top_n)
         print(f"[symbols] REST failed ({e}), fallback to {len(fallback)} hardcoded symbols")
         return fallback
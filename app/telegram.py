@@ -3,8 +3,10 @@ from __future__ import annotations
 import asyncio
 import aiohttp
 import logging
+import time
 
 from .config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, DEBUG_ENABLED
+from .metrics import ALERT_SEND
 
 # Giảm log spam từ aiohttp
 logging.getLogger("aiohttp.client").setLevel(logging.WARNING)
@@ -75,6 +77,259 @@ async def send_telegram(
                 return
 
 
+# ============================================================
+# Token bucket (rate limit)
+# ============================================================
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.t = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.rate)
+        self.t = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """retry_after: không cấp token trong `seconds` giây."""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+# ============================================================
+# Delivery worker (1 session, queue có giới hạn, digest)
+# ------------------------------------------------------------
+# - enqueue() không block, queue đầy -> drop + đếm
+# - alert cùng `key` (vd biên bar) cùng chat đang chờ trong queue
+#   được gộp thành 1 digest (tối đa 4096 ký tự / message)
+# - token bucket: global + từng chat
+# - HTTP 429 -> chờ đúng parameters.retry_after rồi gửi lại
+# ============================================================
+TELEGRAM_MAX_LEN = 4096
+
+
+class TelegramDelivery:
+    def __init__(
+        self,
+        bot_token: str | None,
+        chat_id: str | int | None,
+        *,
+        maxsize: int = 1000,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        timeout: int = 10,
+        retries: int = 3,
+        api: str = TELEGRAM_API,
+    ):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.url = f"{api}/bot{bot_token}/sendMessage"
+        self.timeout = timeout
+        self.retries = retries
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets: dict = {}
+
+        self._session: aiohttp.ClientSession | None = None
+        self._task: asyncio.Task | None = None
+        self._carry: tuple | None = None
+        self._inflight = 0   # số alert của batch đang gửi
+
+        # metrics
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.latency_avg: float | None = None   # enqueue -> gửi xong (giây, EWMA)
+        self.latency_max = 0.0
+
+    # --------------------------------------------------------
+    # lifecycle
+    # --------------------------------------------------------
+    async def start(self) -> None:
+        if self._task is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._task = asyncio.create_task(self._worker())
+
+    def pending(self) -> int:
+        """Alert chưa gửi xong (queue + item giữ lại + batch đang gửi)."""
+        return self.queue.qsize() + (self._carry is not None) + self._inflight
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Gửi nốt queue (tối đa `timeout` giây) rồi dừng; phần còn lại tính vào dropped."""
+        if self._task is not None:
+            deadline = time.monotonic() + timeout
+            while self.pending() and not self._task.done() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            left = self.pending()
+            if left:
+                self.dropped += left
+                print(f"[telegram] stop: {left} alerts not sent (timeout {timeout:g}s)")
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self._carry = None
+            self._inflight = 0
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "latency_avg_s": None if self.latency_avg is None else round(self.latency_avg, 3),
+            "latency_max_s": round(self.latency_max, 3),
+        }
+
+    # --------------------------------------------------------
+    # producer
+    # --------------------------------------------------------
+    def enqueue(self, text: str, *, key=None, chat_id: str | int | None = None) -> bool:
+        chat = chat_id or self.chat_id
+        if not self.bot_token or not chat:
+            if DEBUG_ENABLED:
+                print("⚠️ Telegram not configured (token/chat_id missing)")
+            return False
+        try:
+            self.queue.put_nowait((chat, key, text, time.monotonic()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    # --------------------------------------------------------
+    # worker
+    # --------------------------------------------------------
+    def _next_batch(self, first: tuple) -> tuple:
+        """Gộp các item đang chờ cùng chat + key (không await)."""
+        chat, key, text, t0 = first
+        texts = [text]
+        if key is not None:
+            while not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item[0] == chat and item[1] == key:
+                    texts.append(item[2])
+                    continue
+                self._carry = item
+                break
+        self.coalesced += len(texts) - 1
+        return chat, texts, t0
+
+    def _chat_bucket(self, chat) -> TokenBucket:
+        b = self.chat_buckets.get(chat)
+        if b is None:
+            b = self.chat_buckets[chat] = TokenBucket(self.chat_rate, self.chat_burst)
+        return b
+
+    async def _worker(self) -> None:
+        while True:
+            item, self._carry = self._carry, None
+            if item is None:
+                item = await self.queue.get()
+            chat, texts, t0 = self._next_batch(item)
+
+            self._inflight = len(texts)
+            for msg in _digest(texts):
+                t_send = time.perf_counter()
+                await self._send(chat, msg)
+                ALERT_SEND.observe(time.perf_counter() - t_send)
+            self._inflight = 0
+
+            lat = time.monotonic() - t0
+            self.latency_avg = lat if self.latency_avg is None else self.latency_avg * 0.9 + lat * 0.1
+            self.latency_max = max(self.latency_max, lat)
+
+    async def _send(self, chat, text: str) -> None:
+        chat_bucket = self._chat_bucket(chat)
+        payload = {"chat_id": chat, "text": text, "disable_web_page_preview": True}
+
+        for attempt in range(self.retries + 1):
+            # chờ token (global + chat)
+            while True:
+                w = max(self.global_bucket.wait_time(), chat_bucket.wait_time())
+                if w <= 0:
+                    break
+                await asyncio.sleep(w)
+            self.global_bucket.take()
+            chat_bucket.take()
+
+            try:
+                async with self._session.post(self.url, json=payload) as resp:
+                    if resp.status == 200:
+                        self.sent += 1
+                        if DEBUG_ENABLED:
+                            print("📨 Telegram sent:", text[:80])
+                        return
+                    body = await resp.json(content_type=None)
+                    if resp.status == 429:
+                        self.rate_limited += 1
+                        retry_after = float(
+                            (body.get("parameters") or {}).get("retry_after", 1)
+                        )
+                        chat_bucket.block(retry_after)
+                        if DEBUG_ENABLED:
+                            print(f"⏳ Telegram 429, retry_after={retry_after}s")
+                        continue
+                    if DEBUG_ENABLED:
+                        print(f"❌ Telegram HTTP {resp.status}: {str(body)[:120]}")
+                    if resp.status < 500:
+                        break  # lỗi request, retry vô ích
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if DEBUG_ENABLED:
+                    print(f"❌ Telegram error (attempt {attempt}):", e)
+                await asyncio.sleep(1.5 * (attempt + 1))
+
+        self.failed += 1
+
+
+def _digest(texts: list) -> list:
+    """1 text -> giữ nguyên; nhiều text -> digest, chia theo giới hạn 4096."""
+    if len(texts) == 1:
+        return [texts[0][:TELEGRAM_MAX_LEN]]
+    header = f"📦 {len(texts)} alerts"
+    out, cur = [], header
+    for t in texts:
+        if len(cur) + 2 + len(t) > TELEGRAM_MAX_LEN:
+            out.append(cur)
+            cur = t[:TELEGRAM_MAX_LEN]
+        else:
+            cur = f"{cur}\n\n{t}"
+    out.append(cur)
+    return out
+
+
 # ============================================================
 # Convenience wrapper (dùng config mặc định)
 # ============================================================
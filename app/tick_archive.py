@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .resample import Candle, TimeframeResampler
+
+# ============================================================
+# TICK ARCHIVE (append-only, 1 cặp file / symbol)
+# ------------------------------------------------------------
+#   root/meta.json       : version + scale + block size
+#   root/<SYM>.dat       : các block nối nhau
+#   root/<SYM>.idx       : index thưa, 1 entry 32 byte / block
+#
+# Block = varint(zigzag(delta)) của 3 cột nối liền nhau:
+#   ts_ms..., price_int..., qty_int...
+# (delta tính trong block, giá trị đầu so với 0 -> block tự giải
+#  mã được, không phụ thuộc block trước).
+# price/qty lưu dạng int = round(x * scale).
+#
+# Đọc [t0, t1): tìm block bằng searchsorted trên index, rồi chỉ
+# decode các block đó từ mmap -> I/O tỉ lệ với độ dài cửa sổ.
+# ============================================================
+VERSION = 1
+BLOCK_TICKS = 4096
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("t_first", "<i8"),
+        ("t_last", "<i8"),
+        ("offset", "<u8"),
+        ("nbytes", "<u4"),
+        ("count", "<u4"),
+    ]
+)
+
+
+# ============================================================
+# VARINT (vectorized)
+# ============================================================
+def zigzag(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.int64)
+    return ((x << 1) ^ (x >> 63)).view(np.uint64)
+
+
+def unzigzag(z: np.ndarray) -> np.ndarray:
+    return ((z >> np.uint64(1)).view(np.int64)) ^ -(z & np.uint64(1)).view(np.int64)
+
+
+def varint_encode(v: np.ndarray) -> bytes:
+    v = v.astype(np.uint64)
+    if not v.size:
+        return b""
+    # số byte mỗi giá trị (7 bit / byte)
+    nb = np.ones(v.size, dtype=np.int64)
+    rest = v >> np.uint64(7)
+    while rest.any():
+        nb += rest > 0
+        rest >>= np.uint64(7)
+
+    out = np.empty(int(nb.sum()), dtype=np.uint8)
+    start = np.concatenate([[0], np.cumsum(nb)[:-1]])
+    for k in range(int(nb.max())):
+        m = nb > k
+        byte = (v[m] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(nb[m] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[start[m] + k] = byte
+    return out.tobytes()
+
+
+def varint_decode(buf) -> np.ndarray:
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if not b.size:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    group = np.repeat(np.arange(ends.size), ends - starts + 1)
+    shift = (np.arange(b.size) - starts[group]) * 7
+    parts = (b & 0x7F).astype(np.uint64) << shift.astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def encode_block(ts: np.ndarray, price: np.ndarray, qty: np.ndarray) -> bytes:
+    cols = np.concatenate(
+        [np.diff(c, prepend=np.int64(0)) for c in (ts, price, qty)]
+    )
+    return varint_encode(zigzag(cols))
+
+
+def decode_block(buf, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    cols = np.cumsum(unzigzag(varint_decode(buf)).reshape(3, count), axis=1)
+    return cols[0], cols[1], cols[2]
+
+
+# ============================================================
+# ARCHIVE
+# ============================================================
+class TickArchive:
+    def __init__(
+        self,
+        root: str,
+        *,
+        price_scale: float = 1e8,
+        qty_scale: float = 1e8,
+        block_ticks: int = BLOCK_TICKS,
+    ):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") != VERSION:
+                raise ValueError(f"unsupported archive version {meta.get('version')}")
+        else:
+            meta = {
+                "version": VERSION,
+                "price_scale": price_scale,
+                "qty_scale": qty_scale,
+                "block_ticks": block_ticks,
+            }
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+
+        self.price_scale = float(meta["price_scale"])
+        self.qty_scale = float(meta["qty_scale"])
+        self.block_ticks = int(meta["block_ticks"])
+
+        # buffer ghi (chưa thành block)
+        self._pending: Dict[str, List[Tuple[int, float, float]]] = {}
+        self._last_ts: Dict[str, int] = {}
+        self._readers: Dict[str, Tuple[np.ndarray, Optional[mmap.mmap]]] = {}
+
+    def _path(self, symbol: str, ext: str) -> str:
+        return os.path.join(self.root, f"{symbol}.{ext}")
+
+    def symbols(self) -> List[str]:
+        return sorted(f[:-4] for f in os.listdir(self.root) if f.endswith(".idx"))
+
+    # --------------------------------------------------------
+    # write
+    # --------------------------------------------------------
+    def append(self, symbol: str, ts_ms: int, price: float, qty: float) -> None:
+        last = self._last_ts.get(symbol)
+        if last is None:
+            idx = self.index(symbol)
+            last = int(idx["t_last"][-1]) if len(idx) else None
+        if last is not None and ts_ms < last:
+            raise ValueError(f"{symbol}: ts {ts_ms} < last {last} (archive is append-only)")
+        self._last_ts[symbol] = ts_ms
+
+        buf = self._pending.setdefault(symbol, [])
+        buf.append((ts_ms, price, qty))
+        if len(buf) >= self.block_ticks:
+            self._write_block(symbol)
+
+    def extend(self, symbol: str, ts_ms, price, qty) -> None:
+        for t, p, q in zip(np.asarray(ts_ms).tolist(), np.asarray(price).tolist(), np.asarray(qty).tolist()):
+            self.append(symbol, t, p, q)
+
+    def flush(self) -> None:
+        for symbol in list(self._pending):
+            self._write_block(symbol)
+
+    def close(self) -> None:
+        self.flush()
+        for _, mm in self._readers.values():
+            if mm is not None:
+                mm.close()
+        self._readers.clear()
+
+    def __enter__(self) -> "TickArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _write_block(self, symbol: str) -> None:
+        buf = self._pending.pop(symbol, None)
+        if not buf:
+            return
+        a = np.array(buf)
+        ts = a[:, 0].astype(np.int64)
+        price = np.rint(a[:, 1] * self.price_scale).astype(np.int64)
+        qty = np.rint(a[:, 2] * self.qty_scale).astype(np.int64)
+        payload = encode_block(ts, price, qty)
+
+        dat, idx = self._path(symbol, "dat"), self._path(symbol, "idx")
+        index = self.index(symbol)
+        # bỏ phần .dat mồ côi (crash sau khi ghi block, trước khi ghi index)
+        end = int(index["offset"][-1] + index["nbytes"][-1]) if len(index) else 0
+        with open(dat, "ab") as f:
+            if f.tell() != end:
+                f.truncate(end)
+                f.seek(end)
+            f.write(payload)
+
+        entry = np.array([(ts[0], ts[-1], end, len(payload), len(ts))], dtype=INDEX_DTYPE)
+        with open(idx, "ab") as f:
+            f.write(entry.tobytes())
+
+        # reader cũ không còn đúng
+        old = self._readers.pop(symbol, None)
+        if old is not None and old[1] is not None:
+            old[1].close()
+
+    # --------------------------------------------------------
+    # read
+    # --------------------------------------------------------
+    def index(self, symbol: str) -> np.ndarray:
+        path = self._path(symbol, "idx")
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        raw = np.fromfile(path, dtype=np.uint8)
+        raw = raw[: raw.size - raw.size % INDEX_DTYPE.itemsize]
+        return raw.view(INDEX_DTYPE)
+
+    def _reader(self, symbol: str) -> Tuple[np.ndarray, Optional[mmap.mmap]]:
+        r = self._readers.get(symbol)
+        if r is None:
+            index = self.index(symbol)
+            mm = None
+            if len(index):
+                with open(self._path(symbol, "dat"), "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            r = self._readers[symbol] = (index, mm)
+        return r
+
+    def read(self, symbol: str, t0_ms: int, t1_ms: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Ticks có t0 <= ts < t1 (đã flush) -> (ts_ms, price, qty)."""
+        index, mm = self._reader(symbol)
+        if mm is None:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+
+        # block đầu có t_last >= t0, block cuối có t_first < t1
+        lo = int(np.searchsorted(index["t_last"], t0_ms, side="left"))
+        hi = int(np.searchsorted(index["t_first"], t1_ms, side="left"))
+
+        ts_l, px_l, q_l = [], [], []
+        for e in index[lo:hi]:
+            off, nb = int(e["offset"]), int(e["nbytes"])
+            ts, px, q = decode_block(memoryview(mm)[off:off + nb], int(e["count"]))
+            m = (ts >= t0_ms) & (ts < t1_ms)
+            ts_l.append(ts[m])
+            px_l.append(px[m])
+            q_l.append(q[m])
+
+        if not ts_l:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty, empty
+        return (
+            np.concatenate(ts_l),
+            np.concatenate(px_l) / self.price_scale,
+            np.concatenate(q_l) / self.qty_scale,
+        )
+
+
+# ============================================================
+# SOURCE cho resampler / indicator
+# ============================================================
+def candles(archive: TickArchive, symbol: str, t0_ms: int, t1_ms: int, tf_sec: int) -> List[Candle]:
+    """
+    Dựng lại candle tf_sec cho cửa sổ [t0, t1) qua TimeframeResampler.
+    Candle cuối chỉ được trả về nếu đã kết thúc trước t1; nếu t0 không
+    nằm trên biên tf thì candle đầu chỉ gồm phần tick từ t0.
+    """
+    ts, price, qty = archive.read(symbol, t0_ms, t1_ms)
+    r = TimeframeResampler(tf_sec)
+    out: List[Candle] = []
+    for t, p, q in zip((ts // 1000).tolist(), price.tolist(), qty.tolist()):
+        c, closed = r.update(t, p, q)
+        if closed:
+            out.append(c)
+    last = r.current()
+    if last is not None and (last.end_sec + 1) * 1000 <= t1_ms:
+        out.append(last)
+    return out
+
+
+def bar_arrays(archive: TickArchive, symbol: str, t0_ms: int, t1_ms: int, tf_sec: int):
+    """(close, volume) dạng mảng -> đưa thẳng vào batch API của indicators."""
+    cs = candles(archive, symbol, t0_ms, t1_ms, tf_sec)
+    return (
+        np.array([c.close for c in cs], dtype=float),
+        np.array([c.volume for c in cs], dtype=float),
+    )
+
+
+# ============================================================
+# CLI: import recording (app.recorder) -> archive
+# ============================================================
+def import_recording(rec_path: str, archive: TickArchive) -> int:
+    from .recorder import KIND_TRADE, load_recording
+
+    symbols, rec = load_recording(rec_path)
+    trades = rec[rec["kind"] == KIND_TRADE]
+    n = 0
+    for sid, sym in enumerate(symbols):
+        t = trades[trades["sym"] == sid]
+        t = t[np.argsort(t["t_ms"], kind="stable")]
+        archive.extend(sym, t["t_ms"], t["a"], t["b"])
+        n += len(t)
+    archive.flush()
+    return n
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Import a tick recording into a tick archive")
+    ap.add_argument("recording")
+    ap.add_argument("root")
+    args = ap.parse_args()
+    with TickArchive(args.root) as arc:
+        print(f"[archive] imported {import_recording(args.recording, arc)} trades into {args.root}")
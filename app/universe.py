@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import (
+    BINANCE_FUTURES_REST,
+    TOP_N,
+    UNIVERSE_BUFFER,
+    UNIVERSE_SEC,
+    WARMUP_ENABLED,
+)
+from .decode import Decoder
+from .state import SymbolStore
+from .streams import ConnectionManager
+from .symbols import fetch_top_usdt_symbols
+from .warmup import warmup
+
+
+# ============================================================
+# UNIVERSE ROTATION
+# ------------------------------------------------------------
+# Mỗi `every` giây lấy lại top USDT theo quoteVolume 24h:
+#   - thêm symbol vào top top_n mà chưa có
+#   - symbol đang chạy chỉ bỏ khi rơi khỏi top top_n + buffer
+#     (tránh subscribe / unsubscribe qua lại quanh ngưỡng), nên
+#     universe có top_n .. top_n + buffer symbol
+# Đổi trên connection đang mở (SUBSCRIBE / UNSUBSCRIBE, không
+# reconnect). Thứ tự để handler không bao giờ thấy symbol lạ:
+#   bỏ: decoder -> unsubscribe -> store.remove (hàng về trống)
+#   thêm: store.add -> warmup -> decoder -> subscribe
+# keep(symbol): lọc symbol thuộc process này (cluster partition).
+# REST lỗi -> giữ nguyên universe, thử lại lần sau.
+# ============================================================
+class Universe:
+    def __init__(
+        self,
+        store: SymbolStore,
+        *,
+        rest_base: str = BINANCE_FUTURES_REST,
+        top_n: int = TOP_N,
+        every: float = UNIVERSE_SEC,
+        buffer: int = UNIVERSE_BUFFER,
+        keep: Callable[[str], bool] = lambda s: True,
+        warm: bool = bool(WARMUP_ENABLED),
+    ):
+        self.store = store
+        self.rest_base = rest_base
+        self.top_n = top_n
+        self.every = every
+        self.buffer = buffer
+        self.keep = keep
+        self.warm = warm
+        self.streams: List[Tuple[ConnectionManager, Decoder]] = []
+
+        # stats
+        self.rotations = 0
+        self.added = 0
+        self.removed = 0
+        self.errors = 0
+        self.last_at: Optional[float] = None
+
+    def attach(self, mgr: ConnectionManager, decoder: Decoder) -> None:
+        """1 stream (bookTicker / aggTrade) = 1 manager + decoder riêng."""
+        self.streams.append((mgr, decoder))
+
+    def plan(self, ranked: Sequence[str]) -> Tuple[List[str], List[str]]:
+        """ranked: symbol theo quoteVolume giảm dần -> (add, remove)."""
+        rank = {s: k for k, s in enumerate(dict.fromkeys(ranked))}
+        limit = self.top_n + self.buffer
+        add = [s for s in rank if rank[s] < self.top_n and s not in self.store and self.keep(s)]
+        remove = [s for s in self.store.ids if rank.get(s, limit) >= limit or not self.keep(s)]
+        return add, remove
+
+    async def rotate(self, ranked: Sequence[str]) -> Dict[str, List[str]]:
+        add, remove = self.plan(ranked)
+
+        if remove:
+            for mgr, decoder in self.streams:
+                decoder.symbols.difference_update(remove)
+            for mgr, _ in self.streams:
+                await mgr.unsubscribe(remove)
+            self.store.remove(remove)
+
+        if add:
+            self.store.add(add)
+            if self.warm:
+                try:
+                    await warmup(self.store, rest_base=self.rest_base, symbols=add)
+                except Exception as e:
+                    print("[universe] warmup error:", e)
+            for mgr, decoder in self.streams:
+                decoder.symbols.update(add)
+            for mgr, _ in self.streams:
+                await mgr.subscribe(add)
+
+        self.rotations += 1
+        self.added += len(add)
+        self.removed += len(remove)
+        self.last_at = time.time()
+        if add or remove:
+            print(f"[universe] +{len(add)} -{len(remove)} | symbols={len(self.store)} "
+                  f"| add={','.join(add)} remove={','.join(remove)}")
+        return {"add": add, "remove": remove}
+
+    async def refresh(self) -> bool:
+        """Xếp hạng lại ngay 1 lần; REST lỗi -> False, universe giữ nguyên."""
+        try:
+            ranked = await fetch_top_usdt_symbols(self.rest_base, self.top_n + self.buffer)
+        except Exception as e:
+            self.errors += 1
+            print(f"[universe] REST failed ({e}), keep {len(self.store)} symbols")
+            return False
+        await self.rotate(ranked)
+        return True
+
+    async def run(self) -> None:
+        if self.every <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.every)
+            await self.refresh()
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self.store),
+            "rotations": self.rotations,
+            "added": self.added,
+            "removed": self.removed,
+            "errors": self.errors,
+        }
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .binance_client import AsyncBinanceFuturesClient, rest_client
+from .config import BINANCE_FUTURES_REST, WARMUP_BARS
+from .state import BarAccum, SymbolStore
+
+INTERVALS = {300: "5m", 900: "15m", 3600: "1h", 14400: "4h"}
+
+
+# ============================================================
+# FETCH (song song, qua REST client dùng chung)
+# ============================================================
+async def fetch_klines(
+    client: AsyncBinanceFuturesClient,
+    symbols: Sequence[str],
+    interval: str,
+    limit: int,
+    start_ms: Optional[int] = None,
+    *,
+    ohlcv: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Trả về {symbol: array (bars x 2) [close, volume]} chỉ gồm bar ĐÃ ĐÓNG
+    (ohlcv=True: (bars x 6) [open_ms, open, high, low, close, volume]).
+    Symbol lỗi bị bỏ qua (log ra, không raise). start_ms: chỉ lấy
+    bar mở từ mốc đó (gap fill sau khi restore snapshot).
+    """
+    cols = (0, 1, 2, 3, 4, 5) if ohlcv else (4, 5)
+    now_ms = int(time.time() * 1000)
+
+    async def one(sym: str):
+        try:
+            rows = await client.klines(sym, interval, limit, start_ms)
+        except Exception as e:
+            print(f"[warmup] {sym} {interval} failed: {e}")
+            return sym, None
+        # kline cuối đang mở -> bỏ (closeTime >= now)
+        rows = [r for r in rows if int(r[6]) < now_ms]
+        return sym, np.array([[float(r[c]) for c in cols] for r in rows]).reshape(-1, len(cols))
+
+    out = await asyncio.gather(*(one(s) for s in symbols))
+    return {s: a for s, a in out if a is not None}
+
+
+def to_matrix(bars: Dict[str, np.ndarray], symbols: Sequence[str], col: int) -> np.ndarray:
+    """Ghép thành ma trận (symbols x bars), pad trái NaN cho lịch sử ngắn."""
+    width = max((len(a) for a in bars.values()), default=0)
+    m = np.full((len(symbols), width), np.nan)
+    for i, s in enumerate(symbols):
+        a = bars.get(s)
+        if a is not None and len(a):
+            m[i, width - len(a):] = a[:, col]
+    return m
+
+
+# ============================================================
+# SEED STORE
+# ============================================================
+def seed_store(store: SymbolStore, bars: Dict[int, Dict[str, np.ndarray]]) -> None:
+    """
+    bars: {tf_sec: {symbol: (bars x 2) [close, volume]}}. Chạy batch
+    indicator cho mọi node của graph theo timeframe (state=bank nên
+    nếu store đã có state thì chạy tiếp từ đó).
+    """
+    for tf in store.graph.tfs:
+        got = bars.get(tf) or {}
+        store.graph.seed(tf, to_matrix(got, store.symbols, 0), to_matrix(got, store.symbols, 1))
+
+
+# ============================================================
+# WARM-UP STAGE
+# ============================================================
+async def warmup(
+    store: SymbolStore,
+    *,
+    rest_base: str = BINANCE_FUTURES_REST,
+    bars: int = WARMUP_BARS,
+    symbols: Optional[List[str]] = None,
+) -> dict:
+    t0 = time.perf_counter()
+    symbols = list(symbols or store.ids)
+
+    # chỉ timeframe có indicator node (graph.tfs)
+    tfs = store.graph.tfs
+    client = rest_client(rest_base)
+    requests, weight = client.requests, client.weight
+    res = await asyncio.gather(*(
+        fetch_klines(client, symbols, INTERVALS[tf], bars) for tf in tfs
+    ))
+    fetched = dict(zip(tfs, res))
+    seed_store(store, fetched)
+
+    report = {
+        "symbols": len(symbols),
+        **{f"ok_{INTERVALS[tf]}": len(fetched[tf]) for tf in tfs},
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "requests": client.requests - requests,
+        "weight": client.weight - weight,
+        "used_weight_1m": client.used_weight_1m,
+    }
+
+    print(
+        f"[warmup] symbols={report['symbols']} "
+        + "".join(f"ok{INTERVALS[tf]}={len(fetched[tf])} " for tf in tfs)
+        + f"in {report['elapsed_s']}s | "
+        f"REST requests={report['requests']} weight={report['weight']} "
+        f"used_weight_1m={report['used_weight_1m']}"
+    )
+    return report
+
+
+# ============================================================
+# GAP FILL (sau khi restore snapshot)
+# ------------------------------------------------------------
+# Snapshot giữ bucket đang mở của từng timeframe. Nếu bucket đó
+# đã đóng thì lấy klines từ chính bucket đó tới hiện tại (bar
+# đang mở lúc snapshot có đủ trade trong kline) và chạy tiếp
+# indicator từ state đã restore (chỉ timeframe có indicator
+# node). Bar đang mở của level trên (15m/1h/4h, kể cả level
+# không có indicator -> DB sink vẫn nhận bar đủ) được dựng lại:
+# giữ phần đã tích lũy nếu cùng bucket, gộp (BarAccum.merge)
+# các bar 5m đã đóng trong khoảng còn thiếu - như cascade chạy
+# liên tục. Bar 5m đang mở: cùng bucket giữ nguyên (thiếu trade
+# trong lúc restart), khác bucket bắt đầu từ trade live.
+# ============================================================
+
+
+def merge_ranges(levels: Sequence[BarAccum], old: Sequence[int], new: Sequence[int]) -> Dict[int, tuple]:
+    """
+    {k: (lo, hi)} (giây) các bar 5m phải gộp vào bar đang mở mới của
+    level k >= 1. hi = đầu bucket mới của level k-1 (phần sau đó level
+    k-1 tự gộp lên khi đóng); lo = đầu bucket mới của level k nếu
+    bucket đổi (bar cũ bỏ), cùng bucket -> đầu bucket cũ của level
+    k-1 (trước đó đã có trong bar đang tích lũy).
+    """
+    out = {}
+    for k in range(1, len(levels)):
+        lower, upper = levels[k - 1], levels[k]
+        hi = new[k - 1] * lower.tf_sec
+        lo = old[k - 1] * lower.tf_sec if old[k] == new[k] else new[k] * upper.tf_sec
+        if lo < hi:
+            out[k] = (lo, hi)
+    return out
+
+
+def merge_gap(store: SymbolStore, ranges: Dict[int, tuple], bars_5m: Dict[str, np.ndarray]) -> int:
+    """Gộp bar 5m đã đóng (fetch_klines ohlcv=True) vào bar đang mở của level trên."""
+    levels = store.bars.levels
+    base = levels[0]
+    tmp = BarAccum(len(store.symbols), base.tf_sec)
+    by_bucket: Dict[int, List[tuple]] = {}
+    for sym, rows in bars_5m.items():
+        i = store.ids.get(sym)
+        if i is None:
+            continue
+        for r in rows:
+            by_bucket.setdefault(int(r[0]) // 1000 // base.tf_sec, []).append((i, r))
+
+    merged = 0
+    for b in sorted(by_bucket):
+        t = b * base.tf_sec
+        targets = [k for k, (lo, hi) in ranges.items() if lo <= t < hi]
+        if not targets:
+            continue
+        idx = np.array([i for i, _ in by_bucket[b]], dtype=np.int64)
+        r = np.array([r for _, r in by_bucket[b]])
+        tmp.open[idx], tmp.high[idx], tmp.low[idx], tmp.close[idx], tmp.vol[idx] = r[:, 1:6].T
+        for k in targets:
+            if levels[k].open_bucket is None:
+                levels[k].open_bucket = t // levels[k].tf_sec
+            levels[k].merge(idx, tmp)
+        merged += len(idx)
+    return merged
+
+
+async def fill_gap(
+    store: SymbolStore,
+    *,
+    rest_base: str = BINANCE_FUTURES_REST,
+    max_bars: int = 1500,
+    now: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    None = không fill được (snapshot quá cũ / chưa có bar / REST lỗi với
+    symbol nào đó) -> cần warmup đầy đủ; store chưa bị sửa.
+    """
+    t0 = time.perf_counter()
+    now = time.time() if now is None else now
+
+    base = store.bars.base
+    if base.open_bucket is None:
+        return None
+
+    levels = store.bars.levels
+    gaps: Dict[int, int] = {}
+    old, new = [], []
+    plan = {}
+    for bars in levels:
+        tf = bars.tf_sec
+        # level trên chưa nhận bar nào -> bucket suy ra từ level 0
+        bucket = bars.open_bucket
+        if bucket is None:
+            bucket = base.open_bucket * base.tf_sec // tf
+        old.append(bucket)
+        new.append(int(now) // tf)
+        gaps[tf] = gap = new[-1] - bucket
+        if gap + 1 > max_bars:     # limit = gap + 1, Binance tối đa 1500
+            return None
+        if gap > 0 and tf in store.graph.order:
+            plan[tf] = (INTERVALS[tf], gap + 1, bucket * tf * 1000)
+
+    # bar 5m đã đóng cần gộp lên bar đang mở của level trên
+    ranges = merge_ranges(levels, old, new)
+    span = None
+    if ranges:
+        lo = min(r[0] for r in ranges.values())
+        hi = max(r[1] for r in ranges.values())
+        span = (INTERVALS[base.tf_sec], (hi - lo) // base.tf_sec, lo * 1000)
+
+    fetched: Dict[int, Dict[str, np.ndarray]] = {}
+    bars_5m: Dict[str, np.ndarray] = {}
+    requests = 0
+    if plan or span:
+        client = rest_client(rest_base)
+        requests = client.requests
+        tfs = list(plan)
+        res = await asyncio.gather(
+            *(fetch_klines(client, list(store.ids), *plan[tf]) for tf in tfs),
+            *([fetch_klines(client, list(store.ids), *span, ohlcv=True)] if span else []),
+        )
+        fetched.update(zip(tfs, res))
+        if span:
+            bars_5m = res[-1]
+        requests = client.requests - requests
+        # symbol nào lỗi REST -> indicator sẽ nhảy qua gap như không thiếu bar:
+        # chưa sửa store, trả None để caller warmup đầy đủ
+        failed = {s for got in res for s in store.ids if s not in got}
+        if failed:
+            print(f"[warmup] gap fill: {len(failed)} symbols failed "
+                  f"({','.join(sorted(failed)[:5])}{',...' if len(failed) > 5 else ''}), full warmup")
+            return None
+    for bars in levels:
+        if gaps[bars.tf_sec] > 0:
+            bars.reset()
+    seed_store(store, fetched)
+    merged = merge_gap(store, ranges, bars_5m)
+
+    report = {
+        **{f"gap_{INTERVALS.get(tf, tf)}": g for tf, g in gaps.items()},
+        "merged_5m": merged,
+        "requests": requests,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+    print(
+        "[warmup] gap fill "
+        + " ".join(f"{INTERVALS.get(tf, tf)}={g}" for tf, g in gaps.items())
+        + f" bars | merged 5m={merged} | REST requests={requests} in {report['elapsed_s']}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # chạy riêng: BINANCE_FUTURES_REST=http://127.0.0.1:8080 python -m app.warmup
+    from .symbols import FALLBACK_SYMBOLS
+
+    from .binance_client import close_rest_clients
+
+    async def _main():
+        try:
+            await warmup(SymbolStore(FALLBACK_SYMBOLS))
+        finally:
+            await close_rest_clients()
+
+    asyncio.run(_main())
@@ -0,0 +1,82 @@
+"""
+Microbenchmark decoder: python -m bench.decode [--n 200000]
+
+So sánh msgs/sec của cách cũ (json.loads + dict + float) với các
+backend của app.decode.Decoder, có và không có symbol lạ.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from app.decode import HAS_ORJSON, Decoder
+
+
+def make_frames(n: int, symbols, unknown_ratio: float):
+    frames_trade, frames_book = [], []
+    for k in range(n):
+        sym = random.choice(symbols) if random.random() >= unknown_ratio else f"X{k % 500}USDT"
+        p = 100 + random.random()
+        frames_trade.append(json.dumps({
+            "stream": f"{sym.lower()}@aggTrade",
+            "data": {"e": "aggTrade", "E": 1700000000000 + k, "a": 5000000 + k, "s": sym,
+                     "p": f"{p:.4f}", "q": f"{random.random() * 10:.3f}",
+                     "f": 9000000 + k, "l": 9000000 + k, "T": 1700000000000 + k, "m": True},
+        }, separators=(",", ":")))
+        frames_book.append(json.dumps({
+            "stream": f"{sym.lower()}@bookTicker",
+            "data": {"e": "bookTicker", "u": 400900217 + k, "s": sym,
+                     "b": f"{p:.4f}", "B": "31.21", "a": f"{p + 0.01:.4f}", "A": "40.66",
+                     "T": 1700000000000 + k, "E": 1700000000000 + k},
+        }, separators=(",", ":")))
+    return frames_trade, frames_book
+
+
+def baseline_book(frames, symbols):
+    # cách cũ trong ws_bookticker
+    for raw in frames:
+        data = json.loads(raw).get("data", {})
+        if data.get("s") in symbols:
+            float(data["b"])
+            float(data["a"])
+
+
+def baseline_trade(frames, symbols):
+    for raw in frames:
+        data = json.loads(raw).get("data", {})
+        if data.get("s") in symbols:
+            float(data["q"])
+            float(data["p"])
+
+
+def rate(fn, frames) -> float:
+    t0 = time.perf_counter()
+    fn(frames)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--symbols", type=int, default=45)
+    args = ap.parse_args()
+
+    symbols = {f"S{k}USDT" for k in range(args.symbols)}
+    backends = ["json", "scan"] + (["orjson"] if HAS_ORJSON else [])
+
+    print(f"{'case':<28}{'stream':<10}{'msgs/s':>12}")
+    for unknown in (0.0, 0.5):
+        trades, books = make_frames(args.n, sorted(symbols), unknown)
+        tag = f"unknown={int(unknown * 100)}%"
+        print(f"{'baseline ' + tag:<28}{'trade':<10}{rate(lambda f: baseline_trade(f, symbols), trades):>12,.0f}")
+        print(f"{'baseline ' + tag:<28}{'book':<10}{rate(lambda f: baseline_book(f, symbols), books):>12,.0f}")
+        for b in backends:
+            dec = Decoder(symbols, backend=b)
+            print(f"{b + ' ' + tag:<28}{'trade':<10}{rate(lambda f: [dec.trade(x) for x in f], trades):>12,.0f}")
+            print(f"{b + ' ' + tag:<28}{'book':<10}{rate(lambda f: [dec.book(x) for x in f], books):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
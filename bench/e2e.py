@@ -0,0 +1,254 @@
+"""
+End-to-end benchmark: python -m bench.e2e [--symbols 50,200,1000] [--rate 5000] [--duration 10]
+
+Dựng 1 WS server giả lập Binance combined stream (process riêng) phát
+aggTrade + bookTicker tổng hợp với rate cố định, trỏ ws_bookticker và
+đường aggTrade của bot (cùng trade_handler / ConnectionManager /
+bar scheduler như ws_aggtrade, handler bọc thêm phần đo latency)
+vào đó, đo:
+  - msgs/s xử lý được (cả 2 stream)
+  - p50/p99 tick-to-decision: lúc server gửi frame -> TickProcessor xong
+  - CPU (user+sys) và RSS của process bot
+Kết quả ghi JSON (--out), --baseline so sánh với 1 file cũ.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import time
+from typing import List, Optional
+
+import numpy as np
+
+# ============================================================
+# WS STAND-IN (chạy trong process riêng)
+# ============================================================
+TRADE = ('{{"stream":"{s}@aggTrade","data":{{"e":"aggTrade","E":{t},"a":{k},"s":"{S}",'
+         '"p":"{p:.4f}","q":"{q:.3f}","f":{k},"l":{k},"T":{t},"m":true,"Z":{us}}}}}')
+BOOK = ('{{"stream":"{s}@bookTicker","data":{{"e":"bookTicker","u":{k},"s":"{S}",'
+        '"b":"{p:.4f}","B":"1.0","a":"{a:.4f}","A":"1.0","T":{t},"E":{t},"Z":{us}}}}}')
+
+
+def serve(port: int, rate: float, total_streams: int) -> None:
+    """rate = msgs/s cho MỖI loại stream, chia đều theo số stream của connection."""
+    from aiohttp import web
+
+    async def stream(req):
+        ws = web.WebSocketResponse(compress=False)
+        await ws.prepare(req)
+        streams = [s.split("@") for s in req.query["streams"].split("/")]
+        conn_rate = rate * len(streams) / max(1, total_streams)
+        rng = np.random.default_rng()
+        k, owed, last = 0, 0.0, time.perf_counter()
+        while not ws.closed:
+            await asyncio.sleep(0.002)
+            now = time.perf_counter()
+            owed += (now - last) * conn_rate
+            last = now
+            n = int(owed)
+            owed -= n
+            if not n:
+                continue
+            picks = rng.integers(0, len(streams), n)
+            prices = 100 + rng.random(n)
+            try:
+                for j, p in zip(picks.tolist(), prices.tolist()):
+                    sym, kind = streams[j]
+                    k += 1
+                    t_us = int(time.time() * 1e6)
+                    tpl = TRADE if kind == "aggTrade" else BOOK
+                    await ws.send_str(tpl.format(
+                        s=sym, S=sym.upper(), k=k, t=t_us // 1000, us=t_us, p=p, q=1.0, a=p + 0.01,
+                    ))
+            except ConnectionError:
+                break   # bot đã ngắt (hết case)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/stream", stream)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, handle_signals=True)
+
+
+# ============================================================
+# BOT SIDE
+# ============================================================
+def _send_us(raw) -> int:
+    j = raw.rfind('"Z":')
+    return int(raw[j + 4:raw.index("}", j)])
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_case(n_symbols: int, rate: float, duration: float, warmup: float, port: int) -> dict:
+    from app.config import WS_MAX_STREAMS, WS_SHARDS
+    from app.decode import Decoder
+    from app.main import trade_handler, ws_bookticker
+    from app.scheduler import run_bar_scheduler
+    from app.state import SymbolStore
+    from app.streams import ConnectionManager
+
+    symbols = [f"S{k}USDT" for k in range(n_symbols)]
+    url = f"ws://127.0.0.1:{port}/stream"
+    store = SymbolStore(symbols)
+    decoder = Decoder(symbols)
+    alerts = 0
+
+    def emit(now, side, sym, price):
+        nonlocal alerts
+        alerts += 1
+
+    lat: List[float] = []
+    frames = 0
+    measuring = False
+    inner = trade_handler(store, decoder, emit=emit)
+
+    def handler(batch):
+        nonlocal frames
+        t_ms = inner(batch)
+        if measuring:
+            frames += len(batch)
+            now_us = time.time() * 1e6
+            lat.extend(now_us - _send_us(raw) for raw in batch)
+        return t_ms
+
+    class CountingDecoder:
+        # ws_bookticker chạy nguyên bản, chỉ đếm frame qua decoder
+        # (lazy: symbol() cho mọi frame, eager: book())
+        def symbol(self, raw):
+            nonlocal frames
+            if measuring:
+                frames += 1
+            return decoder.symbol(raw)
+
+        def book(self, raw):
+            nonlocal frames
+            if measuring:
+                frames += 1
+            return decoder.book(raw)
+
+    mgr_trade = ConnectionManager(url, symbols, "aggTrade", handler,
+                                  max_streams=WS_MAX_STREAMS, n_shards=WS_SHARDS)
+    tasks = [
+        asyncio.create_task(mgr_trade.run()),
+        asyncio.create_task(ws_bookticker(store, url, decoder=CountingDecoder())),
+        asyncio.create_task(run_bar_scheduler(store, emit)),
+    ]
+
+    await asyncio.sleep(warmup)
+    measuring = True
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    await asyncio.sleep(duration)
+    measuring = False
+    elapsed = time.perf_counter() - t0
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    cpu = (ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime)
+    a = np.array(lat) if lat else np.array([np.nan])
+    return {
+        "symbols": n_symbols,
+        "target_rate": rate * 2,
+        "msgs_per_s": round(frames / elapsed, 1),
+        "trades": len(lat),
+        "p50_us": round(float(np.nanpercentile(a, 50)), 1),
+        "p99_us": round(float(np.nanpercentile(a, 99)), 1),
+        "max_us": round(float(np.nanmax(a)), 1),
+        "cpu_pct": round(100 * cpu / elapsed, 1),
+        "rss_mb": round(_rss_mb(), 1),
+        "shards": len(mgr_trade.shards),
+        "avg_batch": round(sum(sh.msgs for sh in mgr_trade.shards)
+                           / max(1, sum(sh.batches for sh in mgr_trade.shards)), 2),
+        "alerts": alerts,
+    }
+
+
+def bench(n_symbols: int, rate: float, duration: float, warmup: float, port: int) -> dict:
+    ctx = mp.get_context("spawn")
+    srv = ctx.Process(target=serve, args=(port, rate, n_symbols), daemon=True)
+    srv.start()
+    time.sleep(1.0)
+    try:
+        return asyncio.run(run_case(n_symbols, rate, duration, warmup, port))
+    finally:
+        srv.terminate()
+        srv.join()
+
+
+# ============================================================
+# REPORT
+# ============================================================
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: List[dict], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {r["symbols"]: r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}")
+    for r in results:
+        b = base.get(r["symbols"])
+        if b is None:
+            continue
+        d = lambda k: f"{(r[k] - b[k]) / b[k] * 100:+.1f}%" if b[k] else "n/a"
+        print(f"  symbols={r['symbols']:<5} msgs/s {d('msgs_per_s'):>8}  p50 {d('p50_us'):>8}  "
+              f"p99 {d('p99_us'):>8}  cpu {d('cpu_pct'):>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end WS -> decision benchmark")
+    ap.add_argument("--symbols", default="50,200,1000")
+    ap.add_argument("--rate", type=float, default=5000, help="msgs/s per stream type (aggTrade, bookTicker)")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--port", type=int, default=18765)
+    ap.add_argument("--out", default="bench_e2e.json")
+    ap.add_argument("--baseline", default=None)
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'symbols':>8}{'msgs/s':>12}{'p50 us':>10}{'p99 us':>10}{'cpu %':>8}{'rss MB':>8}")
+    for n in (int(x) for x in args.symbols.split(",")):
+        r = bench(n, args.rate, args.duration, args.warmup, args.port)
+        results.append(r)
+        print(f"{n:>8}{r['msgs_per_s']:>12,.0f}{r['p50_us']:>10}{r['p99_us']:>10}"
+              f"{r['cpu_pct']:>8}{r['rss_mb']:>8}")
+
+    report = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {args.out}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+aggTrade gap / backfill check: python -m bench.gaps [--symbols 20] [--rate 400] [--duration 20]
+
+Dựng 1 stand-in Binance (process riêng) gồm WS combined stream aggTrade
+và REST /fapi/v1/aggTrades trên cùng 1 lịch sử trade. Cứ --drop-every
+giây server cắt mọi connection và vẫn sinh trade trong lúc bot reconnect
+(trade đó chỉ còn trên REST). Bot chạy ws_aggtrade nguyên bản trỏ vào
+stand-in; cuối cùng so OHLCV bar 5m đang mở / kế tiếp của bot với bar
+dựng từ toàn bộ lịch sử, in số gap, số trade chèn lại / mất, latency
+backfill. --no-backfill để thấy sai lệch khi không lấy lại.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import time
+from typing import Dict, List
+
+import numpy as np
+
+TRADE = ('{{"stream":"{s}@aggTrade","data":{{"e":"aggTrade","E":{t},"a":{k},"s":"{S}",'
+         '"p":"{p:.4f}","q":"{q:.3f}","f":{k},"l":{k},"T":{t},"m":true}}}}')
+
+
+# ============================================================
+# WS + REST STAND-IN (chạy trong process riêng)
+# ============================================================
+def serve(port: int, symbols: List[str], rate: float, drop_every: float, drop_for: float) -> None:
+    from aiohttp import web
+
+    hist: Dict[str, list] = {s: [] for s in symbols}    # (a, price, qty, t_ms)
+    conns: Dict[web.WebSocketResponse, set] = {}
+    # chưa có connection thì chưa sinh trade (trade trước lần connect đầu không phải gap)
+    state = {"paused": True, "dropping": True, "down_until": 0.0}
+
+    async def generate():
+        rng = np.random.default_rng(7)
+        price = {s: 100.0 for s in symbols}
+        owed, last, next_drop = 0.0, time.monotonic(), 0.0
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            owed += (now - last) * rate
+            last = now
+            if state["paused"]:
+                owed, next_drop = 0.0, now + drop_every
+                continue
+            if state["dropping"] and now >= next_drop:
+                next_drop = now + drop_every
+                state["down_until"] = now + drop_for
+                for ws in list(conns):
+                    await ws.close()
+            n = int(owed)
+            owed -= n
+            t_ms = int(time.time() * 1000)
+            for j in rng.integers(0, len(symbols), n).tolist():
+                s = symbols[j]
+                price[s] *= float(np.exp(rng.normal(0, 0.001)))
+                h = hist[s]
+                a = len(h) + 1
+                h.append((a, price[s], float(rng.exponential(1.0)), t_ms))
+                if now < state["down_until"]:
+                    continue   # đang "mất kết nối": trade chỉ có trên REST
+                frame = TRADE.format(s=s.lower(), S=s, k=a, t=t_ms, p=price[s], q=h[-1][2])
+                for ws, subs in list(conns.items()):
+                    if s in subs and not ws.closed:
+                        try:
+                            await ws.send_str(frame)
+                        except ConnectionError:
+                            pass
+
+    async def stream(req):
+        if time.monotonic() < state["down_until"]:
+            raise web.HTTPServiceUnavailable()
+        ws = web.WebSocketResponse(compress=False)
+        await ws.prepare(req)
+        conns[ws] = {st.split("@")[0].upper() for st in req.query["streams"].split("/")}
+        if state["dropping"] and set().union(*conns.values()) == set(symbols):
+            state["paused"] = False
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            conns.pop(ws, None)
+        return ws
+
+    async def agg_trades(req):
+        await asyncio.sleep(0.02)   # RTT giả lập
+        h = hist.get(req.query["symbol"], [])
+        start = int(req.query.get("fromId", 1))
+        limit = int(req.query.get("limit", 500))
+        rows = h[max(0, start - 1):max(0, start - 1) + limit]
+        return web.json_response([
+            {"a": a, "p": f"{p:.4f}", "q": f"{q:.3f}", "f": a, "l": a, "T": t, "m": True}
+            for a, p, q, t in rows
+        ])
+
+    async def pause(req):
+        # ngừng cắt connection, chờ bot subscribe lại đủ rồi phát thêm 1 lúc
+        # (gap chỉ thấy được khi có trade sau nó), sau đó mới dừng hẳn
+        state["dropping"] = False
+        while time.monotonic() < state["down_until"] or set().union(*conns.values()) != set(symbols):
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(2.0)
+        state["paused"] = True
+        return web.json_response({"ok": True})
+
+    async def start_gen(app):
+        app["gen"] = asyncio.ensure_future(generate())
+
+    app = web.Application()
+    app.router.add_get("/stream", stream)
+    app.router.add_get("/fapi/v1/aggTrades", agg_trades)
+    app.router.add_get("/pause", pause)
+    app.on_startup.append(start_gen)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, handle_signals=True)
+
+
+# ============================================================
+# BOT SIDE
+# ============================================================
+def expected_bar(rows: List[tuple], bucket: int, tf: int):
+    """OHLCV của bucket từ lịch sử đầy đủ (None nếu không có trade)."""
+    sel = [r for r in rows if r[3] // 1000 // tf == bucket]
+    if not sel:
+        return None
+    p = [r[1] for r in sel]
+    return p[0], max(p), min(p), p[-1], sum(r[2] for r in sel)
+
+
+async def run(args) -> int:
+    import aiohttp
+
+    from app.binance_client import close_rest_clients
+    from app.main import ws_aggtrade
+    from app.metrics import BACKFILL
+    from app.state import SymbolStore
+
+    symbols = [f"S{k}USDT" for k in range(args.symbols)]
+    base = f"http://127.0.0.1:{args.port}"
+    store = SymbolStore(symbols)
+    task = asyncio.ensure_future(ws_aggtrade(
+        store, f"ws://127.0.0.1:{args.port}/stream", emit=lambda *a: None,
+        rest_base=base, backfill=not args.no_backfill,
+    ))
+    await asyncio.sleep(args.duration)
+
+    async with aiohttp.ClientSession() as s:
+        await (await s.get(f"{base}/pause")).read()
+        await asyncio.sleep(2.0)
+        hist = {}
+        for sym in symbols:
+            async with s.get(f"{base}/fapi/v1/aggTrades", params={"symbol": sym, "limit": 10**9}) as r:
+                hist[sym] = [(x["a"], float(x["p"]), float(x["q"]), x["T"]) for x in await r.json()]
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await close_rest_clients()
+
+    bars = store.bars_5m
+    tf = bars.tf_sec
+    bad = 0
+    for sym in symbols:
+        i = store.ids[sym]
+        for b, arrs in (
+            (bars.open_bucket, (bars.open, bars.high, bars.low, bars.close, bars.vol)),
+            (bars.open_bucket + 1, (bars.next_open, bars.next_high, bars.next_low, bars.next_close, bars.next_vol)),
+        ):
+            exp = expected_bar(hist[sym], b, tf)
+            if exp is None:
+                continue
+            got = tuple(float(a[i]) for a in arrs)
+            if not np.allclose(got, exp, rtol=0, atol=1e-3):
+                bad += 1
+                print(f"  {sym} bucket={b} got={np.round(got, 4).tolist()} want={np.round(exp, 4).tolist()}")
+
+    total = sum(len(h) for h in hist.values())
+    print(f"trades={total} bars_mismatch={bad} backfill_p50={BACKFILL.quantile(0.5)} "
+          f"p99={BACKFILL.quantile(0.99)} n={BACKFILL.count}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="aggTrade gap detection + REST backfill vs local stand-in")
+    ap.add_argument("--symbols", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=400, help="trades/s tổng")
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--drop-every", type=float, default=8.0)
+    ap.add_argument("--drop-for", type=float, default=1.5)
+    ap.add_argument("--port", type=int, default=18766)
+    ap.add_argument("--no-backfill", action="store_true")
+    args = ap.parse_args()
+
+    symbols = [f"S{k}USDT" for k in range(args.symbols)]
+    ctx = mp.get_context("spawn")
+    srv = ctx.Process(target=serve, args=(args.port, symbols, args.rate, args.drop_every, args.drop_for),
+                      daemon=True)
+    srv.start()
+    time.sleep(1.0)
+    try:
+        bad = asyncio.run(run(args))
+    finally:
+        srv.terminate()
+        srv.join()
+    raise SystemExit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
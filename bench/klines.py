@@ -0,0 +1,230 @@
+"""
+aggTrade vs kline ingestion: python -m bench.klines [--rec ticks.rec] [--symbols 200] [--rate 2000] [--minutes 30]
+
+Cùng 1 phiên trade (file recording của TickRecorder, hoặc phiên tổng
+hợp: giá random walk, rate chia theo Zipf giữa các symbol) được dựng
+thành 2 luồng frame WS như Binance gửi:
+  - aggTrade: 1 frame / trade
+  - kline_5m: mỗi 250ms có trade -> 1 frame bar đang mở ("x":false),
+    hết bucket -> 1 frame bar đã đóng ("x":true, bucket không có
+    trade: O=H=L=C = close trước, volume 0)
+rồi chạy qua trade_handler / kline_handler nguyên bản, scheduler giả
+lập theo recv time (close_due sau biên + grace). So mọi bar đã đóng
+(5m/15m/1h/4h) và alert của 2 mode, in số frame, CPU ingest, CPU/frame.
+Exit 1 nếu có bar khác nhau.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+TRADE = ('{{"stream":"{s}@aggTrade","data":{{"e":"aggTrade","E":{t},"a":{k},"s":"{S}",'
+         '"p":"{p}","q":"{q}","f":{k},"l":{k},"T":{t},"m":true}}}}')
+KLINE = ('{{"stream":"{s}@kline_5m","data":{{"e":"kline","E":{E},"s":"{S}","k":{{"t":{t},"T":{T},'
+         '"s":"{S}","i":"5m","f":0,"L":0,"o":"{o}","c":"{c}","h":"{h}","l":"{l}","v":"{v}",'
+         '"n":{n},"x":{x},"q":"0","V":"0","Q":"0","B":"0"}}}}}}')
+
+TF_MS = 300_000
+PUSH_MS = 250       # kline stream: tối đa 1 frame / 250ms / symbol
+CLOSE_MS = 100      # frame bar đóng tới sau biên
+LATENCY_MS = 5
+
+
+# ============================================================
+# SESSION (symbols, trades sort theo trade time)
+# ============================================================
+def synthetic(n_symbols: int, rate: float, minutes: float, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    symbols = [f"S{k}USDT" for k in range(n_symbols)]
+    n = int(rate * minutes * 60)
+    start = 1_700_000_100_000                     # biên 5m
+    t_ms = np.sort(start + rng.integers(0, int(minutes * 60_000), n))
+    w = 1.0 / np.arange(1, n_symbols + 1)
+    sym = rng.choice(n_symbols, n, p=w / w.sum())
+    price = np.empty(n)
+    for k in range(n_symbols):
+        sel = np.flatnonzero(sym == k)
+        price[sel] = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.0005, sel.size)))
+    qty = np.round(rng.exponential(1.0, n), 3) + 0.001
+    return symbols, sym, t_ms, t_ms + LATENCY_MS, np.round(price, 4), qty
+
+
+def recorded(path: str):
+    from app.recorder import KIND_TRADE, load_recording
+
+    symbols, rec = load_recording(path)
+    tr = rec[rec["kind"] == KIND_TRADE]
+    tr = tr[np.argsort(tr["t_ms"], kind="stable")]
+    t_ms = np.where(tr["t_ms"] > 0, tr["t_ms"], tr["recv_ms"])
+    return symbols, tr["sym"].astype(np.int64), t_ms, tr["recv_ms"], tr["a"], tr["b"]
+
+
+# ============================================================
+# FRAMES (recv_ms, frame)
+# ============================================================
+def trade_frames(symbols, sym, t_ms, recv_ms, price, qty) -> List[Tuple[int, str]]:
+    out = [
+        (int(r), TRADE.format(s=symbols[s].lower(), S=symbols[s], k=k + 1, t=int(t), p=repr(p), q=repr(q)))
+        for k, (s, t, r, p, q) in enumerate(zip(sym.tolist(), t_ms, recv_ms, price.tolist(), qty.tolist()))
+    ]
+    out.sort(key=lambda x: x[0])
+    return out
+
+
+def kline_frames(symbols, sym, t_ms, recv_ms, price, qty) -> List[Tuple[int, str]]:
+    out: List[Tuple[int, str]] = []
+    end_bucket = int(t_ms.max()) // TF_MS if len(t_ms) else 0
+    for k, name in enumerate(symbols):
+        sel = np.flatnonzero(sym == k)
+        if not sel.size:
+            continue
+        s = name.lower()
+
+        def frame(b, E, o, h, l, c, v, n, closed):
+            return KLINE.format(s=s, S=name, E=E, t=b * TF_MS, T=(b + 1) * TF_MS - 1,
+                                o=repr(o), h=repr(h), l=repr(l), c=repr(c), v=repr(v), n=n,
+                                x="true" if closed else "false")
+
+        ts, rs, ps, qs = t_ms[sel].tolist(), recv_ms[sel].tolist(), price[sel].tolist(), qty[sel].tolist()
+        j, close = 0, None
+        for b in range(ts[0] // TF_MS, end_bucket + 1):
+            o = h = l = close
+            v, n = 0.0, 0
+            # frame bar đang mở mỗi cửa sổ 250ms có trade
+            while j < len(ts) and ts[j] // TF_MS == b:
+                win = ts[j] // PUSH_MS
+                while j < len(ts) and ts[j] // PUSH_MS == win:
+                    p = ps[j]
+                    if n == 0:
+                        o = h = l = p
+                    h, l = max(h, p), min(l, p)
+                    close = p
+                    v += qs[j]
+                    n += 1
+                    last_recv = rs[j]
+                    j += 1
+                out.append((max(last_recv, (win + 1) * PUSH_MS + LATENCY_MS),
+                            frame(b, (win + 1) * PUSH_MS, o, h, l, close, v, n, False)))
+            E = (b + 1) * TF_MS + CLOSE_MS
+            out.append((E + LATENCY_MS, frame(b, E, o, h, l, close, v, n, True)))
+    out.sort(key=lambda x: x[0])
+    return out
+
+
+# ============================================================
+# RUN 1 MODE (scheduler giả lập theo recv time)
+# ============================================================
+def run_mode(mode: str, symbols: List[str], frames: List[Tuple[int, str]], grace: float, backend: str):
+    from app.decode import Decoder
+    from app.main import kline_handler, trade_handler
+    from app.pipeline import close_due
+    from app.state import SymbolStore
+
+    store = SymbolStore(symbols)
+    bars_out: List[tuple] = []
+    alerts: List[tuple] = []
+
+    def on_close(boundary, idx, bars):
+        for i in idx.tolist():
+            bars_out.append((bars.tf_sec, boundary, store.symbols[i], float(bars.open[i]), float(bars.high[i]),
+                             float(bars.low[i]), float(bars.close[i]), float(bars.vol[i])))
+
+    for bars in store.bars.levels:
+        store.bars.subscribe(bars.tf_sec, on_close)
+
+    def emit(now, side, sym, price):
+        alerts.append((now, side, sym, price))
+
+    clock = [0.0]
+    decoder = Decoder(store.ids, backend)
+    make = trade_handler if mode == "aggtrade" else kline_handler
+    handle = make(store, decoder, emit=emit, **({"clock": lambda: clock[0]} if mode == "aggtrade" else {}))
+
+    base = store.bars_5m
+    ingest = 0.0
+    t_start = time.process_time()
+    k = 0
+    while k < len(frames):
+        # batch = các frame tới trong cùng 10ms (như 1 lần đọc buffer của shard)
+        slot = frames[k][0] // 10
+        e = k
+        while e < len(frames) and frames[e][0] // 10 == slot and e - k < 1024:
+            e += 1
+        now = frames[k][0] / 1000
+        clock[0] = now
+        if base.open_bucket is not None and now >= (base.open_bucket + 1) * base.tf_sec + grace:
+            close_due(store, now, emit, grace)
+        t0 = time.process_time()
+        handle([f for _, f in frames[k:e]])
+        ingest += time.process_time() - t0
+        k = e
+    if base.open_bucket is not None:
+        close_due(store, (base.open_bucket + 1) * base.tf_sec + grace, emit, grace)
+    total = time.process_time() - t_start
+
+    return {
+        "mode": mode,
+        "frames": len(frames),
+        "parsed": decoder.frames - decoder.dropped - decoder.errors,
+        "ingest_s": ingest,
+        "total_s": total,
+        "bars": sorted(bars_out),
+        "alerts": alerts,
+    }
+
+
+def compare(a: List[tuple], b: List[tuple]) -> int:
+    bad = 0
+    ka = {x[:3]: x[3:] for x in a}
+    kb = {x[:3]: x[3:] for x in b}
+    for key in sorted(set(ka) | set(kb)):
+        x, y = ka.get(key), kb.get(key)
+        if x is None or y is None or not np.allclose(x, y, rtol=1e-9, atol=0):
+            bad += 1
+            if bad <= 10:
+                print(f"  tf={key[0]} boundary={key[1]} {key[2]} aggtrade={x} kline={y}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Same bars from aggTrade vs kline_5m ingestion on one session")
+    ap.add_argument("--rec", default="", help="file recording (TickRecorder); rỗng = phiên tổng hợp")
+    ap.add_argument("--symbols", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=2000, help="trades/s tổng (phiên tổng hợp)")
+    ap.add_argument("--minutes", type=float, default=30)
+    ap.add_argument("--grace", type=float, default=2.0)
+    ap.add_argument("--decoder", default="auto")
+    args = ap.parse_args()
+
+    session = recorded(args.rec) if args.rec else synthetic(args.symbols, args.rate, args.minutes)
+    symbols = session[0]
+    t0 = time.perf_counter()
+    streams: Dict[str, List[Tuple[int, str]]] = {
+        "aggtrade": trade_frames(*session),
+        "kline": kline_frames(*session),
+    }
+    print(f"session: symbols={len(symbols)} trades={len(session[1])} "
+          f"(frames built in {time.perf_counter() - t0:.1f}s)")
+
+    res = {m: run_mode(m, symbols, f, args.grace, args.decoder) for m, f in streams.items()}
+    print(f"{'mode':<9} {'frames':>9} {'parsed':>9} {'ingest_s':>9} {'us/frame':>9} {'total_s':>8} "
+          f"{'bars':>7} {'alerts':>6}")
+    for r in res.values():
+        print(f"{r['mode']:<9} {r['frames']:>9} {r['parsed']:>9} {r['ingest_s']:>9.3f} "
+              f"{r['ingest_s'] / max(1, r['frames']) * 1e6:>9.2f} {r['total_s']:>8.3f} "
+              f"{len(r['bars']):>7} {len(r['alerts']):>6}")
+
+    a, k = res["aggtrade"], res["kline"]
+    bad = compare(a["bars"], k["bars"])
+    same_alerts = a["alerts"] == k["alerts"]
+    print(f"bars_mismatch={bad} alerts_equal={same_alerts} "
+          f"frames x{a['frames'] / max(1, k['frames']):.1f} parsed x{a['parsed'] / max(1, k['parsed']):.0f} "
+          f"ingest_cpu x{a['ingest_s'] / max(1e-9, k['ingest_s']):.1f}")
+    raise SystemExit(1 if bad or not same_alerts else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app import backfill
+from app.backfill import Backfiller
+from app.pipeline import close_due
+from app.processor import TickProcessor
+from app.state import BarAccum, SymbolStore
+
+SYMBOLS = ["AUSDT", "BUSDT", "CUSDT"]
+START_MS = 1_700_000_100_000          # biên 5m
+GRACE = 10.0                          # gap phát hiện + backfill xong trước khi scheduler đóng bar
+
+
+def _session(n: int = 3000, seed: int = 5):
+    """Trade (symbol, price, qty, t_ms, agg_id) theo thời gian, id liên tiếp theo symbol."""
+    rng = np.random.default_rng(seed)
+    t = np.sort(START_MS + rng.integers(0, 3 * 300_000, n))
+    sym = rng.integers(0, len(SYMBOLS), n)
+    price = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    qty = np.round(rng.exponential(1.0, n), 3) + 0.001
+    next_id = {s: 1000 * (k + 1) for k, s in enumerate(SYMBOLS)}
+    out = []
+    for s, p, q, tm in zip(sym.tolist(), price.tolist(), qty.tolist(), t.tolist()):
+        name = SYMBOLS[s]
+        out.append((name, p, q, tm, next_id[name]))
+        next_id[name] += 1
+    return out
+
+
+def _drop_across_boundary(trades, symbol="AUSDT", before=6, after=2):
+    """Bỏ các trade của `symbol` quanh biên bar thứ 2 (gap nằm trên 2 bucket)."""
+    edge = START_MS + 300_000
+    own = [k for k, x in enumerate(trades) if x[0] == symbol]
+    cut = next(j for j, k in enumerate(own) if trades[k][3] >= edge)
+    dropped = set(own[cut - before:cut + after])
+    return [x for k, x in enumerate(trades) if k not in dropped], [trades[k] for k in sorted(dropped)]
+
+
+async def _run(trades, fill=False, batch=16):
+    store = SymbolStore(SYMBOLS)
+    closed = []
+
+    def on_close(boundary, idx, bars):
+        for i in idx.tolist():
+            closed.append((bars.tf_sec, boundary, store.symbols[i], float(bars.open[i]), float(bars.high[i]),
+                           float(bars.low[i]), float(bars.close[i]), round(float(bars.vol[i]), 9)))
+
+    for lv in store.bars.levels:
+        store.bars.subscribe(lv.tf_sec, on_close)
+
+    def emit(*a):
+        pass
+
+    proc = TickProcessor(store, emit, vector_min=8)
+    bf = None
+    if fill:
+        bf = Backfiller(proc, rest_base="http://stand-in")
+        proc.on_gap = bf.submit
+
+    bars = store.bars_5m
+    for k in range(0, len(trades), batch):
+        chunk = trades[k:k + batch]
+        now = chunk[0][3] / 1000
+        if bars.open_bucket is not None and now >= (bars.open_bucket + 1) * bars.tf_sec + GRACE:
+            if bf is not None:
+                await bf.drain(1.0)
+            close_due(store, now, emit, GRACE)
+        proc.trades(chunk)
+        await asyncio.sleep(0)
+    if bf is not None:
+        await bf.drain(1.0)
+    close_due(store, (bars.open_bucket + 1) * bars.tf_sec + GRACE, emit, GRACE)
+    return closed, bf
+
+
+def test_gap_backfill_matches_no_gap(monkeypatch):
+    trades = _session()
+    kept, dropped = _drop_across_boundary(trades)
+    requests = []
+
+    class StubClient:
+        async def agg_trades(self, symbol, from_id, limit=1000):
+            requests.append((symbol, from_id, limit))
+            rows = [x for x in dropped if x[0] == symbol and x[4] >= from_id][:limit]
+            return [{"a": a, "p": str(p), "q": str(q), "T": t} for _, p, q, t, a in rows]
+
+    monkeypatch.setattr(backfill, "rest_client", lambda base: StubClient())
+
+    ref, _ = asyncio.run(_run(trades))
+    got, bf = asyncio.run(_run(kept, fill=True))
+
+    assert requests == [("AUSDT", dropped[0][4], len(dropped))]
+    assert bf.gaps == 1 and bf.merged == len(dropped) and bf.lost == 0
+    assert len(got) == len(ref)
+    for a, b in zip(sorted(got), sorted(ref)):
+        assert a[:3] == b[:3]
+        assert a[3:] == pytest.approx(b[3:], rel=1e-12)
+
+    # không backfill: bar của AUSDT quanh gap khác -> test thực sự phân biệt
+    nofill, _ = asyncio.run(_run(kept))
+    assert sorted(nofill) != sorted(ref)
+
+
+def test_insert_out_of_order_matches_in_order():
+    trades = [(10, 5.0, 1.0), (20, 6.0, 2.0), (130, 4.0, 1.5), (200, 8.0, 1.0),   # bucket 0
+              (310, 7.0, 3.0), (350, 6.5, 1.0), (420, 9.0, 2.0)]                  # bucket 1
+
+    ref = BarAccum(1, 300)
+    for t, p, q in trades:
+        ref.add(0, t, p, q)
+
+    got = BarAccum(1, 300)
+    live = [trades[k] for k in (0, 1, 5, 6)]        # trade 2..4 mất (gap qua biên bar)
+    for t, p, q in live:
+        got.add(0, t, p, q)
+    # backfill tới ngược thứ tự: phần của bucket 1 trước, rồi bucket 0
+    assert got.insert(0, 1, [7.0], [3.0], keep_open=False, keep_close=True)
+    assert got.insert(0, 0, [4.0, 8.0], [1.5, 1.0], keep_open=True, keep_close=False)
+
+    for a, b in ((got.open, ref.open), (got.high, ref.high), (got.low, ref.low),
+                 (got.close, ref.close), (got.vol, ref.vol),
+                 (got.next_open, ref.next_open), (got.next_high, ref.next_high),
+                 (got.next_low, ref.next_low), (got.next_close, ref.next_close), (got.next_vol, ref.next_vol)):
+        assert a.tolist() == pytest.approx(b.tolist())
+
+    # bucket đã đóng (hoặc xa hơn bar kế tiếp) -> không sửa được
+    got.roll()
+    assert not got.insert(0, 0, [1.0], [1.0], keep_open=True, keep_close=True)
+    assert not got.insert(0, 3, [1.0], [1.0], keep_open=False, keep_close=False)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from app import binance_client
+from app.binance_client import AsyncBinanceFuturesClient
+
+
+class _Clock:
+    """time.time() của client lệch sao cho còn `left` giây là hết phút."""
+
+    def __init__(self, left: float):
+        now = time.time()
+        self.offset = (int(now // 60) + 1) * 60 - left - now
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+
+def _run(routes, test):
+    """Chạy test(client, hits) với 1 aiohttp.web stand-in; routes: {path: handler(request, hits)}."""
+    hits = []
+
+    def route(fn):
+        async def handle(request):
+            return await fn(request, hits)
+
+        return handle
+
+    async def main():
+        app = web.Application()
+        for path, fn in routes.items():
+            app.router.add_get(path, route(fn))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        client = AsyncBinanceFuturesClient(base, retries=2)
+        try:
+            return await test(client, hits)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+async def _ok(request, hits):
+    hits.append(time.monotonic())
+    await asyncio.sleep(0.1)
+    return web.json_response({"n": len(hits)})
+
+
+def test_coalescing_one_upstream_hit():
+    async def test(client, hits):
+        res = await asyncio.gather(*(client.get("/x", {"a": 1}) for _ in range(6)))
+        return res, client
+
+    res, client = _run({"/x": _ok}, test)
+    assert res == [{"n": 1}] * 6
+    assert client.requests == 1 and client.coalesced == 5
+
+
+def test_429_retry_after_pauses_then_succeeds():
+    async def limited(request, hits):
+        hits.append(time.monotonic())
+        if len(hits) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0.5"})
+        return web.json_response({"ok": True})
+
+    async def test(client, hits):
+        return await client.get("/x"), hits, client
+
+    res, hits, client = _run({"/x": limited}, test)
+    assert res == {"ok": True}
+    assert len(hits) == 2 and hits[1] - hits[0] >= 0.45
+    assert client.rate_limited == 1 and client.throttled >= 1
+
+
+def test_418_raises_and_blocks():
+    async def banned(request, hits):
+        hits.append(time.monotonic())
+        return web.Response(status=418, headers={"Retry-After": "120"})
+
+    async def test(client, hits):
+        with pytest.raises(RuntimeError, match="418"):
+            await client.get("/x")
+        return hits, client
+
+    hits, client = _run({"/x": banned}, test)
+    assert len(hits) == 1
+    assert client.banned == 1
+    assert client._blocked_until > time.time() + 100
+
+
+def test_weight_budget_waits_for_next_minute(monkeypatch):
+    clock = _Clock(left=0.4)
+    monkeypatch.setattr(binance_client, "time", clock)
+
+    async def test(client, hits):
+        client.weight_limit = 5
+        await client.get("/x", {"k": 1}, weight=3)
+        await client.get("/x", {"k": 2}, weight=3)     # 3 + 3 > 5 -> sang phút kế
+        return hits, client
+
+    hits, client = _run({"/x": _ok}, test)
+    assert len(hits) == 2 and hits[1] - hits[0] >= 0.3
+    assert client.throttled == 1
+    assert int((clock.time()) // 60) == client._minute      # đã sang phút mới
+
+
+def test_used_weight_header_overrides_local_estimate(monkeypatch):
+    clock = _Clock(left=0.4)
+    monkeypatch.setattr(binance_client, "time", clock)
+
+    async def heavy(request, hits):
+        hits.append(time.monotonic())
+        # process khác cùng IP đã dùng gần hết budget
+        return web.json_response({}, headers={"X-MBX-USED-WEIGHT-1M": "1799"})
+
+    async def test(client, hits):
+        client.weight_limit = 1800
+        await client.get("/x", {"k": 1}, weight=1)
+        assert client.used_weight_1m == 1799 and client._used == 1799
+        await client.get("/x", {"k": 2}, weight=2)
+        return hits, client
+
+    hits, client = _run({"/x": heavy}, test)
+    assert len(hits) == 2 and hits[1] - hits[0] >= 0.3
+    assert client.throttled == 1
@@ -0,0 +1,16 @@
+import pytest
+
+from app.config import CFG, profile_config
+
+
+def test_profile_override(monkeypatch):
+    monkeypatch.setenv("SCALP_COOLDOWN_SEC", " 120 ")
+    assert profile_config("scalp").COOLDOWN_SEC == 120
+    assert profile_config("swing").COOLDOWN_SEC == CFG.COOLDOWN_SEC
+
+
+@pytest.mark.parametrize("raw", ["5m", "1.5", "true"])
+def test_profile_bad_override_names_env_var(monkeypatch, raw):
+    monkeypatch.setenv("SCALP_COOLDOWN_SEC", raw)
+    with pytest.raises(ValueError, match="SCALP_COOLDOWN_SEC"):
+        profile_config("scalp")
@@ -0,0 +1,90 @@
+import copy
+
+import numpy as np
+import pytest
+
+from app.indicators import (
+    ATR,
+    RSI,
+    VWAP,
+    BollingerWidth,
+    Donchian,
+    RollingMax,
+    RollingMin,
+    VolumeSMA,
+    atr,
+    bollinger_width,
+    donchian,
+    rolling_max,
+    rolling_min,
+    rsi,
+    volume_sma,
+    vwap,
+)
+
+BARS = 5000
+
+
+@pytest.fixture(scope="module")
+def ohlcv():
+    rng = np.random.default_rng(0)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, BARS)))
+    o = np.concatenate([[c[0]], c[:-1]])
+    h = np.maximum(o, c) * (1 + rng.random(BARS) * 0.002)
+    l = np.minimum(o, c) * (1 - rng.random(BARS) * 0.002)
+    v = rng.random(BARS) * 1000
+    return {"h": h, "l": l, "c": c, "v": v}
+
+
+# name -> (streaming object, cột input, batch reference)
+CASES = {
+    "rsi": (lambda: RSI(14), "c", lambda d: rsi(d["c"], 14)[0]),
+    "rsi_bank": (lambda: RSI(14), "c", lambda d: rsi(np.concatenate([[np.nan], d["c"]]), 14)[0][1:]),
+    "volume_sma": (lambda: VolumeSMA(20), "v", lambda d: volume_sma(d["v"], 20)[0]),
+    "rolling_max": (lambda: RollingMax(20), "h", lambda d: rolling_max(d["h"], 20)),
+    "rolling_min": (lambda: RollingMin(20), "l", lambda d: rolling_min(d["l"], 20)),
+    "atr": (lambda: ATR(14), "hlc", lambda d: atr(d["h"], d["l"], d["c"], 14)),
+    "bollinger_width": (lambda: BollingerWidth(20), "c", lambda d: bollinger_width(d["c"], 20)),
+    "vwap": (lambda: VWAP(), "hlcv", lambda d: vwap(d["h"], d["l"], d["c"], d["v"])),
+    "vwap_50": (lambda: VWAP(50), "hlcv", lambda d: vwap(d["h"], d["l"], d["c"], d["v"], 50)),
+    "donchian": (lambda: Donchian(20), "hlc", lambda d: donchian(d["h"], d["l"], d["c"], 20)[0]),
+}
+
+
+def _run(obj, rows) -> np.ndarray:
+    return np.array([np.nan if (x := obj.update(*r)) is None else x for r in rows], dtype=float)
+
+
+def _assert_close(got: np.ndarray, ref: np.ndarray) -> None:
+    assert (np.isnan(got) == np.isnan(ref)).all()
+    m = ~np.isnan(ref)
+    err = np.max(np.abs(got[m] - ref[m]) / np.maximum(np.abs(ref[m]), 1e-12), initial=0.0)
+    assert err < 1e-9
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_streaming_matches_batch(ohlcv, name):
+    make, cols, ref = CASES[name]
+    rows = list(zip(*(ohlcv[k] for k in cols)))
+    _assert_close(_run(make(), rows), ref(ohlcv))
+
+
+@pytest.mark.parametrize("name", list(CASES))
+@pytest.mark.parametrize("split", [1, 19, 2500])
+def test_streaming_continues_from_state(ohlcv, name, split):
+    """State chụp giữa chừng (như snapshot) chạy tiếp ra đúng phần còn lại của batch."""
+    make, cols, ref = CASES[name]
+    rows = list(zip(*(ohlcv[k] for k in cols)))
+    obj = make()
+    _run(obj, rows[:split])
+    resumed = copy.deepcopy(obj)
+    _assert_close(_run(resumed, rows[split:]), ref(ohlcv)[split:])
+
+
+@pytest.mark.parametrize("fn,col,period", [(rsi, "c", 14), (volume_sma, "v", 20)])
+@pytest.mark.parametrize("split", [5, 14, 2500])
+def test_batch_continues_from_state(ohlcv, fn, col, period, split):
+    x = ohlcv[col]
+    head, state = fn(x[:split], period)
+    tail, _ = fn(x[split:], period, state=state)
+    _assert_close(np.concatenate([head, tail]), fn(x, period)[0])
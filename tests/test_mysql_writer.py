@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import time
+
+from app.mysql_writer import BulkWriter
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "bars.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE bars (symbol TEXT, close REAL)")
+    conn.commit()
+    conn.close()
+    return path, lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT symbol, close FROM bars ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.02)
+    return cond()
+
+
+def test_flush(tmp_path):
+    path, connect = _db(tmp_path)
+    w = BulkWriter(connect, placeholder="?", batch_size=10, flush_interval=0.05)
+    w.start()
+    for k in range(25):
+        w.write("bars", {"symbol": f"S{k}", "close": float(k)})
+    assert _wait(lambda: w.rows_written == 25)
+    w.stop()
+    assert _rows(path) == [(f"S{k}", float(k)) for k in range(25)]
+    assert w.errors == 0
+
+
+def test_spill_round_trip(tmp_path):
+    path, connect = _db(tmp_path)
+    spill = str(tmp_path / "spill.jsonl")
+
+    # DB không kết nối được: buffer đầy -> overflow -> spill, stop() spill nốt
+    def down():
+        raise sqlite3.OperationalError("unable to open database")
+
+    w = BulkWriter(down, placeholder="?", batch_size=5, flush_interval=0.05, max_buffer=10, spill_path=spill)
+    w.start()
+    for k in range(30):
+        w.write("bars", {"symbol": f"S{k}", "close": float(k)})
+    w.stop()
+    assert w.rows_written == 0 and w.rejected == 0
+    with open(spill, encoding="utf-8") as f:
+        assert len(f.readlines()) == 30
+
+    # DB hồi phục: writer mới đọc spill lại và ghi hết
+    w = BulkWriter(connect, placeholder="?", batch_size=5, flush_interval=0.05, spill_path=spill)
+    w.start()
+    assert _wait(lambda: w.rows_written == 30)
+    w.stop()
+    assert sorted(_rows(path)) == sorted((f"S{k}", float(k)) for k in range(30))
+
+
+def test_bad_row_rejected(tmp_path):
+    path, connect = _db(tmp_path)
+    spill = str(tmp_path / "spill.jsonl")
+    w = BulkWriter(connect, placeholder="?", batch_size=100, flush_interval=0.05, spill_path=spill)
+    for k in range(30):
+        w.write("bars", {"symbol": f"S{k}", "close": float(k)})
+        if k == 12:
+            w.write("bars", {"symbol": "BAD", "close": 1.0, "nope": 1})
+    w.start()
+    assert _wait(lambda: w.rows_written == 30 and w.rejected == 1)
+    w.stop()
+
+    assert len(_rows(path)) == 30
+    with open(w.reject_path, encoding="utf-8") as f:
+        rejected = [json.loads(line) for line in f]
+    assert [(t, r["symbol"]) for t, r, _ in rejected] == [("bars", "BAD")]
+    assert w.stats()["buffer"] == 0
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from app.streams import StreamShard
+
+FRAME = '{"stream":"btcusdt@aggTrade","data":{"k":%d}}'
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/stream", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/stream"
+
+
+def test_batch_not_held_by_trailing_pong():
+    async def main():
+        async def ws_handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            for k in range(3):
+                await ws.send_str(FRAME % k)
+            await ws.pong(b"")          # PONG là frame cuối trong buffer client
+            await asyncio.sleep(3.0)
+            await ws.send_str(FRAME % 3)
+            await asyncio.sleep(10)
+            return ws
+
+        runner, url = await _serve(ws_handler)
+        got = []
+        t0 = time.monotonic()
+
+        def handler(batch):
+            got.append((time.monotonic() - t0, len(batch)))
+
+        shard = StreamShard("test", url, ["BTCUSDT"], "aggTrade", handler)
+        task = asyncio.create_task(shard.run())
+        try:
+            while sum(n for _, n in got) < 3 and time.monotonic() - t0 < 2.5:
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+        return got
+
+    got = asyncio.run(main())
+    assert sum(n for _, n in got) == 3
+    assert max(t for t, _ in got) < 1.0
@@ -0,0 +1,176 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app import warmup
+from app.state import SymbolStore
+
+SYMBOLS = ["AUSDT", "BUSDT", "CUSDT"]
+T0 = 1_700_000_000 // 14400 * 14400 // 300     # bucket 5m ở biên 4h
+
+
+def _bars(n: int = 200, seed: int = 1):
+    """{(symbol, bucket): (o, h, l, c, v)}; CUSDT có bucket không trade (bar phẳng, như klines)."""
+    rng = np.random.default_rng(seed)
+    out = {}
+    for b in range(T0, T0 + n):
+        for s in SYMBOLS:
+            if s == "CUSDT" and b % 7 == 0 and (s, b - 1) in out:
+                c = out[(s, b - 1)][3]
+                out[(s, b)] = (c, c, c, c, 0.0)
+                continue
+            o = 100 + rng.normal()
+            c = o + rng.normal()
+            out[(s, b)] = (o, max(o, c) + abs(rng.normal()), min(o, c) - abs(rng.normal()), c,
+                           float(rng.integers(1, 100)))
+    return out
+
+
+def _drive(store: SymbolStore, bars, upto: int) -> None:
+    """Cascade chạy liên tục: đóng mọi bar 5m < upto."""
+    base = store.bars.base
+    for b in range(T0, upto):
+        base.open_bucket = b if base.open_bucket is None else base.open_bucket
+        for s in SYMBOLS:
+            base.put(store.ids[s], b, *bars[(s, b)])
+        idx = store.bars.close_base((b + 1) * 300)
+        store.bars.propagate((b + 1) * 300, idx)
+
+
+def _open_bars(store: SymbolStore):
+    out = []
+    for lv in store.bars.levels[1:]:
+        has = ~np.isnan(lv.open)
+        out.append((lv.tf_sec, lv.open_bucket if has.any() else None,
+                    *(np.round(np.where(has, a, 0.0), 9).tolist() for a in (lv.open, lv.high, lv.low, lv.close, lv.vol))))
+    return out
+
+
+@pytest.mark.parametrize("snap,gap", [(1, 1), (2, 5), (11, 2), (40, 13), (47, 40), (95, 1), (130, 30)])
+def test_fill_gap_rebuilds_open_higher_bars(monkeypatch, snap, gap):
+    bars = _bars()
+
+    async def fetch(client, symbols, interval, limit, start_ms=None, *, ohlcv=False):
+        if not ohlcv:
+            return {s: np.zeros((0, 2)) for s in symbols}   # indicator: không seed thêm
+        s0 = start_ms // 1000 // 300
+        return {s: np.array([[b * 300_000, *bars[(s, b)]] for b in range(s0, s0 + limit)]).reshape(-1, 6)
+                for s in symbols}
+
+    monkeypatch.setattr(warmup, "fetch_klines", fetch)
+    snap, now = T0 + snap, T0 + snap + gap
+
+    truth = SymbolStore(SYMBOLS)
+    _drive(truth, bars, now)
+
+    store = SymbolStore(SYMBOLS)
+    _drive(store, bars, snap)
+    store.bars.base.open_bucket = snap
+    for s in SYMBOLS:   # bar 5m đang tích lũy lúc snapshot (thiếu trade)
+        o, _, _, _, v = bars[(s, snap)]
+        store.bars.base.put(store.ids[s], snap, o, o, o, o, v / 3)
+
+    assert asyncio.run(warmup.fill_gap(store, now=now * 300 + 10)) is not None
+    assert _open_bars(store) == _open_bars(truth)
+
+
+def test_fill_gap_rest_failure_keeps_store(monkeypatch):
+    bars = _bars()
+
+    async def fetch(client, symbols, interval, limit, start_ms=None, *, ohlcv=False):
+        # BUSDT lỗi REST (fetch_klines chỉ log và bỏ symbol đó)
+        return {s: np.zeros((0, 6 if ohlcv else 2)) for s in symbols if s != "BUSDT"}
+
+    monkeypatch.setattr(warmup, "fetch_klines", fetch)
+    store = SymbolStore(SYMBOLS)
+    _drive(store, bars, T0 + 30)
+    before = _open_bars(store)
+
+    assert asyncio.run(warmup.fill_gap(store, now=(T0 + 60) * 300 + 10)) is None
+    assert _open_bars(store) == before
+
+
+def test_fill_gap_limit_within_binance_max(monkeypatch):
+    calls = []
+
+    async def fetch(client, symbols, interval, limit, start_ms=None, *, ohlcv=False):
+        calls.append(limit)
+        return {}
+
+    monkeypatch.setattr(warmup, "fetch_klines", fetch)
+    store = SymbolStore(SYMBOLS)
+    _drive(store, _bars(), T0 + 2)
+    # gap 5m == max_bars -> cần limit = max_bars + 1 -> không fill được
+    assert asyncio.run(warmup.fill_gap(store, max_bars=100, now=(T0 + 2 + 100) * 300 + 10)) is None
+    assert not calls
+
+
+# ============================================================
+# warmup() qua REST stand-in (aiohttp.web) thay cho Binance
+# ============================================================
+def _close(sym: str, k: int) -> float:
+    return 100.0 + (sum(map(ord, sym)) % 7) + np.sin(k / 5.0) * 3
+
+
+def test_warmup_against_rest_stand_in():
+    from aiohttp import web
+
+    from app.binance_client import close_rest_clients, klines_weight
+    from app.indicators import ema
+
+    hits = []
+    open_at = {}    # tf_ms -> bucket đang mở lúc server trả lời
+
+    async def klines(request):
+        q = request.query
+        sym, limit = q["symbol"], int(q["limit"])
+        hits.append((sym, q["interval"], limit))
+        if sym == "CUSDT":
+            return web.Response(status=500)
+        tf = {"5m": 300, "15m": 900, "1h": 3600, "4h": 14400}[q["interval"]] * 1000
+        now = int(time.time() * 1000)
+        open_k = open_at[tf] = now // tf
+        rows = []
+        for k in range(open_k - limit + 1, open_k + 1):
+            c = _close(sym, k) if k < open_k else 1e6     # bar đang mở: phải bị bỏ
+            rows.append([k * tf, c, c, c, c, 10.0, (k + 1) * tf - 1, "0", 1, "0", "0", "0"])
+        return web.json_response(rows)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/fapi/v1/klines", klines)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        store = SymbolStore(SYMBOLS)
+        try:
+            report = await warmup.warmup(store, rest_base=base, bars=120)
+        finally:
+            await close_rest_clients()
+            await runner.cleanup()
+        return store, report
+
+    store, report = asyncio.run(main())
+    tfs = store.graph.tfs
+
+    assert len(hits) == len(SYMBOLS) * len(tfs)
+    assert report["requests"] == len(hits)
+    assert report["weight"] == len(hits) * klines_weight(120)
+    for tf in tfs:
+        assert report[f"ok_{warmup.INTERVALS[tf]}"] == len(SYMBOLS) - 1
+
+    # node seed = batch indicator trên 119 bar đã đóng; symbol lỗi REST chưa sẵn sàng
+    for spec in store.graph.order[tfs[0]]:
+        if spec.kind != "ema":
+            continue
+        value = store.graph.nodes[spec.name].value
+        open_k = open_at[spec.tf * 1000]
+        for s in ("AUSDT", "BUSDT"):
+            closes = np.array([_close(s, k) for k in range(open_k - 119, open_k)])
+            ref = ema(closes, spec.params[0])[0][-1]
+            assert value[store.ids[s]] == pytest.approx(ref, rel=1e-12)
+        assert np.isnan(value[store.ids["CUSDT"]])